@@ -0,0 +1,89 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from config import (
+    LOG_QUEUE_SIZE, ACCESS_LOG_ENABLED, ACCESS_LOG_FILE, ACCESS_LOG_SAMPLE_RATE, ACCESS_LOG_SAMPLE_RATES,
+    ACCESS_LOG_SLOW_MS
+)
+from metrics import Counter
+
+# Every log record goes through a bounded queue to one writer thread, so handlers never do
+# I/O on the event loop. Access records are JSON lines on their own handler.
+ACCESS_LOGGER_NAME = "access"
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+LOG_RECORDS_DROPPED = Counter("log_records_dropped_total", "Log records dropped because the log queue was full", ("logger",))
+
+access_logger = logging.getLogger(ACCESS_LOGGER_NAME)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc(logger=record.name)
+
+class AccessLogFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.access, default=str)
+
+def configure_logging(level: int = logging.INFO):
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    console.addFilter(lambda record: record.name != ACCESS_LOGGER_NAME)
+
+    access = logging.FileHandler(ACCESS_LOG_FILE) if ACCESS_LOG_FILE else logging.StreamHandler(sys.stdout)
+    access.setFormatter(AccessLogFormatter())
+    access.addFilter(logging.Filter(ACCESS_LOGGER_NAME))
+
+    listener = logging.handlers.QueueListener(log_queue, console, access, respect_handler_level=True)
+    root = logging.getLogger()
+    root.handlers = [DroppingQueueHandler(log_queue)]
+    root.setLevel(level)
+    listener.start()
+    # Flushes what is still queued at interpreter exit
+    atexit.register(listener.stop)
+    return listener
+
+def _sampled(route: str, status: int, latency_ms: float) -> float:
+    # Returns the sample rate the record was kept at, or None to skip it
+    if status >= 500 or latency_ms >= ACCESS_LOG_SLOW_MS:
+        return 1.0
+    rate = ACCESS_LOG_SAMPLE_RATES.get(route, ACCESS_LOG_SAMPLE_RATE)
+    if rate >= 1 or random.random() < rate:
+        return rate
+    return None
+
+def log_access(context, status: int, request_size: int, response_size: int):
+    if not ACCESS_LOG_ENABLED:
+        return
+    latency_ms = (time.perf_counter() - context.started) * 1000
+    rate = _sampled(context.route, status, latency_ms)
+    if rate is None:
+        return
+    user = context.user or {}
+    access_logger.info("access", extra={"access": {
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "method": context.method,
+        "route": context.route,
+        "path": context.path,
+        "status": status,
+        "latency_ms": round(latency_ms, 3),
+        "db_calls": context.db_calls,
+        "db_ms": round(context.db_ms, 3),
+        "serialize_ms": round(context.serialization_ms, 3) if context.serialization_ms is not None else None,
+        "user_id": user.get('user_id'),
+        "role": user.get('role'),
+        "tenant_id": context.tenant_id,
+        "request_bytes": request_size,
+        "response_bytes": response_size,
+        "sample_rate": rate,
+    }})
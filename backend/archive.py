@@ -0,0 +1,209 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+from pymongo.errors import BulkWriteError
+from config import (
+    TENANT_ROUTING, ARCHIVE_ENABLED, ARCHIVE_HORIZON_DAYS, ARCHIVE_INTERVAL_SECONDS, ARCHIVE_BATCH_SIZE, ARCHIVE_PAUSE_SECONDS
+)
+from database import db, current_tenant, TIMESERIES_COLLECTIONS
+from jobs import job_handler, report_progress
+from models import PracticeRollup, ExamRollup
+from tenancy import use_tenant, load_tenants
+from utils import parse_datetime, datetime_range_query
+
+# Practice data older than the horizon moves out of the hot collections into archive
+# collections, leaving per-student/teacher/month rollups for long-term statistics.
+# Rollups are always recomputed from the archive, so re-running after a crash is safe.
+DUPLICATE_KEY = 11000
+
+def _month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def _next_month(month: datetime) -> datetime:
+    return (month + timedelta(days=32)).replace(day=1)
+
+async def _rollup_question_entries(student_id: str, teacher_id: str, subject: str, month: datetime):
+    entries = await db.question_entries_archive.find(
+        {"student_id": student_id, "teacher_id": teacher_id, "subject": subject,
+         "date": {"$gte": month, "$lt": _next_month(month)}},
+        {"_id": 0, "total_questions": 1, "correct_answers": 1, "wrong_answers": 1, "empty_answers": 1, "net_score": 1}
+    ).to_list(None)
+    rollup = PracticeRollup(
+        id=f"{student_id}:{teacher_id}:{subject}:{month:%Y-%m}",
+        student_id=student_id,
+        teacher_id=teacher_id,
+        subject=subject,
+        month=month,
+        count=len(entries),
+        total_questions=sum(e['total_questions'] for e in entries),
+        correct_answers=sum(e['correct_answers'] for e in entries),
+        wrong_answers=sum(e['wrong_answers'] for e in entries),
+        empty_answers=sum(e.get('empty_answers', 0) for e in entries),
+        net_score=sum(e['net_score'] for e in entries)
+    )
+    rollup_dict = rollup.model_dump()
+    await db.practice_rollups.update_one({"id": rollup_dict.pop('id')}, {"$set": rollup_dict}, upsert=True)
+
+async def _rollup_exam_analyses(student_id: str, teacher_id: str, exam_type: str, month: datetime):
+    analyses = await db.exam_analyses_archive.find(
+        {"student_id": student_id, "teacher_id": teacher_id, "exam_type": exam_type,
+         "exam_date": {"$gte": month, "$lt": _next_month(month)}},
+        {"_id": 0, "total_net": 1, "subjects": 1}
+    ).to_list(None)
+    subjects = {}
+    for analysis in analyses:
+        for subject in analysis['subjects']:
+            stats = subjects.setdefault(subject['name'], {
+                "name": subject['name'], "count": 0, "total_net": 0, "total_correct": 0, "total_wrong": 0
+            })
+            stats['count'] += 1
+            stats['total_net'] += subject.get('net', 0)
+            stats['total_correct'] += subject.get('correct', 0)
+            stats['total_wrong'] += subject.get('wrong', 0)
+    rollup = ExamRollup(
+        id=f"{student_id}:{teacher_id}:{exam_type}:{month:%Y-%m}",
+        student_id=student_id,
+        teacher_id=teacher_id,
+        exam_type=exam_type,
+        month=month,
+        count=len(analyses),
+        total_net=sum(a['total_net'] for a in analyses),
+        subjects=list(subjects.values())
+    )
+    rollup_dict = rollup.model_dump()
+    await db.exam_rollups.update_one({"id": rollup_dict.pop('id')}, {"$set": rollup_dict}, upsert=True)
+
+async def _backfill_exam_rollup_subjects():
+    # Exam rollups written before they kept per-subject stats
+    stale = await db.exam_rollups.find(
+        {"subjects": {"$exists": False}}, {"_id": 0, "student_id": 1, "teacher_id": 1, "exam_type": 1, "month": 1}
+    ).to_list(None)
+    for rollup in stale:
+        await _rollup_exam_analyses(rollup['student_id'], rollup['teacher_id'], rollup['exam_type'], rollup['month'])
+
+# Source collection -> (archive collection, time field, rollup grouping field, rollup function)
+ARCHIVED_COLLECTIONS = {
+    "question_entries": ("question_entries_archive", "date", "subject", _rollup_question_entries),
+    "exam_analyses": ("exam_analyses_archive", "exam_date", "exam_type", _rollup_exam_analyses),
+}
+
+async def _insert_archived(archive: str, docs: list, time_field: str):
+    for doc in docs:
+        doc[time_field] = parse_datetime(doc[time_field])
+    try:
+        await db[archive].insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        # Already archived by a run that stopped before deleting the source documents
+        if any(err['code'] != DUPLICATE_KEY for err in e.details['writeErrors']):
+            raise
+
+async def _archive_collection(source: str, cutoff: datetime):
+    archive, time_field, group_field, rollup = ARCHIVED_COLLECTIONS[source]
+    if source in TIMESERIES_COLLECTIONS:
+        async for count in _archive_series(source, cutoff):
+            yield count
+        return
+    query = datetime_range_query(time_field, lt=cutoff)
+    while True:
+        docs = await db[source].find(query, {"_id": 0}).sort(time_field, 1).limit(ARCHIVE_BATCH_SIZE).to_list(None)
+        if not docs:
+            return
+        await _insert_archived(archive, docs, time_field)
+
+        keys = {(d['student_id'], d['teacher_id'], d[group_field], _month_start(d[time_field])) for d in docs}
+        for key in keys:
+            await rollup(*key)
+
+        result = await db[source].delete_many({"id": {"$in": [d['id'] for d in docs]}})
+        yield result.deleted_count
+        if ARCHIVE_PAUSE_SECONDS:
+            await asyncio.sleep(ARCHIVE_PAUSE_SECONDS)
+
+async def _archive_series(source: str, cutoff: datetime):
+    # Time-series deletes can't select by id, so one series (student, teacher, group) at a
+    # time is archived in full and then deleted by its meta fields and the cutoff
+    archive, time_field, group_field, rollup = ARCHIVED_COLLECTIONS[source]
+    while True:
+        oldest = await db[source].find_one(
+            {time_field: {"$lt": cutoff}}, {"_id": 0, "student_id": 1, "teacher_id": 1, group_field: 1},
+            sort=[(time_field, 1)]
+        )
+        if oldest is None:
+            return
+        series_query = {
+            "student_id": oldest['student_id'], "teacher_id": oldest.get('teacher_id'), group_field: oldest.get(group_field),
+            time_field: {"$lt": cutoff}
+        }
+        months = set()
+        docs = []
+        async for doc in db[source].find(series_query, {"_id": 0}).batch_size(ARCHIVE_BATCH_SIZE):
+            docs.append(doc)
+            if len(docs) == ARCHIVE_BATCH_SIZE:
+                await _insert_archived(archive, docs, time_field)
+                months.update(_month_start(d[time_field]) for d in docs)
+                docs = []
+        if docs:
+            await _insert_archived(archive, docs, time_field)
+            months.update(_month_start(d[time_field]) for d in docs)
+
+        for month in months:
+            await rollup(oldest['student_id'], oldest.get('teacher_id'), oldest.get(group_field), month)
+
+        result = await db[source].delete_many(series_query)
+        yield result.deleted_count
+        if ARCHIVE_PAUSE_SECONDS:
+            await asyncio.sleep(ARCHIVE_PAUSE_SECONDS)
+
+@job_handler("archive_practice_data", interval_seconds=ARCHIVE_INTERVAL_SECONDS if ARCHIVE_ENABLED else None)
+async def archive_practice_data(job: dict) -> dict:
+    horizon_days = job['params'].get('horizon_days', ARCHIVE_HORIZON_DAYS)
+    # Whole months only, so a month is either fully archived or fully hot
+    cutoff = _month_start(datetime.now(timezone.utc) - timedelta(days=horizon_days))
+    if TENANT_ROUTING and not job.get('tenant_id'):
+        # The scheduled run covers the directory database and every tenant database
+        tenants = [None, *await load_tenants()]
+    else:
+        tenants = [current_tenant.get()]
+
+    total = 0
+    for tenant in tenants:
+        with use_tenant(tenant):
+            counts = await asyncio.gather(*[
+                db[source].count_documents(datetime_range_query(time_field, lt=cutoff))
+                for source, (_, time_field, _, _) in ARCHIVED_COLLECTIONS.items()
+            ])
+            total += sum(counts)
+
+    archived = {source: 0 for source in ARCHIVED_COLLECTIONS}
+    done = 0
+    for tenant in tenants:
+        with use_tenant(tenant):
+            await _backfill_exam_rollup_subjects()
+            for source in ARCHIVED_COLLECTIONS:
+                async for count in _archive_collection(source, cutoff):
+                    archived[source] += count
+                    done += count
+                    await report_progress(job['id'], done, total, collection=source)
+    return {"cutoff": cutoff.isoformat(), "archived": archived}
+
+async def get_practice_rollups(query: dict) -> list:
+    return await db.practice_rollups.find(query, {"_id": 0}).to_list(None)
+
+async def get_exam_rollups(query: dict) -> list:
+    return await db.exam_rollups.find(query, {"_id": 0}).to_list(None)
+
+def merge_subject_stats(entries: list, rollups: list) -> dict:
+    # Per-subject totals over recent entries plus archived months
+    stats = {}
+    for entry in entries:
+        subject = stats.setdefault(entry['subject'], {'correct': 0, 'wrong': 0, 'net': 0, 'count': 0})
+        subject['correct'] += entry['correct_answers']
+        subject['wrong'] += entry['wrong_answers']
+        subject['net'] += entry['net_score']
+        subject['count'] += 1
+    for rollup in rollups:
+        subject = stats.setdefault(rollup['subject'], {'correct': 0, 'wrong': 0, 'net': 0, 'count': 0})
+        subject['correct'] += rollup['correct_answers']
+        subject['wrong'] += rollup['wrong_answers']
+        subject['net'] += rollup['net_score']
+        subject['count'] += rollup['count']
+    return stats
@@ -0,0 +1,5 @@
+import os
+
+# Importing the app modules needs connection settings, though nothing here connects
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "micro_benchmarks")
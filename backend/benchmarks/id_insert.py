@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+from database import client, close_db_connection
+from models import ID_GENERATORS
+from storage import to_storage_id
+
+# Compares insert throughput and index size of random uuid4 ids against time-ordered
+# uuid7 ids, both as a string `id` field with a unique index and as a binary UUID _id.
+# Run against a local mongod: `python -m benchmarks.id_insert --docs 1000000`.
+
+BENCH_DB = "id_benchmark"
+
+def _entry(doc_id: str, i: int) -> dict:
+    return {
+        "id": doc_id,
+        "student_id": f"student-{i % 5000}",
+        "teacher_id": f"teacher-{i % 200}",
+        "exam_type": "TYT",
+        "subject": "Matematik",
+        "total_questions": 40,
+        "correct_answers": 25,
+        "wrong_answers": 10,
+        "empty_answers": 5,
+        "net_score": 21.67,
+        "date": datetime.now(timezone.utc),
+    }
+
+async def run_case(generator: str, binary_pk: bool, docs: int, batch_size: int) -> dict:
+    bench_db = client[BENCH_DB]
+    name = f"entries_{generator}_{'pk' if binary_pk else 'field'}"
+    collection = bench_db[name]
+    await collection.drop()
+    if not binary_pk:
+        await collection.create_index("id", unique=True)
+
+    make_id = ID_GENERATORS[generator]
+    started = time.perf_counter()
+    for offset in range(0, docs, batch_size):
+        batch = [_entry(make_id(), i) for i in range(offset, min(offset + batch_size, docs))]
+        if binary_pk:
+            for doc in batch:
+                doc["_id"] = to_storage_id(doc.pop("id"))
+        await collection.insert_many(batch, ordered=False)
+    elapsed = time.perf_counter() - started
+
+    stats = await bench_db.command("collStats", name)
+    return {
+        "case": name,
+        "docs_per_second": round(docs / elapsed),
+        "total_index_bytes": stats["totalIndexSize"],
+        "index_sizes": stats["indexSizes"],
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Insert throughput and index size: uuid4 vs uuid7 ids")
+    parser.add_argument("--docs", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark database afterwards")
+    args = parser.parse_args()
+    try:
+        for generator in ("uuid4", "uuid7"):
+            for binary_pk in (False, True):
+                result = await run_case(generator, binary_pk, args.docs, args.batch_size)
+                print(f"{result['case']:<24} {result['docs_per_second']:>10} docs/s  "
+                      f"indexes {result['total_index_bytes'] / 1024 / 1024:8.1f} MiB  {result['index_sizes']}")
+        if not args.keep:
+            await client.drop_database(BENCH_DB)
+    finally:
+        await close_db_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+# Drives role mixes against the API and reports throughput and latency percentiles per
+# endpoint. By default the app runs in-process (httpx ASGI transport, lifespan included);
+# --uvicorn starts it under uvicorn, --url targets a server that is already running.
+# Fixture users, matches and practice data are written to DB_NAME on MONGO_URL, which must
+# be a local mongod. DB_NAME must start with "load_test" and not exist yet: the run creates
+# it and drops it afterwards.
+#   DB_NAME=load_test python -m benchmarks.load_test --duration 30 --concurrency 50
+#   ... --mix teacher=6,parent=3,student=3,admin=1 --save-baseline load_baseline.json
+#   ... --baseline load_baseline.json --tolerance 0.2   (exits 1 on a regression)
+
+# Access records for every request would drown the report; set ACCESS_LOG_ENABLED=true to keep them
+os.environ.setdefault("ACCESS_LOG_ENABLED", "false")
+
+import httpx
+from database import db, client, raw_db, close_db_connection
+from models import User, UserRole, ApprovalStatus, StudentTeacherMatch, ParentStudentRelation, QuestionEntry, ExamAnalysis
+from utils import create_access_token, pwd_context, calculate_net
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SUBJECTS = ["Matematik", "Türkçe", "Fizik", "Kimya", "Biyoloji", "Tarih", "Coğrafya"]
+DEFAULT_MIX = "teacher=6,parent=3,student=3,admin=1"
+THROWAWAY_DB_PREFIX = "load_test"
+
+class Fixture:
+    def __init__(self):
+        self.teachers = []
+        self.students_by_teacher = {}
+        self.teacher_of = {}
+        self.parent_of = {}
+        self.admin_id = "load-test-admin"
+
+    def token(self, user_id: str, role: UserRole) -> dict:
+        return {"Authorization": "Bearer " + create_access_token({"user_id": user_id, "role": role.value})}
+
+def _user(role: UserRole, n: int, password_hash: str) -> dict:
+    return User(
+        email=f"{role.value}{n}@loadtest.example.com",
+        password=password_hash,
+        full_name=f"{role.value.title()} {n}",
+        role=role,
+        approval_status=ApprovalStatus.APPROVED,
+        school="Load Test Lisesi",
+    ).model_dump()
+
+async def create_fixture(teachers: int, students_per_teacher: int, entries_per_student: int, seed: int) -> Fixture:
+    rng = random.Random(seed)
+    fixture = Fixture()
+    password_hash = pwd_context.hash("load-test")
+    users, matches, relations, entries, analyses = [], [], [], [], []
+    for t in range(teachers):
+        teacher = _user(UserRole.TEACHER, t, password_hash)
+        users.append(teacher)
+        fixture.teachers.append(teacher['id'])
+        fixture.students_by_teacher[teacher['id']] = []
+        for s in range(students_per_teacher):
+            n = t * students_per_teacher + s
+            student = _user(UserRole.STUDENT, n, password_hash)
+            parent = _user(UserRole.PARENT, n, password_hash)
+            users += [student, parent]
+            fixture.students_by_teacher[teacher['id']].append(student['id'])
+            fixture.teacher_of[student['id']] = teacher['id']
+            fixture.parent_of[student['id']] = parent['id']
+            matches.append(StudentTeacherMatch(student_id=student['id'], teacher_id=teacher['id']).model_dump())
+            relations.append(ParentStudentRelation(parent_id=parent['id'], student_id=student['id']).model_dump())
+            for _ in range(entries_per_student):
+                correct = rng.randint(0, 40)
+                wrong = rng.randint(0, 40 - correct)
+                entries.append(QuestionEntry(
+                    student_id=student['id'], teacher_id=teacher['id'], exam_type="TYT", subject=rng.choice(SUBJECTS),
+                    total_questions=40, correct_answers=correct, wrong_answers=wrong, empty_answers=40 - correct - wrong,
+                    net_score=calculate_net(correct, wrong)
+                ).model_dump())
+            for e in range(3):
+                subjects = []
+                for subject in SUBJECTS[:4]:
+                    correct, wrong = rng.randint(5, 30), rng.randint(0, 10)
+                    subjects.append({"name": subject, "correct": correct, "wrong": wrong, "net": calculate_net(correct, wrong)})
+                analyses.append(ExamAnalysis(
+                    student_id=student['id'], teacher_id=teacher['id'], exam_type="TYT", exam_name=f"Deneme {e + 1}",
+                    exam_date=datetime.now(timezone.utc) - timedelta(days=7 * e),
+                    subjects=subjects, total_net=sum(s['net'] for s in subjects)
+                ).model_dump())
+    for collection, docs in (("users", users), ("matches", matches), ("parent_student_relations", relations),
+                             ("question_entries", entries), ("exam_analyses", analyses)):
+        if docs:
+            await db[collection].insert_many(docs, ordered=False)
+    return fixture
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(self, api: httpx.AsyncClient, method: str, label: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await api.request(method, url, **kwargs)
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            failed = True
+        self.latencies[label].append(time.perf_counter() - started)
+        if failed:
+            self.errors[label] += 1
+
+# Role scenarios: one user session each, picked per iteration according to the mix
+async def teacher_burst(api, stats: Stats, fixture: Fixture, rng: random.Random):
+    teacher_id = rng.choice(fixture.teachers)
+    student_id = rng.choice(fixture.students_by_teacher[teacher_id])
+    headers = fixture.token(teacher_id, UserRole.TEACHER)
+    for _ in range(rng.randint(3, 8)):
+        correct = rng.randint(0, 40)
+        await stats.request(api, "POST", "POST /teacher/question-entry", "/teacher/question-entry", headers=headers, json={
+            "student_id": student_id, "exam_type": "TYT", "subject": rng.choice(SUBJECTS),
+            "total_questions": 40, "correct_answers": correct, "wrong_answers": 40 - correct,
+        })
+    await stats.request(api, "GET", "GET /teacher/question-entries/{student_id}", f"/teacher/question-entries/{student_id}", headers=headers)
+    await stats.request(api, "GET", "GET /teacher/exam-analysis-summary/{student_id}", f"/teacher/exam-analysis-summary/{student_id}", headers=headers)
+    await stats.request(api, "GET", "GET /teacher/students", "/teacher/students", headers=headers)
+
+async def parent_dashboard(api, stats: Stats, fixture: Fixture, rng: random.Random):
+    student_id = rng.choice(list(fixture.parent_of))
+    headers = fixture.token(fixture.parent_of[student_id], UserRole.PARENT)
+    await stats.request(api, "GET", "GET /parent/my-children", "/parent/my-children", headers=headers)
+    await stats.request(api, "GET", "GET /parent/child-question-entries/{student_id}", f"/parent/child-question-entries/{student_id}", headers=headers)
+    await stats.request(api, "GET", "GET /parent/child-exam-analyses/{student_id}", f"/parent/child-exam-analyses/{student_id}", headers=headers)
+    await stats.request(api, "GET", "GET /statistics/overview/{student_id}", f"/statistics/overview/{student_id}", headers=headers)
+
+async def student_dashboard(api, stats: Stats, fixture: Fixture, rng: random.Random):
+    student_id = rng.choice(list(fixture.teacher_of))
+    headers = fixture.token(student_id, UserRole.STUDENT)
+    await stats.request(api, "GET", "GET /student/my-teacher", "/student/my-teacher", headers=headers)
+    await stats.request(api, "GET", "GET /student/my-question-entries", "/student/my-question-entries", headers=headers)
+    await stats.request(api, "GET", "GET /student/my-exam-analyses", "/student/my-exam-analyses", headers=headers)
+
+async def admin_reports(api, stats: Stats, fixture: Fixture, rng: random.Random):
+    headers = fixture.token(fixture.admin_id, UserRole.ADMIN)
+    await stats.request(api, "GET", "GET /admin/reports", "/admin/reports", headers=headers)
+    await stats.request(api, "GET", "GET /admin/students", "/admin/students", headers=headers)
+
+SCENARIOS = {
+    "teacher": teacher_burst,
+    "parent": parent_dashboard,
+    "student": student_dashboard,
+    "admin": admin_reports,
+}
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+async def run_load(api, fixture: Fixture, mix: dict, concurrency: int, duration: float, seed: int):
+    stats = Stats()
+    names, weights = list(mix), list(mix.values())
+    deadline = time.perf_counter() + duration
+
+    async def worker(n: int):
+        rng = random.Random(seed + n)
+        while time.perf_counter() < deadline:
+            await SCENARIOS[rng.choices(names, weights)[0]](api, stats, fixture, rng)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker(n) for n in range(concurrency)])
+    return stats, time.perf_counter() - started
+
+def percentile(sorted_values: list, q: float) -> float:
+    # Nearest rank
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+def summarize(stats: Stats, elapsed: float) -> dict:
+    report = {}
+    for label, latencies in sorted(stats.latencies.items()):
+        latencies.sort()
+        report[label] = {
+            "requests": len(latencies),
+            "errors": stats.errors[label],
+            "rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        }
+    return report
+
+def print_report(report: dict, elapsed: float):
+    print(f"{'endpoint':<52} {'reqs':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, row in report.items():
+        print(f"{label:<52} {row['requests']:>7} {row['errors']:>5} {row['rps']:>8} "
+              f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}")
+    total = sum(row['requests'] for row in report.values())
+    print(f"{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> list:
+    found = []
+    for label, base in baseline.items():
+        row = report.get(label)
+        if row is None:
+            continue
+        if row['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            found.append(f"{label}: p95 {row['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if row['rps'] < base['rps'] * (1 - tolerance):
+            found.append(f"{label}: {row['rps']} req/s vs baseline {base['rps']} req/s")
+        if row['errors'] > base['errors']:
+            found.append(f"{label}: {row['errors']} errors vs baseline {base['errors']}")
+    return found
+
+async def check_database():
+    # The fixture database is dropped afterwards, so never touch one this run did not create
+    if not raw_db.name.startswith(THROWAWAY_DB_PREFIX):
+        sys.exit(f"DB_NAME={raw_db.name} is not a throwaway database; use a name starting with {THROWAWAY_DB_PREFIX}")
+    if raw_db.name in await client.list_database_names():
+        sys.exit(f"Database {raw_db.name} already exists; drop it or choose another DB_NAME")
+
+@asynccontextmanager
+async def api_client(args):
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as api:
+            yield api
+    elif args.uvicorn:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=BACKEND_DIR
+        )
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}/api", timeout=60) as api:
+                for _ in range(100):
+                    try:
+                        await api.get("/subjects")
+                        break
+                    except httpx.TransportError:
+                        await asyncio.sleep(0.2)
+                yield api
+        finally:
+            process.terminate()
+            process.wait()
+    else:
+        from server import app
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://load-test/api", timeout=60) as api:
+                yield api
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test the API with role mixes and compare against a baseline")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of load")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent simulated users")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Scenario weights (default {DEFAULT_MIX})")
+    parser.add_argument("--teachers", type=int, default=20)
+    parser.add_argument("--students-per-teacher", type=int, default=15)
+    parser.add_argument("--entries-per-student", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", help="Base URL of a running server, e.g. http://127.0.0.1:8001/api")
+    parser.add_argument("--uvicorn", action="store_true", help="Start the app under uvicorn")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--baseline", help="Fail on regressions against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95/throughput regression (fraction)")
+    parser.add_argument("--save-baseline", help="Write the results to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the fixture database afterwards")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    created = False
+    try:
+        await check_database()
+        created = True
+        fixture = await create_fixture(args.teachers, args.students_per_teacher, args.entries_per_student, args.seed)
+        async with api_client(args) as api:
+            stats, elapsed = await run_load(api, fixture, mix, args.concurrency, args.duration, args.seed)
+        report = summarize(stats, elapsed)
+        print_report(report, elapsed)
+        if args.save_baseline:
+            Path(args.save_baseline).write_text(json.dumps(report, indent=2) + "\n")
+        if args.baseline:
+            found = regressions(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+            for regression in found:
+                print(f"REGRESSION {regression}")
+            if found:
+                sys.exit(1)
+    finally:
+        if created and not args.keep:
+            await client.drop_database(raw_db.name)
+        await close_db_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,343 @@
+import argparse
+import asyncio
+import random
+import sys
+import time
+import uuid
+from itertools import accumulate
+from datetime import datetime, timezone, timedelta
+from config import ID_GENERATOR, QUESTION_ENTRIES_TIMESERIES
+from database import db, client, raw_db, ensure_indexes, ensure_timeseries_collection, close_db_connection
+from migrations.runner import MIGRATIONS_COLLECTION
+from models import (
+    User, UserRole, ApprovalStatus, StudentTeacherMatch, ParentStudentRelation, QuestionEntry, ExamAnalysis,
+    ResourceTracking, Notification
+)
+from utils import pwd_context, calculate_net
+
+# Generates a scale-testing dataset shaped like models.py into DB_NAME: teachers with a
+# skewed (Pareto) number of students, one or two parents per family, and practice history
+# proportional to each student's tenure, a few of whom have been around for years. The
+# same --seed and --as-of always produce the same documents and ids. Documents are built
+# per student and written by --writers concurrent insert_many batches; indexes are built
+# once loading has finished. Every account's password is --password.
+# Run against a local mongod and a throwaway database:
+#   DB_NAME=scale python -m benchmarks.seed_dataset --teachers 2000 --students 200000 --entries 10000000 --drop
+# Entries older than ARCHIVE_HORIZON_DAYS stay hot until the archive job runs.
+
+# --drop only drops databases named like this
+THROWAWAY_DB_PREFIX = "scale"
+
+SUBJECTS = {
+    "TYT": ["Türkçe", "Matematik", "Fizik", "Kimya", "Biyoloji", "Tarih", "Coğrafya", "Felsefe", "Din Kültürü"],
+    "AYT": ["Matematik", "Fizik", "Kimya", "Biyoloji", "Edebiyat", "Tarih", "Coğrafya"],
+    "LGS": ["Türkçe", "Matematik", "Fen Bilimleri", "İnkılap Tarihi", "Din Kültürü", "İngilizce"],
+    "KPSS": ["Türkçe", "Matematik", "Tarih", "Coğrafya", "Vatandaşlık", "Güncel Bilgiler"],
+}
+# grade -> (weight, exam types practiced)
+GRADES = {
+    "8": (0.25, ["LGS"]),
+    "11": (0.25, ["TYT"]),
+    "12": (0.35, ["TYT", "AYT"]),
+    "Mezun": (0.15, ["TYT", "AYT", "KPSS"]),
+}
+SCHOOLS = [f"{name} Lisesi" for name in ("Atatürk", "Cumhuriyet", "Fatih", "Kadıköy", "Bornova", "Çankaya", "Nilüfer", "Karşıyaka")]
+RESOURCES = ["Soru Bankası", "Konu Anlatımı", "Deneme Seti", "Yaprak Test", "Video Ders"]
+RESOURCE_STATUSES = ["not_started", "in_progress", "completed"]
+NOTIFICATION_TYPES = [("assignment", "Yeni Ödev"), ("exam", "Deneme Sonucu"), ("approval", "Hesabınız Onaylandı")]
+QUESTION_COUNTS = [10, 20, 30, 40]
+MAX_TENURE_DAYS = 5 * 365
+
+def _id(rng: random.Random, at: datetime) -> str:
+    # Same id scheme as new_id(), but drawn from the seeded generator; uuid7 ids carry the
+    # document's own timestamp so the id index has realistic locality
+    bits = rng.getrandbits(128)
+    if ID_GENERATOR == "uuid7":
+        ms = int(at.timestamp() * 1000) & ((1 << 48) - 1)
+        return str(uuid.UUID(int=ms << 80 | 0x7 << 76 | (bits >> 64 & 0xFFF) << 64 | 0b10 << 62 | bits & ((1 << 62) - 1)))
+    return str(uuid.UUID(int=bits, version=4))
+
+def _tenure_days(rng: random.Random) -> int:
+    # Most students joined this school year; about one in ten has been around for years
+    if rng.random() < 0.1:
+        return rng.randint(2 * 365, MAX_TENURE_DAYS)
+    return min(MAX_TENURE_DAYS, 14 + int(rng.expovariate(1 / 180)))
+
+def _user(rng: random.Random, role: UserRole, n: int, password: str, created_at: datetime, **fields) -> dict:
+    return {
+        "id": _id(rng, created_at),
+        "email": f"{role.value}{n}@seed.example.com",
+        "password": password,
+        "full_name": f"{role.value.title()} {n}",
+        "role": role.value,
+        "approval_status": ApprovalStatus.APPROVED.value,
+        "school": fields.get("school"),
+        "grade": fields.get("grade"),
+        "birth_date": None,
+        "phone": None,
+        "address": None,
+        "goal": fields.get("goal"),
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+def _question_entry(rng: random.Random, student: dict, ability: float, at: datetime) -> dict:
+    exam_type = rng.choice(student["exam_types"])
+    total = rng.choice(QUESTION_COUNTS)
+    correct = round(total * min(1.0, max(0.0, rng.gauss(ability, 0.15))))
+    wrong = round((total - correct) * rng.uniform(0.3, 0.9))
+    return {
+        "id": _id(rng, at),
+        "student_id": student["id"],
+        "teacher_id": student["teacher_id"],
+        "exam_type": exam_type,
+        "subject": rng.choice(SUBJECTS[exam_type]),
+        "total_questions": total,
+        "correct_answers": correct,
+        "wrong_answers": wrong,
+        "empty_answers": total - correct - wrong,
+        "net_score": calculate_net(correct, wrong),
+        "date": at,
+        "notes": None,
+    }
+
+def _exam_analysis(rng: random.Random, student: dict, ability: float, at: datetime, n: int) -> dict:
+    exam_type = rng.choice(student["exam_types"])
+    subjects = []
+    for name in SUBJECTS[exam_type]:
+        total = rng.choice(QUESTION_COUNTS)
+        correct = round(total * min(1.0, max(0.0, rng.gauss(ability, 0.1))))
+        wrong = round((total - correct) * rng.uniform(0.3, 0.9))
+        subjects.append({"name": name, "correct": correct, "wrong": wrong, "empty": total - correct - wrong,
+                         "net": calculate_net(correct, wrong)})
+    return {
+        "id": _id(rng, at),
+        "student_id": student["id"],
+        "teacher_id": student["teacher_id"],
+        "exam_type": exam_type,
+        "exam_name": f"{exam_type} Deneme {n}",
+        "exam_date": at,
+        "subjects": subjects,
+        "total_net": round(sum(s["net"] for s in subjects), 2),
+        "notes": None,
+        "created_at": at,
+    }
+
+def _resource(rng: random.Random, student: dict, at: datetime) -> dict:
+    exam_type = rng.choice(student["exam_types"])
+    subject = rng.choice(SUBJECTS[exam_type])
+    status = rng.choice(RESOURCE_STATUSES)
+    return {
+        "id": _id(rng, at),
+        "student_id": student["id"],
+        "teacher_id": student["teacher_id"],
+        "resource_name": f"{subject} {rng.choice(RESOURCES)}",
+        "subject": subject,
+        "topic": f"Ünite {rng.randint(1, 12)}",
+        "status": status,
+        "completed_date": at + timedelta(days=rng.randint(7, 60)) if status == "completed" else None,
+        "created_at": at,
+    }
+
+def _notification(rng: random.Random, user_id: str, at: datetime, as_of: datetime) -> dict:
+    kind, title = rng.choice(NOTIFICATION_TYPES)
+    return {
+        "id": _id(rng, at),
+        "user_id": user_id,
+        "title": title,
+        "message": f"{title} ({at:%d.%m.%Y})",
+        "type": kind,
+        # Recent notifications are the unread ones
+        "read": (as_of - at).days > 7 or rng.random() < 0.3,
+        "created_at": at,
+    }
+
+# collection -> model its documents must match
+MODELS = {
+    "users": User,
+    "matches": StudentTeacherMatch,
+    "parent_student_relations": ParentStudentRelation,
+    "question_entries": QuestionEntry,
+    "exam_analyses": ExamAnalysis,
+    "resource_tracking": ResourceTracking,
+    "notifications": Notification,
+}
+
+class BatchWriter:
+    def __init__(self, writers: int, batch_size: int):
+        self.batch_size = batch_size
+        self.batches = {}
+        self.counts = dict.fromkeys(MODELS, 0)
+        self.queue = asyncio.Queue(maxsize=writers * 2)
+        self.error = None
+        self.tasks = [asyncio.create_task(self._write()) for _ in range(writers)]
+
+    async def add(self, collection: str, doc: dict):
+        if self.error is not None:
+            raise self.error
+        batch = self.batches.setdefault(collection, [])
+        batch.append(doc)
+        if len(batch) >= self.batch_size:
+            await self._flush(collection)
+
+    async def _flush(self, collection: str):
+        batch = self.batches.pop(collection, None)
+        if not batch:
+            return
+        # One document per batch is checked against its model, so the generators cannot drift from models.py
+        model = MODELS[collection]
+        assert set(batch[0]) == set(model.model_fields), f"{collection} fields differ from {model.__name__}"
+        model.model_validate(batch[0])
+        await self.queue.put((collection, batch))
+
+    async def _write(self):
+        while True:
+            collection, batch = await self.queue.get()
+            try:
+                if self.error is None:
+                    await db[collection].insert_many(batch, ordered=False)
+                    self.counts[collection] += len(batch)
+            except Exception as e:
+                # Surfaced by the next add() or close(); later batches are drained unwritten
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    async def close(self):
+        for collection in list(self.batches):
+            await self._flush(collection)
+        await self.queue.join()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.error is not None:
+            raise self.error
+
+async def seed(args) -> dict:
+    as_of = datetime.fromisoformat(args.as_of).replace(tzinfo=timezone.utc) if args.as_of else \
+        datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    rng = random.Random(args.seed)
+    password = pwd_context.hash(args.password)
+    writer = BatchWriter(args.writers, args.batch_size)
+
+    teachers = []
+    for n in range(args.teachers):
+        created_at = as_of - timedelta(days=rng.randint(0, MAX_TENURE_DAYS))
+        teacher = _user(rng, UserRole.TEACHER, n, password, created_at, school=rng.choice(SCHOOLS))
+        teachers.append(teacher)
+        await writer.add("users", teacher)
+    # Pareto weights: most teachers have a handful of students, a few have hundreds
+    teacher_weights = list(accumulate(rng.paretovariate(1.2) for _ in teachers))
+
+    students = []
+    for n in range(args.students):
+        tenure = _tenure_days(rng)
+        grade = rng.choices(list(GRADES), [w for w, _ in GRADES.values()])[0]
+        teacher = rng.choices(teachers, cum_weights=teacher_weights)[0]
+        joined = as_of - timedelta(days=tenure)
+        student = _user(rng, UserRole.STUDENT, n, password, joined, school=teacher["school"], grade=grade,
+                        goal=rng.choice([None, "Tıp", "Mühendislik", "Hukuk", "Öğretmenlik"]))
+        await writer.add("users", student)
+        await writer.add("matches", {
+            "id": _id(rng, joined), "student_id": student["id"], "teacher_id": teacher["id"], "created_at": joined,
+        })
+        students.append({
+            "id": student["id"], "teacher_id": teacher["id"], "joined": joined, "tenure": tenure,
+            "exam_types": GRADES[grade][1], "activity": rng.lognormvariate(0, 0.8),
+        })
+
+    parents = 0
+    previous = None
+    for student in students:
+        # Roughly one family in ten has a sibling already seeded; they share the parents
+        if previous is not None and rng.random() < 0.1:
+            family = previous
+        else:
+            family = []
+            for _ in range(1 if rng.random() < 0.7 else 2):
+                parent = _user(rng, UserRole.PARENT, parents, password, student["joined"])
+                parents += 1
+                family.append(parent["id"])
+                await writer.add("users", parent)
+        for parent_id in family:
+            await writer.add("parent_student_relations", {
+                "id": _id(rng, student["joined"]), "parent_id": parent_id, "student_id": student["id"],
+                "relation_type": "parent", "created_at": student["joined"],
+            })
+        student["parents"] = family
+        previous = family
+
+    # Practice volume follows tenure times a per-student activity level
+    total_weight = sum(s["tenure"] * s["activity"] for s in students) or 1
+    started = time.perf_counter()
+    for i, student in enumerate(students):
+        student_rng = random.Random(f"{args.seed}:{student['id']}")
+        ability = student_rng.betavariate(2.5, 2.5)
+        tenure = student["tenure"]
+        entries = round(args.entries * student["tenure"] * student["activity"] / total_weight)
+        for _ in range(entries):
+            days_ago = student_rng.uniform(0, tenure)
+            # Ability improves over the student's time with us
+            progress = 1 - days_ago / tenure
+            at = as_of - timedelta(days=days_ago)
+            await writer.add("question_entries", _question_entry(student_rng, student, min(0.95, ability + 0.2 * progress), at))
+        for n in range(max(1, tenure // args.exam_interval_days)):
+            at = student["joined"] + timedelta(days=n * args.exam_interval_days + student_rng.randint(0, 6))
+            await writer.add("exam_analyses", _exam_analysis(student_rng, student, ability, at, n + 1))
+        for _ in range(student_rng.randint(1, max(1, args.resources_per_student * 2 - 1))):
+            await writer.add("resource_tracking", _resource(student_rng, student, student["joined"] + timedelta(days=student_rng.uniform(0, tenure))))
+        for user_id in [student["id"], *student["parents"]]:
+            for _ in range(round(student_rng.expovariate(1 / args.notifications_per_user))):
+                await writer.add("notifications", _notification(student_rng, user_id, as_of - timedelta(days=student_rng.uniform(0, tenure)), as_of))
+        if (i + 1) % 10000 == 0:
+            written = writer.counts["question_entries"]
+            print(f"{i + 1}/{len(students)} students, {written} entries ({written / (time.perf_counter() - started):.0f}/s)")
+
+    await writer.close()
+    return writer.counts
+
+async def check_drop():
+    if not raw_db.name.startswith(THROWAWAY_DB_PREFIX):
+        sys.exit(f"DB_NAME={raw_db.name} is not a throwaway database; --drop needs a name starting with {THROWAWAY_DB_PREFIX}")
+    # Migrations are only ever run against a real application database
+    if await raw_db[MIGRATIONS_COLLECTION].find_one({}, {"_id": 1}):
+        sys.exit(f"Database {raw_db.name} has schema migrations applied; refusing to drop it")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Seed a deterministic synthetic dataset for scale testing")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--as-of", help="Date the dataset ends at (YYYY-MM-DD, default today); fix it for identical re-runs")
+    parser.add_argument("--teachers", type=int, default=200)
+    parser.add_argument("--students", type=int, default=20000)
+    parser.add_argument("--entries", type=int, default=1000000, help="Approximate number of question entries")
+    parser.add_argument("--exam-interval-days", type=int, default=30, help="Days between a student's practice exams")
+    parser.add_argument("--resources-per-student", type=int, default=4, help="Average resources tracked per student")
+    parser.add_argument("--notifications-per-user", type=float, default=10, help="Average notifications per student and parent")
+    parser.add_argument("--password", default="seed-password", help="Password of every seeded account")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--writers", type=int, default=8, help="Concurrent insert_many batches")
+    parser.add_argument("--drop", action="store_true", help=f"Drop the database first (DB_NAME must start with {THROWAWAY_DB_PREFIX})")
+    parser.add_argument("--no-indexes", action="store_true", help="Skip building indexes after loading")
+    args = parser.parse_args()
+
+    try:
+        if args.drop:
+            await check_drop()
+            await client.drop_database(raw_db.name)
+        if QUESTION_ENTRIES_TIMESERIES:
+            await ensure_timeseries_collection()
+        started = time.perf_counter()
+        counts = await seed(args)
+        loaded = time.perf_counter() - started
+        for collection, count in counts.items():
+            print(f"{collection:<28} {count:>12}")
+        print(f"{sum(counts.values())} documents in {loaded:.1f}s ({sum(counts.values()) / loaded:.0f}/s)")
+        if not args.no_indexes:
+            started = time.perf_counter()
+            await ensure_indexes()
+            print(f"indexes built in {time.perf_counter() - started:.1f}s")
+    finally:
+        await close_db_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+import random
+from datetime import datetime, timezone, timedelta
+import pytest
+from fastapi.encoders import jsonable_encoder
+from models import UserResponse, QuestionEntry
+from utils import parse_datetime, calculate_net
+from archive import merge_subject_stats
+from routes.teacher import summarize_exam_analyses, suggest_schedule
+
+# CPU cost of the per-document work in models.py and routes/*.py on fixed-size synthetic
+# inputs, measured with pytest-benchmark:
+#   python -m pytest benchmarks/test_hot_paths.py --benchmark-json benchmark-$(git rev-parse --short HEAD).json
+# --benchmark-autosave and --benchmark-compare keep the history.
+
+DOCS = 1000
+SUBJECTS = ["Türkçe", "Matematik", "Fizik", "Kimya", "Biyoloji", "Tarih", "Coğrafya", "Felsefe", "Din Kültürü"]
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+@pytest.fixture(scope="module")
+def rng():
+    return random.Random(0)
+
+@pytest.fixture(scope="module")
+def users(rng):
+    return [{
+        "id": f"user-{i}",
+        "email": f"student{i}@example.com",
+        "password": "$2b$12$" + "x" * 53,
+        "full_name": f"Student {i}",
+        "role": "student",
+        "approval_status": "approved",
+        "school": "Atatürk Lisesi",
+        "grade": "12",
+        "created_at": NOW - timedelta(days=rng.randint(0, 1000)),
+        "updated_at": NOW,
+    } for i in range(DOCS)]
+
+@pytest.fixture(scope="module")
+def entries(rng):
+    result = []
+    for i in range(DOCS):
+        correct = rng.randint(0, 40)
+        wrong = rng.randint(0, 40 - correct)
+        result.append(QuestionEntry(
+            student_id="student-1", teacher_id="teacher-1", exam_type="TYT", subject=rng.choice(SUBJECTS),
+            total_questions=40, correct_answers=correct, wrong_answers=wrong, empty_answers=40 - correct - wrong,
+            net_score=calculate_net(correct, wrong), date=NOW - timedelta(hours=i)
+        ).model_dump())
+    return result
+
+@pytest.fixture(scope="module")
+def analyses(rng):
+    result = []
+    for i in range(200):
+        subjects = []
+        for name in SUBJECTS:
+            correct, wrong = rng.randint(5, 30), rng.randint(0, 10)
+            subjects.append({"name": name, "correct": correct, "wrong": wrong, "net": calculate_net(correct, wrong)})
+        result.append({
+            "id": f"analysis-{i}", "student_id": "student-1", "teacher_id": "teacher-1", "exam_type": "TYT",
+            "exam_name": f"Deneme {i}", "exam_date": NOW - timedelta(days=i), "subjects": subjects,
+            "total_net": sum(s["net"] for s in subjects), "notes": None, "created_at": NOW - timedelta(days=i),
+        })
+    return result
+
+def test_user_response_per_document(benchmark, users):
+    # As in the list endpoints: one UserResponse per user document
+    def build():
+        return [UserResponse(
+            id=u['id'],
+            email=u['email'],
+            full_name=u['full_name'],
+            role=u['role'],
+            approval_status=u['approval_status'],
+            created_at=parse_datetime(u['created_at'])
+        ) for u in users]
+
+    assert len(benchmark(build)) == DOCS
+
+def test_question_entry_model_dump(benchmark, entries):
+    # The write path: validate into the model, then dump for insert
+    def write():
+        return [QuestionEntry(**e).model_dump() for e in entries]
+
+    assert benchmark(write) == entries
+
+def test_parse_datetime_native(benchmark, users):
+    values = [u['created_at'] for u in users]
+    assert benchmark(lambda: [parse_datetime(v) for v in values]) == values
+
+def test_parse_datetime_legacy_strings(benchmark, users):
+    # Documents written before the BSON datetime migration
+    values = [u['created_at'].isoformat() for u in users]
+    assert benchmark(lambda: [parse_datetime(v) for v in values])[0] == users[0]['created_at']
+
+def test_jsonable_encoder_entries(benchmark, entries):
+    # Response encoding of endpoints that return raw documents
+    encoded = benchmark(jsonable_encoder, entries)
+    assert encoded[0]['date'] == entries[0]['date'].isoformat()
+
+def test_exam_analysis_summary(benchmark, analyses):
+    summary = benchmark(summarize_exam_analyses, analyses)
+    assert summary['total_exams'] == len(analyses)
+    assert set(summary['subject_performance']) == set(SUBJECTS)
+
+def test_suggested_schedule(benchmark, entries):
+    rollups = [{"subject": s, "count": 30, "total_questions": 1200, "correct_answers": 700, "wrong_answers": 300,
+                "empty_answers": 200, "net_score": 600.0} for s in SUBJECTS]
+
+    def suggest():
+        return suggest_schedule(merge_subject_stats(entries, rollups))
+
+    assert len(benchmark(suggest)) == 7
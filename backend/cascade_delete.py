@@ -0,0 +1,72 @@
+import asyncio
+from config import CASCADE_DELETE_BATCH_SIZE, CASCADE_DELETE_PAUSE_SECONDS
+from database import db, TIMESERIES_COLLECTIONS
+from jobs import job_handler, report_progress
+
+# Collection -> fields that reference a user. Practice data is owned by the student;
+# records a deleted teacher wrote for a remaining student stay part of that student's history.
+USER_OWNED_COLLECTIONS = {
+    "matches": ["student_id", "teacher_id"],
+    "parent_student_relations": ["parent_id", "student_id"],
+    "question_entries": ["student_id"],
+    "exam_analyses": ["student_id"],
+    "assignments": ["student_id"],
+    "study_schedules": ["student_id"],
+    "weekly_schedules": ["student_id"],
+    "resource_tracking": ["student_id"],
+    "resources_with_topics": ["student_id"],
+    "question_entries_archive": ["student_id"],
+    "exam_analyses_archive": ["student_id"],
+    "practice_rollups": ["student_id"],
+    "exam_rollups": ["student_id"],
+    "notifications": ["user_id"],
+}
+
+async def _delete_in_batches(collection: str, query: dict):
+    if collection in TIMESERIES_COLLECTIONS:
+        async for count in _delete_series(collection, query):
+            yield count
+        return
+    # Delete by id in bounded batches so one huge cascade never becomes a single long write
+    while True:
+        docs = await db[collection].find(query, {"_id": 0, "id": 1}).limit(CASCADE_DELETE_BATCH_SIZE).to_list(None)
+        if not docs:
+            return
+        result = await db[collection].delete_many({"id": {"$in": [d['id'] for d in docs]}})
+        yield result.deleted_count
+        if CASCADE_DELETE_PAUSE_SECONDS:
+            await asyncio.sleep(CASCADE_DELETE_PAUSE_SECONDS)
+
+async def _delete_series(collection: str, query: dict):
+    # Time-series deletes can't select by id, so the owner's entries go one series
+    # (teacher, subject: the metaField) at a time
+    for teacher_id in await db[collection].distinct("teacher_id", query):
+        for subject in await db[collection].distinct("subject", {**query, "teacher_id": teacher_id}):
+            result = await db[collection].delete_many({**query, "teacher_id": teacher_id, "subject": subject})
+            yield result.deleted_count
+            if CASCADE_DELETE_PAUSE_SECONDS:
+                await asyncio.sleep(CASCADE_DELETE_PAUSE_SECONDS)
+    # Entries without a teacher or subject
+    result = await db[collection].delete_many(query)
+    yield result.deleted_count
+
+@job_handler("cascade_delete_user")
+async def cascade_delete_user(job: dict) -> dict:
+    user_id = job['params']['user_id']
+    targets = [
+        (collection, {fields[0]: user_id} if len(fields) == 1 else {"$or": [{field: user_id} for field in fields]})
+        for collection, fields in USER_OWNED_COLLECTIONS.items()
+    ]
+
+    counts = await asyncio.gather(*[db[c].count_documents(q) for c, q in targets])
+    total = sum(counts)
+    deleted = {}
+    done = 0
+    for collection, query in targets:
+        deleted[collection] = 0
+        async for count in _delete_in_batches(collection, query):
+            deleted[collection] += count
+            done += count
+            await report_progress(job['id'], done, total, collection=collection)
+
+    return {"user_id": user_id, "deleted": deleted}
@@ -8,6 +8,48 @@ load_dotenv(ROOT_DIR / '.env')
 # Database Configuration
 MONGO_URL = os.environ['MONGO_URL']
 DB_NAME = os.environ['DB_NAME']
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '0'))
+# Milliseconds a request waits for a free pooled connection before failing (0 = wait indefinitely)
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '0'))
+# Wire compression in order of preference, e.g. "zstd,snappy,zlib" (empty = uncompressed)
+MONGO_COMPRESSORS = os.environ.get('MONGO_COMPRESSORS', '')
+# Connections opened at startup so the first requests don't pay for the handshakes (0 = off)
+MONGO_WARMUP_CONNECTIONS = int(os.environ.get('MONGO_WARMUP_CONNECTIONS', '10'))
+
+# Read preference per router, e.g. READ_PREFERENCE_PARENT=secondaryPreferred. Unset routers read
+# from the primary. Max staleness applies to non-primary modes (-1 = no limit, otherwise >= 90).
+READ_PREFERENCES = {
+    key[len('READ_PREFERENCE_'):].lower(): value
+    for key, value in os.environ.items() if key.startswith('READ_PREFERENCE_') and value
+}
+READ_MAX_STALENESS_SECONDS = int(os.environ.get('READ_MAX_STALENESS_SECONDS', '-1'))
+
+# Routers whose requests run in a causally consistent session, so reads see the request's own
+# writes (and, via the X-Causal-Token header, writes from the client's previous request)
+CAUSAL_SESSION_ROUTERS = [r for r in os.environ.get('CAUSAL_SESSION_ROUTERS', 'teacher').split(',') if r]
+
+# Match ISO-string timestamps in date range queries until the BSON datetime migration has run
+DATETIME_DUAL_READ = os.environ.get('DATETIME_DUAL_READ', 'true').lower() == 'true'
+
+# Store the application id as a binary UUID _id (run migrations/id_primary_key.py first)
+ID_AS_PRIMARY_KEY = os.environ.get('ID_AS_PRIMARY_KEY', 'false').lower() == 'true'
+
+# Store question entries in a time-series collection (run migrations/question_entries_timeseries.py first)
+QUESTION_ENTRIES_TIMESERIES = os.environ.get('QUESTION_ENTRIES_TIMESERIES', 'false').lower() == 'true'
+QUESTION_ENTRIES_TIMESERIES_COLLECTION = os.environ.get('QUESTION_ENTRIES_TIMESERIES_COLLECTION', 'question_entries_ts')
+
+# Route practice data to per-institution databases listed in the tenants collection
+# (run migrations/split_tenants.py to move existing data)
+TENANT_ROUTING = os.environ.get('TENANT_ROUTING', 'false').lower() == 'true'
+# How long a process trusts its cached tenants and student -> tenant lookups
+TENANT_CACHE_TTL_SECONDS = int(os.environ.get('TENANT_CACHE_TTL_SECONDS', '300'))
+# Batches in which a student's data is moved after their school or its tenant changes
+TENANT_MOVE_BATCH_SIZE = int(os.environ.get('TENANT_MOVE_BATCH_SIZE', '500'))
+TENANT_MOVE_PAUSE_SECONDS = float(os.environ.get('TENANT_MOVE_PAUSE_SECONDS', '0.05'))
+
+# Application id generator: "uuid7" (time-ordered) or "uuid4" (random)
+ID_GENERATOR = os.environ.get('ID_GENERATOR', 'uuid7')
 
 # JWT Configuration
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
@@ -16,3 +58,68 @@ ACCESS_TOKEN_EXPIRE_DAYS = 30
 
 # CORS Configuration
 CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
+
+# Bulk Import Configuration
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '500'))
+# Plaintext passwords of a queued import are deleted by the job, or after this long at the latest
+IMPORT_PASSWORD_TTL_SECONDS = int(os.environ.get('IMPORT_PASSWORD_TTL_SECONDS', '86400'))
+
+# Background Job Configuration
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '60'))
+JOB_POLL_INTERVAL_SECONDS = float(os.environ.get('JOB_POLL_INTERVAL_SECONDS', '1'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETRY_BACKOFF_SECONDS = int(os.environ.get('JOB_RETRY_BACKOFF_SECONDS', '10'))
+JOB_DRAIN_TIMEOUT_SECONDS = int(os.environ.get('JOB_DRAIN_TIMEOUT_SECONDS', '30'))
+
+# Cascade Delete Configuration
+CASCADE_DELETE_BATCH_SIZE = int(os.environ.get('CASCADE_DELETE_BATCH_SIZE', '1000'))
+CASCADE_DELETE_PAUSE_SECONDS = float(os.environ.get('CASCADE_DELETE_PAUSE_SECONDS', '0.05'))
+
+# Archive Configuration
+ARCHIVE_ENABLED = os.environ.get('ARCHIVE_ENABLED', 'false').lower() == 'true'
+ARCHIVE_HORIZON_DAYS = int(os.environ.get('ARCHIVE_HORIZON_DAYS', '365'))
+ARCHIVE_INTERVAL_SECONDS = int(os.environ.get('ARCHIVE_INTERVAL_SECONDS', '86400'))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', '1000'))
+ARCHIVE_PAUSE_SECONDS = float(os.environ.get('ARCHIVE_PAUSE_SECONDS', '0.05'))
+
+# Diagnostics Configuration
+# Commands slower than this are logged and kept in the slow-query log
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+SLOW_QUERY_LOG_SIZE = int(os.environ.get('SLOW_QUERY_LOG_SIZE', '200'))
+# Distinct query shapes tracked for /api/admin/diagnostics/queries
+QUERY_SHAPE_LIMIT = int(os.environ.get('QUERY_SHAPE_LIMIT', '500'))
+# Warn when a request makes more MongoDB calls than this, or repeats one query shape this
+# many times (usually a query inside a loop)
+QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', '25'))
+REPEATED_QUERY_THRESHOLD = int(os.environ.get('REPEATED_QUERY_THRESHOLD', '5'))
+# Bearer token required to scrape /metrics (empty = /metrics answers 404)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Per-request sampling profiler for admins (X-Profile: 1); off by default, and then not installed
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', '1'))
+PROFILE_HISTORY = int(os.environ.get('PROFILE_HISTORY', '20'))
+# Event-loop lag monitor: heartbeat interval, and the stall after which the blocking stack is captured
+LOOP_MONITOR_ENABLED = os.environ.get('LOOP_MONITOR_ENABLED', 'true').lower() == 'true'
+LOOP_MONITOR_INTERVAL_MS = float(os.environ.get('LOOP_MONITOR_INTERVAL_MS', '50'))
+LOOP_BLOCK_THRESHOLD_MS = float(os.environ.get('LOOP_BLOCK_THRESHOLD_MS', '100'))
+LOOP_BLOCK_LOG_SIZE = int(os.environ.get('LOOP_BLOCK_LOG_SIZE', '100'))
+# tracemalloc diagnostics: stack depth recorded per allocation, and snapshots kept for diffing
+TRACEMALLOC_FRAMES = int(os.environ.get('TRACEMALLOC_FRAMES', '25'))
+MEMORY_SNAPSHOT_HISTORY = int(os.environ.get('MEMORY_SNAPSHOT_HISTORY', '5'))
+
+# Logging Configuration
+# Records are written by a background thread; when the queue is full they are dropped
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+ACCESS_LOG_ENABLED = os.environ.get('ACCESS_LOG_ENABLED', 'true').lower() == 'true'
+# JSON lines file for the access log (empty = stdout)
+ACCESS_LOG_FILE = os.environ.get('ACCESS_LOG_FILE', '')
+# Fraction of requests logged, overridable per route template, e.g.
+# ACCESS_LOG_SAMPLE_RATES="/metrics=0,/api/auth/me=0.1". Errors and slow requests are always logged.
+ACCESS_LOG_SAMPLE_RATE = float(os.environ.get('ACCESS_LOG_SAMPLE_RATE', '1'))
+ACCESS_LOG_SAMPLE_RATES = {
+    route: float(rate)
+    for route, _, rate in (item.rpartition('=') for item in os.environ.get('ACCESS_LOG_SAMPLE_RATES', '').split(',') if item)
+}
+ACCESS_LOG_SLOW_MS = float(os.environ.get('ACCESS_LOG_SLOW_MS', '1000'))
@@ -1,8 +1,248 @@
+from contextvars import ContextVar
+from functools import partial
 from motor.motor_asyncio import AsyncIOMotorClient
-from config import MONGO_URL, DB_NAME
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import CollectionInvalid
+from config import (
+    MONGO_URL, DB_NAME, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_WAIT_QUEUE_TIMEOUT_MS, MONGO_COMPRESSORS,
+    ID_AS_PRIMARY_KEY,
+    QUESTION_ENTRIES_TIMESERIES, QUESTION_ENTRIES_TIMESERIES_COLLECTION
+)
+from storage import AdaptedDatabase, PrimaryKeyCollection, TimeSeriesCollection
+from db_monitoring import pool_monitor, command_monitor
 
-client = AsyncIOMotorClient(MONGO_URL)
-db = client[DB_NAME]
+def create_client(mongo_url: str) -> AsyncIOMotorClient:
+    # tz_aware so BSON datetimes come back as UTC-aware and serialize with an offset at the API boundary
+    options = {}
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    return AsyncIOMotorClient(
+        mongo_url,
+        tz_aware=True,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        event_listeners=[pool_monitor, command_monitor],
+        **options
+    )
+
+client = create_client(MONGO_URL)
+# Stored document shapes, for index management and migrations
+raw_db = client[DB_NAME]
+
+_adapters = {}
+if QUESTION_ENTRIES_TIMESERIES:
+    _adapters["question_entries"] = (TimeSeriesCollection, QUESTION_ENTRIES_TIMESERIES_COLLECTION)
+
+# Deletes on a time-series collection filter on the metaField rather than by id
+# (before MongoDB 7.0 nothing else is allowed)
+TIMESERIES_COLLECTIONS = {name for name, (adapter, _) in _adapters.items() if adapter is TimeSeriesCollection}
+
+def adapt_database(database):
+    if ID_AS_PRIMARY_KEY or _adapters:
+        return AdaptedDatabase(database, PrimaryKeyCollection if ID_AS_PRIMARY_KEY else None, _adapters)
+    return database
+
+# Tenant routing (TENANT_ROUTING): accounts, relationships that admins manage across
+# institutions, the job queue and the shared catalogs stay in this directory database.
+# Every other collection resolves to the database of the tenant set for the current
+# request or job, falling back to this one for users without a tenant.
+SHARED_COLLECTIONS = {
+    "users", "tenants", "matches", "parent_student_relations", "notifications", "subjects", "topics", "jobs",
+    "import_passwords",
+}
+
+# Tenant document for the current request or job, set by tenancy.use_tenant
+current_tenant = ContextVar("current_tenant", default=None)
+
+_tenant_clients = {}
+_tenant_databases = {}
+
+def tenant_client(tenant: dict) -> AsyncIOMotorClient:
+    mongo_url = tenant.get('mongo_url')
+    if not mongo_url or mongo_url == MONGO_URL:
+        return client
+    if mongo_url not in _tenant_clients:
+        _tenant_clients[mongo_url] = create_client(mongo_url)
+    return _tenant_clients[mongo_url]
+
+def tenant_raw_database(tenant: dict):
+    return tenant_client(tenant)[tenant['db_name']]
+
+def tenant_database(tenant: dict):
+    if tenant['id'] not in _tenant_databases:
+        _tenant_databases[tenant['id']] = adapt_database(tenant_raw_database(tenant))
+    return _tenant_databases[tenant['id']]
+
+# Per-request read preference and session, set by read_routing for the router being served
+class RequestDatabaseOptions:
+    def __init__(self):
+        self.read_preference = None
+        self.session = None
+
+current_request_options = ContextVar("current_request_options", default=None)
+
+# Collection methods that accept a session
+_SESSION_METHODS = {
+    "find", "find_one", "find_one_and_update", "insert_one", "insert_many", "update_one", "update_many",
+    "delete_one", "delete_many", "count_documents", "distinct", "bulk_write", "aggregate",
+}
+
+class SessionBoundCollection:
+    def __init__(self, collection, session):
+        self._collection = collection
+        self._session = session
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in _SESSION_METHODS:
+            return partial(attr, session=self._session)
+        return attr
+
+class RoutedDatabase:
+    def __init__(self, directory):
+        self._directory = directory
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        tenant = current_tenant.get()
+        if tenant is None or name in SHARED_COLLECTIONS:
+            collection, collection_client = self._directory[name], client
+        else:
+            collection, collection_client = tenant_database(tenant)[name], tenant_client(tenant)
+
+        options = current_request_options.get()
+        if options is None:
+            return collection
+        if options.read_preference is not None:
+            collection = collection.with_options(read_preference=options.read_preference)
+        # A session only works with the client that started it
+        if options.session is not None and options.session.client is collection_client:
+            collection = SessionBoundCollection(collection, options.session)
+        return collection
+
+db = RoutedDatabase(adapt_database(raw_db))
+
+INDEXES = {
+    "users": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # Unique once migration 0004_lowercase_emails has run
+        IndexModel([("email", ASCENDING)], unique=True),
+        # Admin listings: pending users, and approved users per role
+        IndexModel([("approval_status", ASCENDING), ("role", ASCENDING)]),
+    ],
+    "matches": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("student_id", ASCENDING)]),
+        IndexModel([("teacher_id", ASCENDING), ("student_id", ASCENDING)]),
+    ],
+    "parent_student_relations": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("parent_id", ASCENDING), ("student_id", ASCENDING)]),
+        IndexModel([("student_id", ASCENDING)]),
+    ],
+    "question_entries": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("student_id", ASCENDING), ("teacher_id", ASCENDING)]),
+        IndexModel([("date", ASCENDING)]),
+    ],
+    "exam_analyses": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("student_id", ASCENDING), ("teacher_id", ASCENDING)]),
+        IndexModel([("exam_date", ASCENDING)]),
+    ],
+    "question_entries_archive": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("student_id", ASCENDING), ("teacher_id", ASCENDING), ("subject", ASCENDING), ("date", ASCENDING)]),
+    ],
+    "exam_analyses_archive": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("student_id", ASCENDING), ("teacher_id", ASCENDING), ("exam_type", ASCENDING), ("exam_date", ASCENDING)]),
+    ],
+    "practice_rollups": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("student_id", ASCENDING), ("teacher_id", ASCENDING)]),
+    ],
+    "exam_rollups": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("student_id", ASCENDING), ("teacher_id", ASCENDING)]),
+    ],
+    "assignments": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("student_id", ASCENDING), ("teacher_id", ASCENDING)]),
+    ],
+    "study_schedules": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("student_id", ASCENDING), ("teacher_id", ASCENDING)]),
+    ],
+    "weekly_schedules": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("student_id", ASCENDING), ("week_start_date", DESCENDING)]),
+    ],
+    "resource_tracking": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("student_id", ASCENDING), ("teacher_id", ASCENDING)]),
+    ],
+    "resources_with_topics": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("student_id", ASCENDING), ("teacher_id", ASCENDING)]),
+    ],
+    "notifications": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "tenants": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("school", ASCENDING)], unique=True),
+    ],
+    "jobs": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING), ("run_after", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)]),
+    ],
+    "import_passwords": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+# Time-series collections cannot carry unique indexes, so ids are indexed for lookups only
+TIMESERIES_INDEXES = [
+    IndexModel([("id", ASCENDING)]),
+    IndexModel([("meta.student_id", ASCENDING), ("meta.teacher_id", ASCENDING), ("date", DESCENDING)]),
+]
+
+# Collections that live in each tenant database
+TENANT_COLLECTIONS = [c for c in INDEXES if c not in SHARED_COLLECTIONS]
+
+async def ensure_timeseries_collection(name: str = QUESTION_ENTRIES_TIMESERIES_COLLECTION, database=raw_db):
+    try:
+        await database.create_collection(name, timeseries={
+            "timeField": TimeSeriesCollection.TIME_FIELD,
+            "metaField": TimeSeriesCollection.META_FIELD,
+            "granularity": TimeSeriesCollection.GRANULARITY,
+        })
+    except CollectionInvalid:
+        pass
+    await database[name].create_indexes(TIMESERIES_INDEXES)
+
+async def ensure_indexes(database=raw_db, collections: list = None):
+    if QUESTION_ENTRIES_TIMESERIES:
+        await ensure_timeseries_collection(database=database)
+    for collection, indexes in INDEXES.items():
+        if collections is not None and collection not in collections:
+            continue
+        if ID_AS_PRIMARY_KEY:
+            # The application id lives in _id, which is already uniquely indexed
+            indexes = [i for i in indexes if list(i.document['key']) != ["id"]]
+        await database[collection].create_indexes(indexes)
 
 async def close_db_connection():
+    for tenant_mongo_client in _tenant_clients.values():
+        tenant_mongo_client.close()
     client.close()
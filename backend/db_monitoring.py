@@ -0,0 +1,268 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from pymongo import monitoring
+from config import SLOW_QUERY_MS, SLOW_QUERY_LOG_SIZE, QUERY_SHAPE_LIMIT
+from metrics import Counter, Gauge, Histogram
+from request_context import current_request
+
+logger = logging.getLogger(__name__)
+
+# Connection pool events, to tell pool exhaustion apart from slow queries. Checkouts run in
+# Motor's executor threads, so a checkout's start and end are matched per thread.
+POOL_CHECKOUT_WAIT = Histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting to check out a pooled connection", ("address",),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+)
+POOL_CONNECTIONS = Gauge("mongo_pool_connections", "Open pooled connections", ("address",))
+POOL_CONNECTIONS_IN_USE = Gauge("mongo_pool_connections_in_use", "Pooled connections checked out", ("address",))
+POOL_CHECKOUT_FAILURES = Counter(
+    "mongo_pool_checkout_failures_total", "Failed connection checkouts; reason=timeout means the pool was exhausted",
+    ("address", "reason")
+)
+POOL_CLEARED = Counter("mongo_pool_cleared_total", "Times a pool was cleared after a network error or failover", ("address",))
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._checkout_started = threading.local()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        POOL_CLEARED.inc(address=_address(event))
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        POOL_CONNECTIONS.inc(address=_address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        POOL_CONNECTIONS.dec(address=_address(event))
+
+    def connection_check_out_started(self, event):
+        self._checkout_started.value = time.perf_counter()
+
+    def _checkout_wait(self) -> float:
+        started = getattr(self._checkout_started, "value", None)
+        self._checkout_started.value = None
+        return time.perf_counter() - started if started is not None else None
+
+    def connection_check_out_failed(self, event):
+        self._checkout_wait()
+        POOL_CHECKOUT_FAILURES.inc(address=_address(event), reason=event.reason)
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            logger.warning("Connection pool for %s exhausted: checkout timed out", _address(event))
+
+    def connection_checked_out(self, event):
+        wait = self._checkout_wait()
+        if wait is not None:
+            POOL_CHECKOUT_WAIT.observe(wait, address=_address(event))
+        POOL_CONNECTIONS_IN_USE.inc(address=_address(event))
+
+    def connection_checked_in(self, event):
+        POOL_CONNECTIONS_IN_USE.dec(address=_address(event))
+
+pool_monitor = PoolMonitor()
+
+# Command events, to find which queries are slow and which routes issue them
+COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command round-trip time", ("command", "collection")
+)
+COMMAND_FAILURES = Counter("mongo_command_failures_total", "MongoDB commands that returned an error", ("command", "collection"))
+
+MONITORED_COMMANDS = {"find", "getMore", "aggregate", "count", "distinct", "insert", "update", "delete", "findAndModify"}
+
+def redact(value, field_paths: bool = False):
+    # Keeps field names and operators, replaces every value with "?". Pipeline stages other
+    # than $match also keep "$field" references, which are part of the query, not user data.
+    if isinstance(value, dict):
+        return {key: redact(item, field_paths) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if any(isinstance(item, (dict, list, tuple)) for item in value):
+            return [redact(item, field_paths) for item in value]
+        return ["?"] if value else []
+    if field_paths and isinstance(value, str) and value.startswith("$"):
+        return value
+    return "?"
+
+def query_shape(command_name: str, command: dict) -> dict:
+    # Sort directions are part of the query plan, not user data, so they are kept
+    if command_name == "find":
+        shape = {"filter": redact(command.get("filter", {}))}
+        if command.get("sort"):
+            shape["sort"] = dict(command["sort"])
+        return shape
+    if command_name == "aggregate":
+        return {"pipeline": [
+            {"$sort": dict(stage["$sort"])} if "$sort" in stage else redact(stage, "$match" not in stage)
+            for stage in command.get("pipeline", [])
+        ]}
+    if command_name in ("count", "distinct"):
+        shape = {"query": redact(command.get("query", {}))}
+        if command_name == "distinct":
+            shape["key"] = command.get("key")
+        return shape
+    if command_name == "findAndModify":
+        return {"query": redact(command.get("query", {})), "update": redact(command.get("update", {}))}
+    if command_name == "update":
+        return {"q": redact(command["updates"][0].get("q", {}))} if command.get("updates") else {}
+    if command_name == "delete":
+        return {"q": redact(command["deletes"][0].get("q", {}))} if command.get("deletes") else {}
+    return {}
+
+def _collection(command_name: str, command: dict) -> str:
+    if command_name == "getMore":
+        return command.get("collection")
+    collection = command.get(command_name)
+    return collection if isinstance(collection, str) else None
+
+def _documents_returned(reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if "values" in reply:
+        return len(reply["values"])
+    if "value" in reply:
+        return 1 if reply["value"] is not None else 0
+    return 0
+
+class CommandMonitor(monitoring.CommandListener):
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS, slow_log_size: int = SLOW_QUERY_LOG_SIZE, shape_limit: int = QUERY_SHAPE_LIMIT):
+        self.slow_ms = slow_ms
+        self.shape_limit = shape_limit
+        self.slow_log = deque(maxlen=slow_log_size)
+        self.shapes = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name not in MONITORED_COMMANDS:
+            return
+        shape = query_shape(event.command_name, event.command)
+        context = current_request.get()
+        self._pending[(event.request_id, event.connection_id)] = (
+            _collection(event.command_name, event.command),
+            json.dumps(shape, sort_keys=True, default=str),
+            context,
+        )
+
+    def succeeded(self, event):
+        self._finish(event, _documents_returned(event.reply), None)
+
+    def failed(self, event):
+        self._finish(event, 0, event.failure.get("errmsg") if isinstance(event.failure, dict) else str(event.failure))
+
+    def _finish(self, event, documents: int, error: str):
+        pending = self._pending.pop((event.request_id, event.connection_id), None)
+        if pending is None:
+            return
+        collection, shape, context = pending
+        route = (context.route or "unmatched") if context is not None else "background"
+        duration_ms = event.duration_micros / 1000
+        if context is not None:
+            context.record_query((event.command_name, collection, shape), duration_ms)
+        COMMAND_DURATION.observe(duration_ms / 1000, command=event.command_name, collection=collection)
+        if error is not None:
+            COMMAND_FAILURES.inc(command=event.command_name, collection=collection)
+        self._record_shape(event.command_name, collection, shape, route, duration_ms, documents)
+        if duration_ms >= self.slow_ms:
+            entry = {
+                "at": datetime.now(timezone.utc).isoformat(),
+                "command": event.command_name,
+                "collection": collection,
+                "shape": shape,
+                "route": route,
+                "duration_ms": round(duration_ms, 3),
+                "documents": documents,
+                "error": error,
+            }
+            self.slow_log.append(entry)
+            logger.warning("Slow query: %s", json.dumps(entry))
+
+    def _record_shape(self, command_name: str, collection: str, shape: str, route: str, duration_ms: float, documents: int):
+        key = (command_name, collection, shape)
+        with self._lock:
+            stats = self.shapes.get(key)
+            if stats is None:
+                if len(self.shapes) >= self.shape_limit:
+                    # Make room by dropping the shape that has cost the least so far
+                    del self.shapes[min(self.shapes, key=lambda k: self.shapes[k]["total_ms"])]
+                stats = self.shapes[key] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "documents": 0, "routes": set()}
+            stats["count"] += 1
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            stats["documents"] += documents
+            if len(stats["routes"]) < 10:
+                stats["routes"].add(route)
+
+    def top_shapes(self, limit: int = 20, sort_by: str = "total_ms") -> list:
+        with self._lock:
+            rows = [
+                {
+                    "command": command_name,
+                    "collection": collection,
+                    "shape": shape,
+                    "count": stats["count"],
+                    "total_ms": round(stats["total_ms"], 3),
+                    "avg_ms": round(stats["total_ms"] / stats["count"], 3),
+                    "max_ms": round(stats["max_ms"], 3),
+                    "documents": stats["documents"],
+                    "avg_documents": round(stats["documents"] / stats["count"], 1),
+                    "routes": sorted(stats["routes"]),
+                }
+                for (command_name, collection, shape), stats in self.shapes.items()
+            ]
+        rows.sort(key=lambda row: row[sort_by], reverse=True)
+        return rows[:limit]
+
+    def reset(self):
+        with self._lock:
+            self.shapes.clear()
+        self.slow_log.clear()
+
+command_monitor = CommandMonitor()
+
+def pool_snapshot() -> dict:
+    addresses = {key[0] for key in POOL_CONNECTIONS._values} | {key[0] for key in POOL_CHECKOUT_WAIT._values}
+    snapshot = {}
+    for address in sorted(addresses):
+        wait = POOL_CHECKOUT_WAIT.snapshot(address=address)
+        snapshot[address] = {
+            "connections": POOL_CONNECTIONS.value(address=address),
+            "in_use": POOL_CONNECTIONS_IN_USE.value(address=address),
+            "checkouts": wait["count"],
+            "checkout_wait_seconds_total": wait["sum"],
+            "checkout_wait_p50": POOL_CHECKOUT_WAIT.quantile(0.5, address=address),
+            "checkout_wait_p99": POOL_CHECKOUT_WAIT.quantile(0.99, address=address),
+            "checkout_timeouts": POOL_CHECKOUT_FAILURES.value(address=address, reason=monitoring.ConnectionCheckOutFailedReason.TIMEOUT),
+            "cleared": POOL_CLEARED.value(address=address),
+        }
+    return snapshot
+
+async def warm_up_pool(mongo_client, connections: int):
+    # Concurrent pings each hold a connection, so the pool opens `connections` sockets
+    # before the first request instead of during it
+    if connections <= 0:
+        return
+    started = time.perf_counter()
+    results = await asyncio.gather(*[mongo_client.admin.command("ping") for _ in range(connections)], return_exceptions=True)
+    failed = [r for r in results if isinstance(r, Exception)]
+    if failed:
+        logger.warning("Pool warm-up: %s of %s pings failed: %s", len(failed), connections, failed[0])
+    logger.info("Pool warm-up opened up to %s connections in %.3fs", connections, time.perf_counter() - started)
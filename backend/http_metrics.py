@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import time
+from config import QUERY_BUDGET, REPEATED_QUERY_THRESHOLD
+from metrics import Counter, Gauge, Histogram
+from request_context import current_request
+from access_log import log_access
+
+logger = logging.getLogger(__name__)
+
+# Per route template, so /api/teacher/question-entries/{student_id} is one series however
+# many students there are. Requests that match no route share the "unmatched" label.
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests served", ("method", "route", "status"))
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending the last response byte", ("method", "route")
+)
+HTTP_REQUEST_SIZE = Histogram("http_request_size_bytes", "Request body size", ("method", "route"), buckets=SIZE_BUCKETS)
+HTTP_RESPONSE_SIZE = Histogram("http_response_size_bytes", "Response body size", ("method", "route"), buckets=SIZE_BUCKETS)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being served", ("method", "route"))
+HTTP_REQUEST_DB_CALLS = Histogram(
+    "http_request_db_calls", "MongoDB commands issued per request", ("method", "route"),
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250)
+)
+HTTP_REQUEST_SERIALIZATION = Histogram(
+    "http_request_serialization_seconds", "Time spent validating and encoding the response", ("method", "route")
+)
+
+EVENT_LOOP_TASKS = Gauge("event_loop_tasks", "Tasks scheduled on the event loop")
+EVENT_LOOP_SCHEDULING_DELAY = Gauge(
+    "event_loop_scheduling_delay_seconds", "Time for a ready callback to run, sampled when metrics are scraped"
+)
+
+async def sample_event_loop():
+    started = time.perf_counter()
+    await asyncio.sleep(0)
+    EVENT_LOOP_SCHEDULING_DELAY.set(time.perf_counter() - started)
+    EVENT_LOOP_TASKS.set(len(asyncio.all_tasks()))
+
+def server_timing(context) -> str:
+    # Sent with the response headers, so the total covers everything up to the first byte
+    metrics = [f'db;dur={context.db_ms:.1f};desc="{context.db_calls} queries"']
+    if context.serialization_ms is not None:
+        metrics.append(f"serialize;dur={context.serialization_ms:.1f}")
+    metrics.append(f"total;dur={(time.perf_counter() - context.started) * 1000:.1f}")
+    return ", ".join(metrics)
+
+def check_db_usage(context):
+    # The per-request numbers themselves go to the access log
+    request = f"{context.method} {context.route or context.path}"
+    if context.db_calls > QUERY_BUDGET:
+        logger.warning("%s made %s queries, over the budget of %s", request, context.db_calls, QUERY_BUDGET)
+    for (command_name, collection, shape), count in context.query_shapes.items():
+        if count >= REPEATED_QUERY_THRESHOLD:
+            logger.warning("%s repeated %s on %s %s times (N+1?): %s", request, command_name, collection, count, shape)
+
+class RequestMetricsMiddleware:
+    # Runs inside RequestContextMiddleware, which resolves the route template
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        context = current_request.get()
+        if scope["type"] != "http" or context is None:
+            await self.app(scope, receive, send)
+            return
+
+        labels = {"method": context.method, "route": context.route or "unmatched"}
+        status = 500
+        request_size = 0
+        response_size = 0
+
+        async def counting_receive():
+            nonlocal request_size
+            message = await receive()
+            if message["type"] == "http.request":
+                request_size += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status, response_size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"server-timing", server_timing(context).encode())]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc(**labels)
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec(**labels)
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - context.started, **labels)
+            HTTP_REQUEST_SIZE.observe(request_size, **labels)
+            HTTP_RESPONSE_SIZE.observe(response_size, **labels)
+            HTTP_REQUESTS.inc(status=status, **labels)
+            HTTP_REQUEST_DB_CALLS.observe(context.db_calls, **labels)
+            if context.serialization_ms is not None:
+                HTTP_REQUEST_SERIALIZATION.observe(context.serialization_ms / 1000, **labels)
+            check_db_usage(context)
+            log_access(context, status, request_size, response_size)
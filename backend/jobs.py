@@ -0,0 +1,257 @@
+import asyncio
+import importlib
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timezone, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from config import (
+    JOB_WORKERS, JOB_LEASE_SECONDS, JOB_POLL_INTERVAL_SECONDS, JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BACKOFF_SECONDS, JOB_DRAIN_TIMEOUT_SECONDS
+)
+from database import db
+from models import Job, JobStatus
+from tenancy import use_tenant, get_tenant, current_tenant_id
+
+logger = logging.getLogger(__name__)
+
+# Job type -> (handler, clear_params). Handlers are `async def handler(job: dict) -> dict`.
+# Jobs whose params carry secrets (e.g. import passwords) drop them once finished.
+JOB_HANDLERS = {}
+
+# Job type -> interval in seconds for handlers that run on a schedule. Each periodic type
+# has one job document that is re-queued for the next run instead of completing.
+PERIODIC_JOBS = {}
+
+# Modules that register handlers with @job_handler, imported when workers start
+JOB_HANDLER_MODULES = ["user_import", "cascade_delete", "archive", "tenant_moves"]
+
+_workers = []
+_running = {}
+_stopping = False
+_wakeup = None
+
+def job_handler(job_type: str, clear_params: bool = False, interval_seconds: int = None):
+    def decorator(func):
+        JOB_HANDLERS[job_type] = (func, clear_params)
+        if interval_seconds:
+            PERIODIC_JOBS[job_type] = interval_seconds
+        return func
+    return decorator
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+async def enqueue_job(job_type: str, params: dict = None, created_by: str = None,
+                      max_attempts: int = JOB_MAX_ATTEMPTS, tenant_id: str = None) -> Job:
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job type: {job_type}")
+
+    job = Job(
+        type=job_type,
+        params=params or {},
+        created_by=created_by,
+        tenant_id=tenant_id or current_tenant_id(),
+        max_attempts=max_attempts
+    )
+    job_dict = job.model_dump()
+    await db.jobs.insert_one(job_dict)
+
+    if _wakeup is not None:
+        _wakeup.set()
+    return job
+
+async def report_progress(job_id: str, done: int, total: int, **extra):
+    await db.jobs.update_one(
+        {"id": job_id},
+        {"$set": {
+            "progress": {"done": done, "total": total, **extra},
+            "updated_at": _now()
+        }}
+    )
+
+async def _claim_job(worker_id: str):
+    now = _now()
+    return await db.jobs.find_one_and_update(
+        {
+            "type": {"$in": list(JOB_HANDLERS)},
+            "$or": [
+                {"status": JobStatus.QUEUED.value, "run_after": {"$lte": now}},
+                # A job whose worker died mid-run is retried only while it has attempts left
+                {
+                    "status": JobStatus.RUNNING.value,
+                    "lease_expires_at": {"$lt": now},
+                    "$expr": {"$lt": ["$attempts", "$max_attempts"]}
+                },
+            ]
+        },
+        {
+            "$set": {
+                "status": JobStatus.RUNNING.value,
+                "worker_id": worker_id,
+                "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        projection={"_id": 0},
+        sort=[("run_after", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+async def _fail_abandoned_jobs():
+    # Expired leases that used up their attempts, e.g. a job that keeps killing its worker
+    abandoned = await db.jobs.find(
+        {
+            "status": JobStatus.RUNNING.value,
+            "lease_expires_at": {"$lt": _now()},
+            "$expr": {"$gte": ["$attempts", "$max_attempts"]}
+        },
+        {"_id": 0, "id": 1, "type": 1, "worker_id": 1, "interval_seconds": 1}
+    ).to_list(None)
+    for job in abandoned:
+        logger.error("Job %s (%s) lost its lease on the last attempt", job['id'], job['type'])
+        clear_params = JOB_HANDLERS.get(job['type'], (None, False))[1]
+        await _finish_job(job, job['worker_id'], {"status": JobStatus.FAILED.value, "error": "Lease expired"}, clear_params)
+
+async def _heartbeat(job_id: str, worker_id: str, handler_task: asyncio.Task):
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        result = await db.jobs.update_one(
+            {"id": job_id, "worker_id": worker_id, "status": JobStatus.RUNNING.value},
+            {"$set": {"lease_expires_at": _now() + timedelta(seconds=JOB_LEASE_SECONDS)}}
+        )
+        if result.matched_count == 0:
+            logger.warning("Job %s lease lost by %s, cancelling", job_id, worker_id)
+            handler_task.cancel()
+            return
+
+async def _finish_job(job: dict, worker_id: str, fields: dict, clear_params: bool):
+    fields.update({"worker_id": None, "lease_expires_at": None, "updated_at": _now()})
+    if job.get('interval_seconds') and fields['status'] in (JobStatus.COMPLETED.value, JobStatus.FAILED.value):
+        fields.update({
+            "last_status": fields['status'],
+            "status": JobStatus.QUEUED.value,
+            "attempts": 0,
+            "run_after": _now() + timedelta(seconds=job['interval_seconds'])
+        })
+    update = {"$set": fields}
+    if clear_params and fields['status'] in (JobStatus.COMPLETED.value, JobStatus.FAILED.value):
+        update["$unset"] = {"params": ""}
+    await db.jobs.update_one({"id": job['id'], "worker_id": worker_id}, update)
+
+async def _run_job(job: dict, worker_id: str):
+    handler, clear_params = JOB_HANDLERS[job['type']]
+    tenant = await get_tenant(job['tenant_id']) if job.get('tenant_id') else None
+    if job.get('tenant_id') and tenant is None:
+        await _finish_job(job, worker_id, {"status": JobStatus.FAILED.value, "error": "Unknown tenant"}, clear_params)
+        return
+    # The handler task copies the context, so its queries go to the job's tenant
+    with use_tenant(tenant):
+        handler_task = asyncio.ensure_future(handler(job))
+    heartbeat = asyncio.ensure_future(_heartbeat(job['id'], worker_id, handler_task))
+    _running[job['id']] = handler_task
+    try:
+        result = await handler_task
+    except asyncio.CancelledError:
+        if _stopping:
+            # Drain timed out: hand the job back without burning an attempt
+            await _finish_job(job, worker_id, {"status": JobStatus.QUEUED.value, "attempts": job['attempts'] - 1}, clear_params)
+        return
+    except Exception as e:
+        logger.exception("Job %s (%s) failed on attempt %s", job['id'], job['type'], job['attempts'])
+        if job['attempts'] < job.get('max_attempts', JOB_MAX_ATTEMPTS):
+            await _finish_job(job, worker_id, {
+                "status": JobStatus.QUEUED.value,
+                "error": str(e),
+                "run_after": _now() + timedelta(seconds=JOB_RETRY_BACKOFF_SECONDS * job['attempts'])
+            }, clear_params)
+        else:
+            await _finish_job(job, worker_id, {"status": JobStatus.FAILED.value, "error": str(e)}, clear_params)
+    else:
+        await _finish_job(job, worker_id, {"status": JobStatus.COMPLETED.value, "result": result, "error": None}, clear_params)
+    finally:
+        heartbeat.cancel()
+        _running.pop(job['id'], None)
+
+async def _worker_loop(worker_id: str):
+    while not _stopping:
+        try:
+            job = await _claim_job(worker_id)
+        except Exception:
+            logger.exception("Worker %s failed to claim a job", worker_id)
+            job = None
+
+        if job is None:
+            try:
+                await _fail_abandoned_jobs()
+            except Exception:
+                logger.exception("Worker %s failed to clean up abandoned jobs", worker_id)
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        await _run_job(job, worker_id)
+
+async def ensure_periodic_jobs():
+    for job_type, interval in PERIODIC_JOBS.items():
+        job_dict = Job(id=f"periodic:{job_type}", type=job_type).model_dump()
+        job_id = job_dict.pop('id')
+        job_dict.pop('interval_seconds')
+        try:
+            await db.jobs.update_one(
+                {"id": job_id},
+                {"$set": {"interval_seconds": interval}, "$setOnInsert": job_dict},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Another process created it first
+            pass
+    # Drop the pending run of schedules that were switched off in config
+    await db.jobs.delete_many({
+        "interval_seconds": {"$ne": None},
+        "type": {"$nin": list(PERIODIC_JOBS)},
+        "status": JobStatus.QUEUED.value
+    })
+
+async def _schedule_periodic_jobs():
+    try:
+        await ensure_periodic_jobs()
+    except Exception:
+        logger.exception("Failed to schedule periodic jobs")
+
+def load_job_handlers():
+    for module in JOB_HANDLER_MODULES:
+        importlib.import_module(module)
+
+def start_workers(count: int = JOB_WORKERS):
+    global _stopping, _wakeup
+    load_job_handlers()
+    _stopping = False
+    _wakeup = asyncio.Event()
+    prefix = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    for i in range(count):
+        _workers.append(asyncio.create_task(_worker_loop(f"{prefix}:{i}")))
+    if count:
+        _workers.append(asyncio.create_task(_schedule_periodic_jobs()))
+        logger.info("Started %s job workers", count)
+
+async def stop_workers(timeout: float = JOB_DRAIN_TIMEOUT_SECONDS):
+    global _stopping
+    _stopping = True
+    if _wakeup is not None:
+        _wakeup.set()
+
+    if _running:
+        logger.info("Draining %s running jobs", len(_running))
+        _, pending = await asyncio.wait(list(_running.values()), timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+from config import LOOP_MONITOR_INTERVAL_MS, LOOP_BLOCK_THRESHOLD_MS, LOOP_BLOCK_LOG_SIZE
+from metrics import Counter, Histogram
+from request_context import RequestContextMiddleware
+
+logger = logging.getLogger(__name__)
+
+# A heartbeat task measures how late the loop wakes it (the lag every other request waits
+# on). A watchdog thread notices when the heartbeat stops and, once a stall passes the
+# threshold, captures the loop thread's stack and the request whose code is running.
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "Delay between a timer's due time and its callback running",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+EVENT_LOOP_BLOCKS = Counter("event_loop_blocks_total", "Stalls longer than the block threshold", ("route",))
+
+_REQUEST_FRAME_CODE = RequestContextMiddleware.__call__.__code__
+
+def _blocking_request(frame):
+    while frame is not None:
+        if frame.f_code is _REQUEST_FRAME_CODE:
+            return frame.f_locals.get("context")
+        frame = frame.f_back
+    return None
+
+class LoopMonitor:
+    def __init__(self, interval_ms: float = LOOP_MONITOR_INTERVAL_MS, threshold_ms: float = LOOP_BLOCK_THRESHOLD_MS,
+                 history: int = LOOP_BLOCK_LOG_SIZE):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.blocks = deque(maxlen=history)
+        self._task = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._captured = None
+        self._open_block = None
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        self.heartbeat = time.perf_counter()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._beat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stopped.set()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._thread.join()
+
+    async def _beat(self):
+        while True:
+            due = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - due)
+            EVENT_LOOP_LAG.observe(lag)
+            self.heartbeat = now
+            block = self._open_block
+            if block is not None:
+                # The stall is over; record how long it lasted in total
+                self._open_block = None
+                block["blocked_ms"] = round(lag * 1000, 3)
+
+    def _watch(self):
+        while not self._stopped.wait(self.threshold / 2):
+            beat = self.heartbeat
+            stalled = time.perf_counter() - beat - self.interval
+            if stalled > self.threshold and self._captured != beat:
+                self._captured = beat
+                self._capture(stalled)
+
+    def _capture(self, stalled: float):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        context = _blocking_request(frame)
+        route = (context.route or context.path) if context is not None else None
+        stack = traceback.format_stack(frame)
+        block = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "method": context.method if context is not None else None,
+            "route": route,
+            "blocked_ms": round(stalled * 1000, 3),
+            "stack": [line.rstrip() for line in stack],
+        }
+        self.blocks.append(block)
+        self._open_block = block
+        EVENT_LOOP_BLOCKS.inc(route=(context.route or "unmatched") if context is not None else "background")
+        logger.warning(
+            "Event loop blocked for over %.0fms in %s:\n%s",
+            stalled * 1000, f"{block['method']} {route}" if context is not None else "background task", "".join(stack[-8:])
+        )
+
+    def snapshot(self) -> dict:
+        lag = EVENT_LOOP_LAG.snapshot()
+        return {
+            "interval_ms": self.interval * 1000,
+            "block_threshold_ms": self.threshold * 1000,
+            "samples": lag["count"],
+            "lag_p50": EVENT_LOOP_LAG.quantile(0.5),
+            "lag_p99": EVENT_LOOP_LAG.quantile(0.99),
+            "blocks": list(reversed(self.blocks)),
+        }
+
+loop_monitor = LoopMonitor()
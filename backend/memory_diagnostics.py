@@ -0,0 +1,129 @@
+import inspect
+import linecache
+import os
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from fastapi.routing import APIRoute
+from config import ROOT_DIR, TRACEMALLOC_FRAMES, MEMORY_SNAPSHOT_HISTORY
+
+# tracemalloc snapshots, grouped the way we look for leaks: by the module that allocated
+# (a backend file, or the library's package) and by the endpoint whose code is on the
+# allocating stack. Allocations made in Motor's threads (BSON decoding) or by response
+# serialization outside the endpoint have no endpoint frame and count as "unattributed".
+# Only the grouped totals are kept; tracing slows every allocation, so it is only on
+# between start and stop.
+BACKEND_DIR = str(ROOT_DIR) + os.sep
+IGNORED_FILES = [tracemalloc.__file__, linecache.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>"]
+
+snapshots = []
+
+def _endpoint_index(routes: list) -> dict:
+    # filename -> [(first line, last line, route)] for each endpoint function
+    index = {}
+    for route in routes:
+        if not isinstance(route, APIRoute):
+            continue
+        code = inspect.unwrap(route.endpoint).__code__
+        last = max((line for _, _, line in code.co_lines() if line), default=code.co_firstlineno)
+        label = f"{','.join(sorted(route.methods))} {route.path_format}"
+        index.setdefault(code.co_filename, []).append((code.co_firstlineno, last, label))
+    return index
+
+def _module(traceback) -> str:
+    # Innermost Python frame (frames are most recent first). Pydantic validates in Rust, so
+    # model construction is charged to the calling backend line.
+    filename = traceback[0].filename
+    if filename.startswith(BACKEND_DIR):
+        return filename[len(BACKEND_DIR):]
+    parts = filename.split(os.sep)
+    if "site-packages" in parts:
+        return parts[parts.index("site-packages") + 1].removesuffix(".py")
+    return os.path.basename(filename)
+
+def _route(traceback, index: dict) -> str:
+    for frame in traceback:
+        for first, last, label in index.get(frame.filename, ()):
+            if first <= frame.lineno <= last:
+                return label
+    return "unattributed"
+
+def _group(snapshot, index: dict) -> dict:
+    by_module = Counter()
+    by_route = Counter()
+    by_line = Counter()
+    for trace in snapshot.traces:
+        by_module[_module(trace.traceback)] += trace.size
+        by_route[_route(trace.traceback, index)] += trace.size
+        frame = trace.traceback[0]
+        by_line[f"{frame.filename}:{frame.lineno}"] += trace.size
+    return {"module": by_module, "route": by_route, "line": by_line}
+
+def _top(sizes: Counter, limit: int) -> list:
+    rows = sorted(sizes.items(), key=lambda item: abs(item[1]), reverse=True)[:limit]
+    return [{"key": key, "kib": round(size / 1024, 1)} for key, size in rows if size]
+
+def status() -> dict:
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracing": tracemalloc.is_tracing(),
+        "frames": tracemalloc.get_traceback_limit(),
+        "traced_kib": round(current / 1024, 1),
+        "peak_kib": round(peak / 1024, 1),
+        "snapshots": [{k: v for k, v in s.items() if k != "groups"} for s in snapshots],
+    }
+
+def is_tracing() -> bool:
+    return tracemalloc.is_tracing()
+
+def start_tracing(frames: int = None):
+    # The default is deep enough for an allocation inside pydantic or a helper to still
+    # reach the endpoint frame
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames or TRACEMALLOC_FRAMES)
+
+def stop_tracing():
+    tracemalloc.stop()
+    snapshots.clear()
+
+def take_snapshot(routes: list, limit: int = 20) -> dict:
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, filename) for filename in IGNORED_FILES]
+    )
+    current, peak = tracemalloc.get_traced_memory()
+    groups = _group(snapshot, _endpoint_index(routes))
+    entry = {
+        "id": str(uuid.uuid4()),
+        "taken_at": datetime.now(timezone.utc).isoformat(),
+        "traced_kib": round(current / 1024, 1),
+        "peak_kib": round(peak / 1024, 1),
+        "groups": groups,
+    }
+    snapshots.append(entry)
+    del snapshots[:-MEMORY_SNAPSHOT_HISTORY]
+    # So each snapshot's peak covers the interval since the previous one
+    tracemalloc.reset_peak()
+    return snapshot_report(entry, limit)
+
+def snapshot_report(entry: dict, limit: int = 20) -> dict:
+    report = {k: v for k, v in entry.items() if k != "groups"}
+    report.update({f"top_{name}s": _top(sizes, limit) for name, sizes in entry["groups"].items()})
+    return report
+
+def get_snapshot(snapshot_id: str) -> dict:
+    return next((s for s in snapshots if s["id"] == snapshot_id), None)
+
+def diff_snapshots(old: dict, new: dict, limit: int = 20) -> dict:
+    groups = {}
+    for name in new["groups"]:
+        sizes = Counter(new["groups"][name])
+        sizes.subtract(old["groups"][name])
+        groups[name] = sizes
+    report = {
+        "from": old["id"],
+        "to": new["id"],
+        "traced_kib_change": round(new["traced_kib"] - old["traced_kib"], 1),
+    }
+    report.update({f"top_{name}s": _top(sizes, limit) for name, sizes in groups.items()})
+    return report
@@ -0,0 +1,144 @@
+import threading
+
+# Minimal in-process metrics in the Prometheus text exposition format. Metrics are updated
+# from the event loop and from Motor's executor threads, so every update takes a lock.
+REGISTRY = []
+# Called before each render, for gauges that are sampled rather than updated in place
+COLLECTORS = []
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def _label_key(labelnames: tuple, labels: dict) -> tuple:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labelnames: tuple, key: tuple, extra: dict = None) -> str:
+    pairs = list(zip(labelnames, key)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def samples(self) -> list:
+        with self._lock:
+            return [(self.name, self.labelnames, key, None, value) for key, value in self._values.items()]
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def snapshot(self, **labels) -> dict:
+        state = self._values.get(_label_key(self.labelnames, labels))
+        if state is None:
+            return {"count": 0, "sum": 0.0, "buckets": {}}
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets, state["buckets"]):
+                cumulative += count
+                buckets[bound] = cumulative
+            return {"count": state["count"], "sum": state["sum"], "buckets": buckets}
+
+    def quantile(self, q: float, **labels) -> float:
+        # Upper bound of the bucket holding the q-th observation
+        snapshot = self.snapshot(**labels)
+        if not snapshot["count"]:
+            return None
+        rank = q * snapshot["count"]
+        for bound, cumulative in snapshot["buckets"].items():
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def samples(self) -> list:
+        samples = []
+        with self._lock:
+            items = [(key, {"buckets": list(s["buckets"]), "sum": s["sum"], "count": s["count"]}) for key, s in self._values.items()]
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["buckets"]):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", self.labelnames, key, {"le": _format_value(bound)}, cumulative))
+            samples.append((f"{self.name}_sum", self.labelnames, key, None, state["sum"]))
+            samples.append((f"{self.name}_count", self.labelnames, key, None, state["count"]))
+        return samples
+
+def collector(fn):
+    COLLECTORS.append(fn)
+    return fn
+
+def render() -> str:
+    for fn in COLLECTORS:
+        fn()
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.header())
+        for name, labelnames, key, extra, value in metric.samples():
+            lines.append(f"{name}{_format_labels(labelnames, key, extra)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+# Shared by the in-process caches
+CACHE_ENTRIES = Gauge("app_cache_entries", "Entries held by an in-process cache", ("cache",))
+CACHE_REQUESTS = Counter("app_cache_requests_total", "In-process cache lookups", ("cache", "result"))
@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+import logging
+from pymongo import UpdateOne
+from database import raw_db as db, close_db_connection
+from utils import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+# Collection -> fields that were written as ISO strings before timestamps became BSON datetimes
+DATETIME_FIELDS = {
+    "users": ["created_at", "updated_at"],
+    "matches": ["created_at"],
+    "parent_student_relations": ["created_at"],
+    "question_entries": ["date"],
+    "exam_analyses": ["exam_date", "created_at"],
+    "resource_tracking": ["completed_date", "created_at"],
+    "assignments": ["due_date", "created_at"],
+    "study_schedules": ["created_at"],
+    "weekly_schedules": ["week_start_date", "week_end_date", "created_at"],
+    "resources_with_topics": ["created_at"],
+    "notifications": ["created_at"],
+    "subjects": ["created_at"],
+    "topics": ["created_at"],
+    "jobs": ["created_at", "updated_at"],
+}
+
+async def migrate_collection(collection: str, fields: list, batch_size: int, pause: float, dry_run: bool) -> int:
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    if dry_run:
+        return await db[collection].count_documents(query)
+
+    converted = 0
+    last_id = None
+    while True:
+        batch_query = query if last_id is None else {**query, "_id": {"$gt": last_id}}
+        docs = await db[collection].find(batch_query, {field: 1 for field in fields}).sort("_id", 1).limit(batch_size).to_list(None)
+        if not docs:
+            return converted
+        last_id = docs[-1]['_id']
+
+        ops = []
+        for doc in docs:
+            update = {}
+            for field in fields:
+                if isinstance(doc.get(field), str):
+                    try:
+                        update[field] = parse_datetime(doc[field])
+                    except ValueError:
+                        logger.warning("%s %s: unparseable %s %r left as string", collection, doc['_id'], field, doc[field])
+            if update:
+                ops.append(UpdateOne({"_id": doc['_id']}, {"$set": update}))
+        if ops:
+            result = await db[collection].bulk_write(ops, ordered=False)
+            converted += result.modified_count
+        if pause:
+            await asyncio.sleep(pause)
+
+async def migrate(batch_size: int = 500, pause: float = 0.05, dry_run: bool = False) -> dict:
+    results = {}
+    for collection, fields in DATETIME_FIELDS.items():
+        results[collection] = await migrate_collection(collection, fields, batch_size, pause, dry_run)
+        logger.info("%s: %s %s", collection, results[collection], "pending" if dry_run else "converted")
+    return results
+
+async def main():
+    parser = argparse.ArgumentParser(description="Convert ISO-string timestamps to BSON datetimes")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.05, help="Seconds to sleep between batches")
+    parser.add_argument("--dry-run", action="store_true", help="Only count documents that still need converting")
+    args = parser.parse_args()
+    try:
+        await migrate(args.batch_size, args.pause, args.dry_run)
+    finally:
+        await close_db_connection()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
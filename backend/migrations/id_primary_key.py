@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import logging
+from pymongo.errors import BulkWriteError
+from database import raw_db, close_db_connection
+from storage import to_storage_doc
+
+logger = logging.getLogger(__name__)
+
+# Collections whose documents carry an application `id`
+PK_COLLECTIONS = [
+    "users", "tenants", "matches", "parent_student_relations", "question_entries", "exam_analyses",
+    "resource_tracking", "assignments", "study_schedules", "weekly_schedules",
+    "resources_with_topics", "notifications", "subjects", "topics", "jobs",
+    "question_entries_archive", "exam_analyses_archive", "practice_rollups", "exam_rollups",
+    "import_passwords",
+]
+
+DUPLICATE_KEY = 11000
+
+async def copy_collection(name: str, batch_size: int, pause: float) -> int:
+    # Copy into <name>__pk with the id as a binary UUID _id. Re-running skips documents
+    # already copied, so an interrupted copy can simply be restarted.
+    source = raw_db[name]
+    target = raw_db[f"{name}__pk"]
+    copied = 0
+    last_id = None
+    while True:
+        query = {} if last_id is None else {"_id": {"$gt": last_id}}
+        docs = await source.find(query).sort("_id", 1).limit(batch_size).to_list(None)
+        if not docs:
+            return copied
+        last_id = docs[-1]['_id']
+        try:
+            result = await target.insert_many([to_storage_doc(d) for d in docs], ordered=False)
+            copied += len(result.inserted_ids)
+        except BulkWriteError as e:
+            if any(err['code'] != DUPLICATE_KEY for err in e.details['writeErrors']):
+                raise
+            copied += e.details['nInserted']
+        if pause:
+            await asyncio.sleep(pause)
+
+async def migrate_collection(name: str, batch_size: int, pause: float, swap: bool) -> dict:
+    if not await raw_db[name].find_one({"id": {"$exists": True}}, {"_id": 1}):
+        logger.info("%s: no documents with an id field, skipping", name)
+        return {"copied": 0, "swapped": False}
+
+    copied = await copy_collection(name, batch_size, pause)
+    source_count = await raw_db[name].count_documents({})
+    target_count = await raw_db[f"{name}__pk"].count_documents({})
+    logger.info("%s: copied %s, source %s, target %s", name, copied, source_count, target_count)
+    if target_count != source_count:
+        raise RuntimeError(f"{name}: target has {target_count} documents, source has {source_count}; writes may still be running")
+
+    if swap:
+        await raw_db[name].rename(f"{name}__pre_pk_backup")
+        await raw_db[f"{name}__pk"].rename(name)
+        logger.info("%s: swapped, original kept as %s__pre_pk_backup", name, name)
+    return {"copied": copied, "swapped": swap}
+
+async def migrate(collections: list = None, batch_size: int = 1000, pause: float = 0.05, swap: bool = True) -> dict:
+    return {
+        name: await migrate_collection(name, batch_size, pause, swap)
+        for name in collections or PK_COLLECTIONS
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Rewrite collections so the application id is the binary UUID _id. "
+                    "Pause writes before the swap, then start the app with ID_AS_PRIMARY_KEY=true."
+    )
+    parser.add_argument("--collections", nargs="*", help="Defaults to every collection with an application id")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause", type=float, default=0.05, help="Seconds to sleep between batches")
+    parser.add_argument("--no-swap", action="store_true", help="Copy only; leave the <name>__pk collections for inspection")
+    args = parser.parse_args()
+    try:
+        await migrate(args.collections, args.batch_size, args.pause, not args.no_swap)
+    finally:
+        await close_db_connection()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
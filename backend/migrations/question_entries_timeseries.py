@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import logging
+from config import QUESTION_ENTRIES_TIMESERIES_COLLECTION
+from database import raw_db, close_db_connection, ensure_timeseries_collection
+from storage import TimeSeriesCollection, from_storage_doc
+from utils import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+SOURCE = "question_entries"
+CHECKPOINT_ID = "question_entries_timeseries"
+
+async def copy_entries(target_name: str, batch_size: int, pause: float) -> int:
+    # Time-series collections have no unique indexes, so progress is tracked by the last
+    # copied source _id. Re-running resumes from the checkpoint and picks up entries
+    # written since, which lets the copy catch up right before the flag is switched on.
+    source = raw_db[SOURCE]
+    target = raw_db[target_name]
+    adapter = TimeSeriesCollection(target)
+    checkpoint = await raw_db.migration_checkpoints.find_one({"_id": CHECKPOINT_ID})
+    last_id = checkpoint['last_id'] if checkpoint else None
+    copied = 0
+    while True:
+        query = {} if last_id is None else {"_id": {"$gt": last_id}}
+        docs = await source.find(query).sort("_id", 1).limit(batch_size).to_list(None)
+        if not docs:
+            return copied
+
+        entries = []
+        for doc in docs:
+            # Collections already moved to ID_AS_PRIMARY_KEY keep the id in _id
+            entry = from_storage_doc(doc) if "id" not in doc else {k: v for k, v in doc.items() if k != "_id"}
+            entry['date'] = parse_datetime(entry.get('date'))
+            if entry['date'] is None:
+                logger.warning("%s %s: no date, skipped", SOURCE, doc['_id'])
+                continue
+            entries.append(entry)
+
+        # A batch that was inserted before a crash but not checkpointed is not copied twice
+        existing = set(await target.distinct("id", {"id": {"$in": [e['id'] for e in entries]}}))
+        entries = [e for e in entries if e['id'] not in existing]
+        if entries:
+            await adapter.insert_many(entries, ordered=False)
+            copied += len(entries)
+
+        last_id = docs[-1]['_id']
+        await raw_db.migration_checkpoints.update_one(
+            {"_id": CHECKPOINT_ID}, {"$set": {"last_id": last_id}}, upsert=True
+        )
+        if pause:
+            await asyncio.sleep(pause)
+
+async def migrate(target_name: str = QUESTION_ENTRIES_TIMESERIES_COLLECTION, batch_size: int = 1000, pause: float = 0.05) -> dict:
+    await ensure_timeseries_collection(target_name)
+    copied = await copy_entries(target_name, batch_size, pause)
+    source_count = await raw_db[SOURCE].count_documents({})
+    target_count = await raw_db[target_name].count_documents({})
+    logger.info("%s: copied %s, source %s, %s %s", SOURCE, copied, source_count, target_name, target_count)
+    return {"copied": copied, "source_count": source_count, "target_count": target_count}
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Copy question entries into a time-series collection. Run it again right before "
+                    "starting the app with QUESTION_ENTRIES_TIMESERIES=true to copy entries written meanwhile."
+    )
+    parser.add_argument("--target", default=QUESTION_ENTRIES_TIMESERIES_COLLECTION)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause", type=float, default=0.05, help="Seconds to sleep between batches")
+    args = parser.parse_args()
+    try:
+        await migrate(args.target, args.batch_size, args.pause)
+    finally:
+        await close_db_connection()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
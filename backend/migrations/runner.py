@@ -0,0 +1,166 @@
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from config import TENANT_ROUTING
+from database import raw_db, tenant_raw_database, close_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Applied migrations are recorded per database in this collection, keyed by "<version>_<name>".
+# Each step streams its collection in _id order and checkpoints the last _id after every
+# bulk_write, so a failed or interrupted run resumes where it stopped.
+MIGRATIONS_COLLECTION = "schema_migrations"
+
+class Step:
+    def __init__(self, collection: str, query: dict, transform, projection: dict = None):
+        # transform(doc) returns an update document for the doc, or None to leave it unchanged
+        self.collection = collection
+        self.query = query
+        self.transform = transform
+        self.projection = projection
+
+class Migration:
+    def __init__(self, version: int, name: str, steps: list, before=None, after=None):
+        # before(database) and after(database) are optional coroutines run around the steps,
+        # e.g. to refuse data the migration can't handle, or to change indexes
+        self.version = version
+        self.name = name
+        self.steps = steps
+        self.before = before
+        self.after = after
+
+    @property
+    def id(self) -> str:
+        return f"{self.version:04d}_{self.name}"
+
+class MigrationInProgress(Exception):
+    pass
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+async def _flush(database, record_id: str, index: int, collection: str, ops: list, last_id, count: int) -> int:
+    modified = 0
+    if ops:
+        result = await database[collection].bulk_write(ops, ordered=False)
+        modified = result.modified_count
+    await database[MIGRATIONS_COLLECTION].update_one(
+        {"_id": record_id},
+        {"$set": {f"checkpoints.{index}": last_id, "updated_at": _now()}, "$inc": {"processed": count, "modified": modified}}
+    )
+    return modified
+
+async def _run_step(database, record: dict, index: int, step: Step, batch_size: int, pause: float) -> int:
+    last_id = record.get('checkpoints', {}).get(str(index))
+    query = step.query if last_id is None else {"$and": [step.query, {"_id": {"$gt": last_id}}]}
+    cursor = database[step.collection].find(query, step.projection).sort("_id", 1).batch_size(batch_size)
+
+    ops = []
+    count = 0
+    modified = 0
+    async for doc in cursor:
+        update = step.transform(doc)
+        if update:
+            ops.append(UpdateOne({"_id": doc['_id']}, update))
+        count += 1
+        last_id = doc['_id']
+        if count == batch_size:
+            modified += await _flush(database, record['_id'], index, step.collection, ops, last_id, count)
+            ops, count = [], 0
+            if pause:
+                await asyncio.sleep(pause)
+    if count:
+        modified += await _flush(database, record['_id'], index, step.collection, ops, last_id, count)
+    return modified
+
+async def _claim(database, migration: Migration, force: bool) -> dict:
+    # The upsert collides with a record another runner marked as running
+    query = {"_id": migration.id} if force else {"_id": migration.id, "status": {"$ne": "running"}}
+    try:
+        await database[MIGRATIONS_COLLECTION].update_one(
+            query,
+            {
+                "$set": {"status": "running", "version": migration.version, "name": migration.name,
+                         "started_at": _now(), "error": None},
+                "$setOnInsert": {"checkpoints": {}, "processed": 0, "modified": 0}
+            },
+            upsert=True
+        )
+    except DuplicateKeyError:
+        raise MigrationInProgress(
+            f"{migration.id} is already running on {database.name}; if that run crashed, re-run with --force"
+        )
+    return await database[MIGRATIONS_COLLECTION].find_one({"_id": migration.id})
+
+async def applied_migrations(database) -> set:
+    records = await database[MIGRATIONS_COLLECTION].find({"status": "applied"}, {"_id": 1}).to_list(None)
+    return {r['_id'] for r in records}
+
+async def run_migrations(database, migrations: list, batch_size: int = 500, pause: float = 0.05,
+                         force: bool = False, target: int = None) -> list:
+    applied = await applied_migrations(database)
+    ran = []
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.id in applied or (target is not None and migration.version > target):
+            continue
+        record = await _claim(database, migration, force)
+        logger.info("%s: applying %s", database.name, migration.id)
+        try:
+            if migration.before:
+                await migration.before(database)
+            for index, step in enumerate(migration.steps):
+                modified = await _run_step(database, record, index, step, batch_size, pause)
+                logger.info("%s: %s step %s (%s) modified %s", database.name, migration.id, index, step.collection, modified)
+            if migration.after:
+                await migration.after(database)
+        except Exception as e:
+            await database[MIGRATIONS_COLLECTION].update_one(
+                {"_id": migration.id}, {"$set": {"status": "failed", "error": str(e), "updated_at": _now()}}
+            )
+            raise
+        await database[MIGRATIONS_COLLECTION].update_one(
+            {"_id": migration.id}, {"$set": {"status": "applied", "applied_at": _now(), "updated_at": _now()}}
+        )
+        ran.append(migration.id)
+    return ran
+
+async def migration_status(database, migrations: list) -> list:
+    records = {r['_id']: r for r in await database[MIGRATIONS_COLLECTION].find({}).to_list(None)}
+    return [
+        {"id": m.id, "status": records.get(m.id, {}).get("status", "pending"), "processed": records.get(m.id, {}).get("processed", 0)}
+        for m in sorted(migrations, key=lambda m: m.version)
+    ]
+
+async def target_databases() -> list:
+    databases = [raw_db]
+    if TENANT_ROUTING:
+        tenants = await raw_db.tenants.find({}, {"_id": 0}).to_list(None)
+        databases += [tenant_raw_database(t) for t in tenants]
+    return databases
+
+async def main():
+    from migrations.versions import MIGRATIONS
+
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations to the directory and tenant databases")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.05, help="Seconds to sleep between batches")
+    parser.add_argument("--target", type=int, help="Stop after this migration version")
+    parser.add_argument("--status", action="store_true", help="Only show which migrations are applied")
+    parser.add_argument("--force", action="store_true", help="Take over a migration left running by a crashed run")
+    args = parser.parse_args()
+    try:
+        for database in await target_databases():
+            if args.status:
+                for status in await migration_status(database, MIGRATIONS):
+                    logger.info("%s: %s %s (%s processed)", database.name, status['id'], status['status'], status['processed'])
+            else:
+                await run_migrations(database, MIGRATIONS, args.batch_size, args.pause, args.force, args.target)
+    finally:
+        await close_db_connection()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
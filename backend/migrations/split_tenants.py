@@ -0,0 +1,56 @@
+import argparse
+import asyncio
+import logging
+from database import (
+    raw_db, adapt_database, tenant_database, ensure_indexes, tenant_raw_database, close_db_connection,
+    TENANT_COLLECTIONS
+)
+from tenant_moves import copy_collection
+
+logger = logging.getLogger(__name__)
+
+# Read and written through the storage adapters, so the copy works in every storage mode
+directory = adapt_database(raw_db)
+
+async def _student_ids(school: str) -> list:
+    users = await directory.users.find({"school": school, "role": "student"}, {"_id": 0, "id": 1}).to_list(None)
+    return [u['id'] for u in users]
+
+async def split_tenant(tenant: dict, batch_size: int, pause: float, delete_source: bool) -> dict:
+    await ensure_indexes(tenant_raw_database(tenant), TENANT_COLLECTIONS)
+    student_ids = await _student_ids(tenant['school'])
+    results = {}
+    for collection in TENANT_COLLECTIONS:
+        results[collection] = await copy_collection(
+            directory[collection], tenant_database(tenant)[collection], collection, student_ids, batch_size, pause, delete_source
+        )
+        logger.info("%s (%s): copied %s %s", tenant['school'], tenant['db_name'], results[collection], collection)
+    return results
+
+async def migrate(schools: list = None, batch_size: int = 500, pause: float = 0.05, delete_source: bool = False) -> dict:
+    query = {"school": {"$in": schools}} if schools else {}
+    tenants = await directory.tenants.find(query, {"_id": 0}).to_list(None)
+    return {
+        tenant['school']: await split_tenant(tenant, batch_size, pause, delete_source)
+        for tenant in tenants
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Copy each tenant's practice data from the shared database into its own database. "
+                    "Create tenants first (POST /api/admin/tenants), run this, switch TENANT_ROUTING=true, "
+                    "then run again with --delete-source."
+    )
+    parser.add_argument("--schools", nargs="*", help="Defaults to every tenant")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.05, help="Seconds to sleep between batches")
+    parser.add_argument("--delete-source", action="store_true", help="Remove copied documents from the shared database")
+    args = parser.parse_args()
+    try:
+        await migrate(args.schools, args.batch_size, args.pause, args.delete_source)
+    finally:
+        await close_db_connection()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+from pymongo import ASCENDING
+from migrations.bson_datetimes import DATETIME_FIELDS
+from migrations.runner import Migration, Step
+from utils import parse_datetime
+
+# Ordered schema migrations for `python -m migrations.runner`. Append new entries with the
+# next version number; never renumber or edit one that has been applied.
+
+# Profile fields added after the first user documents were written (server_backup.py era)
+USER_PROFILE_FIELDS = ["school", "grade", "birth_date", "phone", "address", "goal"]
+
+def _backfill_user_profile(doc: dict):
+    missing = {field: None for field in USER_PROFILE_FIELDS if field not in doc}
+    if "updated_at" not in doc:
+        missing["updated_at"] = doc.get("created_at")
+    return {"$set": missing} if missing else None
+
+def _backfill_empty_answers(doc: dict):
+    return {"$set": {"empty_answers": 0}}
+
+def _lowercase_email(doc: dict):
+    return {"$set": {"email": doc["email"].lower()}}
+
+async def _check_duplicate_emails(database):
+    # Lowercasing Foo@x.com and foo@x.com would leave two accounts behind one login
+    duplicates = await database.users.aggregate([
+        {"$group": {"_id": {"$toLower": "$email"}, "users": {"$push": {"$ifNull": ["$id", "$_id"]}}}},
+        {"$match": {"users.1": {"$exists": True}}},
+    ]).to_list(None)
+    if duplicates:
+        report = "; ".join(f"{d['_id']} ({', '.join(str(u) for u in d['users'])})" for d in duplicates)
+        raise RuntimeError(f"Emails shared by several accounts differing only in case, merge or rename them first: {report}")
+
+async def _unique_email_index(database):
+    # Replaces the non-unique index created before emails were lowercased
+    email_index = (await database.users.index_information()).get("email_1")
+    if email_index and not email_index.get("unique"):
+        await database.users.drop_index("email_1")
+    await database.users.create_index([("email", ASCENDING)], unique=True)
+
+def _datetime_transform(fields: list):
+    def transform(doc: dict):
+        update = {}
+        for field in fields:
+            if isinstance(doc.get(field), str):
+                try:
+                    update[field] = parse_datetime(doc[field])
+                except ValueError:
+                    pass
+        return {"$set": update} if update else None
+    return transform
+
+MIGRATIONS = [
+    Migration(1, "user_profile_fields", [
+        Step(
+            "users",
+            {"$or": [{field: {"$exists": False}} for field in USER_PROFILE_FIELDS + ["updated_at"]]},
+            _backfill_user_profile
+        ),
+    ]),
+    Migration(2, "question_entry_empty_answers", [
+        Step("question_entries", {"empty_answers": {"$exists": False}}, _backfill_empty_answers, {"_id": 1}),
+    ]),
+    Migration(3, "bson_datetimes", [
+        Step(
+            collection,
+            {"$or": [{field: {"$type": "string"}} for field in fields]},
+            _datetime_transform(fields),
+            {field: 1 for field in fields}
+        )
+        for collection, fields in DATETIME_FIELDS.items()
+    ]),
+    Migration(4, "lowercase_emails", [
+        Step("users", {"email": {"$regex": "[A-Z]"}}, _lowercase_email, {"email": 1}),
+    ], before=_check_duplicate_emails, after=_unique_email_index),
+]
@@ -1,8 +1,43 @@
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, AfterValidator
+from typing import List, Optional, Dict, Any, Annotated
 from datetime import datetime, timezone
+import os
+import threading
+import time
 import uuid
 from enum import Enum
+from config import ID_GENERATOR
+
+# ID Generation
+_uuid7_lock = threading.Lock()
+_uuid7_last = (0, 0)
+
+def uuid7() -> uuid.UUID:
+    # RFC 9562 UUIDv7: 48-bit Unix millisecond timestamp, 12-bit sequence, 62 random bits.
+    # The sequence is re-seeded every millisecond and incremented within one, so ids from
+    # this process are strictly increasing and sort by creation time as strings or bytes.
+    global _uuid7_last
+    with _uuid7_lock:
+        ms = time.time_ns() // 1_000_000
+        last_ms, last_seq = _uuid7_last
+        if ms > last_ms:
+            seq = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            ms, seq = last_ms, last_seq + 1
+            if seq > 0xFFF:
+                ms, seq = last_ms + 1, 0
+        _uuid7_last = (ms, seq)
+    rand = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (ms & ((1 << 48) - 1)) << 80 | 0x7 << 76 | seq << 64 | 0b10 << 62 | rand
+    return uuid.UUID(int=value)
+
+ID_GENERATORS = {
+    "uuid4": lambda: str(uuid.uuid4()),
+    "uuid7": lambda: str(uuid7()),
+}
+
+def new_id() -> str:
+    return ID_GENERATORS[ID_GENERATOR]()
 
 # Enums
 class UserRole(str, Enum):
@@ -16,6 +51,12 @@ class ApprovalStatus(str, Enum):
     APPROVED = "approved"
     REJECTED = "rejected"
 
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
 class ExamType(str, Enum):
     TYT = "TYT"
     AYT = "AYT"
@@ -23,10 +64,13 @@ class ExamType(str, Enum):
     KPSS = "KPSS"
 
 # User Models
+# Emails are stored and looked up in lowercase, so addresses differing only in case are one account
+Email = Annotated[EmailStr, AfterValidator(str.lower)]
+
 class User(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    email: EmailStr
+    id: str = Field(default_factory=new_id)
+    email: Email
     password: str
     full_name: str
     role: UserRole
@@ -41,7 +85,7 @@ class User(BaseModel):
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class UserRegister(BaseModel):
-    email: EmailStr
+    email: Email
     password: str
     full_name: str
     role: UserRole
@@ -53,7 +97,7 @@ class UserRegister(BaseModel):
     goal: Optional[str] = None
 
 class UserLogin(BaseModel):
-    email: EmailStr
+    email: Email
     password: str
 
 class UserResponse(BaseModel):
@@ -70,6 +114,26 @@ class UserResponse(BaseModel):
     goal: Optional[str] = None
     created_at: datetime
 
+class UserImportRow(BaseModel):
+    email: Email
+    password: str
+    full_name: str
+    role: UserRole
+    school: Optional[str] = None
+    grade: Optional[str] = None
+    birth_date: Optional[str] = None
+    phone: Optional[str] = None
+    address: Optional[str] = None
+    goal: Optional[str] = None
+    parent_email: Optional[Email] = None
+    student_email: Optional[Email] = None
+
+class UserImport(BaseModel):
+    users: List[Dict[str, Any]]
+
+class BulkUserIds(BaseModel):
+    user_ids: List[str]
+
 class UserUpdate(BaseModel):
     full_name: Optional[str] = None
     school: Optional[str] = None
@@ -82,23 +146,38 @@ class UserUpdate(BaseModel):
 # Match Models
 class StudentTeacherMatch(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     student_id: str
     teacher_id: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class ParentStudentRelation(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     parent_id: str
     student_id: str
     relation_type: str = "parent"
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class StudentTeacherPair(BaseModel):
+    student_id: str
+    teacher_id: str
+
+class BulkMatchCreate(BaseModel):
+    matches: List[StudentTeacherPair]
+
+class ParentStudentPair(BaseModel):
+    parent_id: str
+    student_id: str
+    relation_type: str = "parent"
+
+class BulkParentStudentRelationCreate(BaseModel):
+    relations: List[ParentStudentPair]
+
 # Question Entry Models
 class QuestionEntry(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     student_id: str
     teacher_id: str
     exam_type: ExamType
@@ -124,7 +203,7 @@ class QuestionEntryCreate(BaseModel):
 # Exam Analysis Models
 class ExamAnalysis(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     student_id: str
     teacher_id: str
     exam_type: ExamType
@@ -143,10 +222,39 @@ class ExamAnalysisCreate(BaseModel):
     subjects: List[Dict[str, Any]]
     notes: Optional[str] = None
 
+# Archive Rollup Models
+class PracticeRollup(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    student_id: str
+    teacher_id: str
+    subject: str
+    month: datetime
+    count: int = 0
+    total_questions: int = 0
+    correct_answers: int = 0
+    wrong_answers: int = 0
+    empty_answers: int = 0
+    net_score: float = 0
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class ExamRollup(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    student_id: str
+    teacher_id: str
+    exam_type: str
+    month: datetime
+    count: int = 0
+    total_net: float = 0
+    # Per subject: name, count, total_net, total_correct, total_wrong
+    subjects: List[Dict[str, Any]] = []
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
 # Resource Tracking Models
 class ResourceTracking(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     student_id: str
     teacher_id: str
     resource_name: str
@@ -167,7 +275,7 @@ class ResourceTrackingCreate(BaseModel):
 # Assignment Models
 class Assignment(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     student_id: str
     teacher_id: str
     title: str
@@ -184,10 +292,18 @@ class AssignmentCreate(BaseModel):
     subject: str
     due_date: datetime
 
+class BulkAssignmentCreate(BaseModel):
+    student_ids: List[str] = []
+    all_students: bool = False
+    title: str
+    description: str
+    subject: str
+    due_date: datetime
+
 # Study Schedule Models
 class StudySchedule(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     student_id: str
     teacher_id: str
     day_of_week: int
@@ -208,7 +324,7 @@ class StudyScheduleCreate(BaseModel):
 # Notification Model
 class Notification(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     user_id: str
     title: str
     message: str
@@ -219,7 +335,7 @@ class Notification(BaseModel):
 # Subject and Topic Models
 class Subject(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     name: str
     exam_type: ExamType
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -230,7 +346,7 @@ class SubjectCreate(BaseModel):
 
 class Topic(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     subject_id: str
     name: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -242,7 +358,7 @@ class TopicCreate(BaseModel):
 # Weekly Schedule Models
 class WeeklySchedule(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     student_id: str
     teacher_id: str
     week_start_date: datetime
@@ -270,7 +386,7 @@ class ScheduleItem(BaseModel):
 # Resource with Topics Models
 class ResourceWithTopics(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     student_id: str
     teacher_id: str
     resource_name: str
@@ -283,3 +399,39 @@ class ResourceWithTopicsCreate(BaseModel):
     resource_name: str
     subject: str
     topics: List[Dict[str, Any]]
+
+# Tenant Models
+class Tenant(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=new_id)
+    school: str
+    db_name: str
+    mongo_url: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class TenantCreate(BaseModel):
+    school: str
+    db_name: str
+    mongo_url: Optional[str] = None
+
+# Background Job Models
+class Job(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=new_id)
+    type: str
+    status: JobStatus = JobStatus.QUEUED
+    params: Dict[str, Any] = {}
+    created_by: Optional[str] = None
+    tenant_id: Optional[str] = None
+    progress: Dict[str, Any] = {}
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    max_attempts: int = 3
+    worker_id: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    run_after: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    interval_seconds: Optional[int] = None
+    last_status: Optional[JobStatus] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,151 @@
+import asyncio
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timezone
+from config import PROFILE_SAMPLE_INTERVAL_MS, PROFILE_HISTORY
+from models import UserRole
+from request_context import current_request
+from utils import token_payload
+
+# On-demand sampling profiler for single requests. An admin sends "X-Profile: 1" (or
+# ?profile=1) and the event-loop thread is sampled while that request runs. Samples taken
+# while another task holds the loop are left out; samples of an idle loop are time the
+# request spent awaiting MongoDB or the network. Stacks are stored in the folded format
+# read by flamegraph.pl and speedscope, rooted at a category. Only installed when
+# PROFILING_ENABLED is set.
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# Checked from the innermost frame outwards; the first match decides the category
+FRAME_CATEGORIES = [
+    ("awaiting_io", ("selectors",)),
+    ("validation", ("pydantic", "fastapi._compat")),
+    ("json_encoding", ("fastapi.encoders", "json", "starlette.responses")),
+    ("mongo_driver", ("motor", "pymongo", "bson")),
+]
+
+profiles = deque(maxlen=PROFILE_HISTORY)
+
+def _frame_category(module: str) -> str:
+    for category, prefixes in FRAME_CATEGORIES:
+        if any(module == prefix or module.startswith(prefix + ".") for prefix in prefixes):
+            return category
+    return None
+
+def classify(modules: list) -> str:
+    for module in reversed(modules):
+        category = _frame_category(module)
+        if category:
+            return category
+    # Endpoint code, and the helpers it calls, runs below a routes.* frame
+    if any(module.startswith("routes.") for module in modules):
+        return "handler"
+    return "framework"
+
+class RequestProfiler:
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.stacks = Counter()
+        self.categories = Counter()
+        self.other_tasks = 0.0
+        self._stopped = threading.Event()
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.task = asyncio.current_task()
+        self.thread_id = threading.get_ident()
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stopped.wait(self.interval):
+            now = time.perf_counter()
+            # Weighted by elapsed time, since the sampler only runs when it gets the GIL
+            self._sample(now - last)
+            last = now
+
+    def _sample(self, weight: float):
+        frame = sys._current_frames().get(self.thread_id)
+        running = asyncio.current_task(self.loop)
+        if frame is None or (running is not None and running is not self.task):
+            self.other_tasks += weight
+            return
+        frames = []
+        modules = []
+        while frame is not None:
+            module = frame.f_globals.get("__name__", "?")
+            modules.append(module)
+            frames.append(f"{module}:{frame.f_code.co_name}")
+            frame = frame.f_back
+        frames.reverse()
+        modules.reverse()
+        category = classify(modules)
+        self.categories[category] += weight
+        self.stacks[";".join([category, *frames])] += weight
+
+    def folded(self) -> str:
+        # Values in microseconds
+        return "\n".join(f"{stack} {round(weight * 1_000_000)}" for stack, weight in self.stacks.most_common()) + "\n"
+
+def _wants_profile(scope) -> bool:
+    headers = dict(scope["headers"])
+    if headers.get(PROFILE_HEADER.lower().encode()) in (b"1", b"true"):
+        return True
+    query = scope.get("query_string", b"").split(b"&")
+    return b"profile=1" in query or b"profile=true" in query
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        payload = token_payload(dict(scope["headers"]))
+        if payload is None or payload.get('role') != UserRole.ADMIN.value:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = str(uuid.uuid4())
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (PROFILE_ID_HEADER.lower().encode(), profile_id.encode())]
+            await send(message)
+
+        profiler = RequestProfiler()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.stop()
+            context = current_request.get()
+            profiles.append({
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": context.route if context is not None else None,
+                "profiled_by": payload.get('user_id'),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "duration_ms": round(profiler.duration * 1000, 3),
+                "categories_ms": {c: round(w * 1000, 3) for c, w in profiler.categories.most_common()},
+                "other_tasks_ms": round(profiler.other_tasks * 1000, 3),
+                "folded": profiler.folded(),
+            })
+
+def get_profile(profile_id: str) -> dict:
+    return next((p for p in profiles if p["id"] == profile_id), None)
+
+def list_profiles() -> list:
+    return [{k: v for k, v in p.items() if k != "folded"} for p in reversed(profiles)]
@@ -0,0 +1,113 @@
+import base64
+import hashlib
+import hmac
+import logging
+import bson
+from fastapi import Depends, Request
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+from config import READ_PREFERENCES, READ_MAX_STALENESS_SECONDS, CAUSAL_SESSION_ROUTERS, SECRET_KEY
+from database import client, tenant_client, current_tenant, current_request_options, RequestDatabaseOptions
+
+logger = logging.getLogger(__name__)
+
+# Read-only routers can be served by secondaries, and routers that write then re-read run
+# each request in a causally consistent session. The session's operation and cluster time
+# are returned in X-Causal-Token; a client that sends the token back gets a session that
+# has advanced past its earlier writes, even when the read lands on a lagging secondary.
+# The token is signed: MongoDB rejects a forged cluster time, failing the whole request.
+CAUSAL_TOKEN_HEADER = "X-Causal-Token"
+
+READ_PREFERENCE_MODES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+def make_read_preference(mode: str, max_staleness: int = -1):
+    if mode == "primary":
+        return Primary()
+    if mode not in READ_PREFERENCE_MODES:
+        raise ValueError(f"Unknown read preference: {mode}")
+    return READ_PREFERENCE_MODES[mode](max_staleness=max_staleness)
+
+ROUTER_READ_PREFERENCES = {
+    router: make_read_preference(mode, READ_MAX_STALENESS_SECONDS)
+    for router, mode in READ_PREFERENCES.items()
+}
+
+def _sign(data: bytes) -> bytes:
+    return hmac.new(SECRET_KEY.encode(), data, hashlib.sha256).digest()
+
+def encode_causal_token(session) -> str:
+    if session.operation_time is None or session.cluster_time is None:
+        return None
+    data = bson.encode({
+        "operationTime": session.operation_time,
+        "clusterTime": session.cluster_time,
+    })
+    return f"{base64.urlsafe_b64encode(data).decode()}.{base64.urlsafe_b64encode(_sign(data)).decode()}"
+
+def advance_session(session, token: str):
+    try:
+        data, signature = (base64.urlsafe_b64decode(part) for part in token.split("."))
+        if not hmac.compare_digest(signature, _sign(data)):
+            raise ValueError("bad signature")
+        state = bson.decode(data)
+        session.advance_cluster_time(state['clusterTime'])
+        session.advance_operation_time(state['operationTime'])
+    except Exception:
+        # A stale, malformed or forged token only costs consistency with the previous request
+        logger.debug("Ignoring invalid causal token")
+
+def _use_read_preference(read_preference):
+    async def dependency():
+        options = current_request_options.get()
+        if options is not None:
+            options.read_preference = read_preference
+    return dependency
+
+async def _use_causal_session(request: Request):
+    options = current_request_options.get()
+    if options is None:
+        return
+    tenant = current_tenant.get()
+    session = await (tenant_client(tenant) if tenant else client).start_session(causal_consistency=True)
+    token = request.headers.get(CAUSAL_TOKEN_HEADER)
+    if token:
+        advance_session(session, token)
+    options.session = session
+
+def router_dependencies(router: str) -> list:
+    dependencies = []
+    if router in ROUTER_READ_PREFERENCES:
+        dependencies.append(Depends(_use_read_preference(ROUTER_READ_PREFERENCES[router])))
+    if router in CAUSAL_SESSION_ROUTERS:
+        dependencies.append(Depends(_use_causal_session))
+    return dependencies
+
+class RequestDatabaseOptionsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        options = RequestDatabaseOptions()
+        token = current_request_options.set(options)
+
+        async def send_with_causal_token(message):
+            if message["type"] == "http.response.start" and options.session is not None:
+                causal_token = encode_causal_token(options.session)
+                if causal_token:
+                    message["headers"] = [*message.get("headers", []), (CAUSAL_TOKEN_HEADER.lower().encode(), causal_token.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_causal_token)
+        finally:
+            current_request_options.reset(token)
+            if options.session is not None:
+                await options.session.end_session()
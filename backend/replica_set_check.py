@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import logging
+import sys
+from pymongo import monitoring
+
+# Checks read routing against a local three-node replica set, e.g.
+#   mongod --replSet rs0 --port 27017 --dbpath /tmp/rs0-0   (and 27018, 27019; then rs.initiate())
+#   MONGO_URL="mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0" \
+#   DB_NAME=read_routing_check READ_PREFERENCE_PARENT=secondaryPreferred \
+#   python replica_set_check.py
+# The app runs in-process; the check database is dropped afterwards.
+
+class CommandRecorder(monitoring.CommandListener):
+    def __init__(self):
+        self.events = []
+
+    def started(self, event):
+        self.events.append((event.command_name, event.connection_id, event.command.get("readConcern", {})))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+recorder = CommandRecorder()
+# Registered before the app's client is created so it sees every command
+monitoring.register(recorder)
+
+import httpx
+from database import client, raw_db
+from server import app
+from utils import create_access_token
+
+READ_COMMANDS = {"find", "aggregate", "count", "distinct"}
+
+def _reads_since(mark: int) -> list:
+    return [e for e in recorder.events[mark:] if e[0] in READ_COMMANDS]
+
+async def run_check() -> list:
+    failures = []
+    admin = {"Authorization": "Bearer " + create_access_token({"user_id": "replica-set-check", "role": "admin"})}
+    async with app.router.lifespan_context(app):
+        try:
+            await _exercise_routes(failures, admin)
+        finally:
+            await client.drop_database(raw_db.name)
+    return failures
+
+async def _exercise_routes(failures: list, admin: dict):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://check/api") as api:
+        ids = {}
+        for role in ("teacher", "student", "parent"):
+            response = await api.post("/auth/register", json={
+                "email": f"{role}@replica-set-check.local", "password": "check", "full_name": role, "role": role
+            })
+            ids[role] = response.json()['id']
+        await api.put("/admin/approve-users", json={"user_ids": list(ids.values())}, headers=admin)
+        await api.post("/admin/matches/bulk", json={"matches": [{"student_id": ids['student'], "teacher_id": ids['teacher']}]}, headers=admin)
+        await api.post("/admin/parent-student-relations/bulk", json={"relations": [{"parent_id": ids['parent'], "student_id": ids['student']}]}, headers=admin)
+
+        teacher = {"Authorization": "Bearer " + create_access_token({"user_id": ids['teacher'], "role": "teacher"})}
+        response = await api.post("/teacher/question-entry", json={
+            "student_id": ids['student'], "exam_type": "TYT", "subject": "check",
+            "total_questions": 10, "correct_answers": 7, "wrong_answers": 3
+        }, headers=teacher)
+        causal_token = response.headers.get("x-causal-token")
+        if not causal_token:
+            failures.append("teacher write returned no X-Causal-Token")
+
+        mark = len(recorder.events)
+        response = await api.get(f"/teacher/question-entries/{ids['student']}", headers={**teacher, "X-Causal-Token": causal_token or ""})
+        if len(response.json()) != 1:
+            failures.append(f"teacher re-read returned {len(response.json())} entries, expected 1")
+        if not any("afterClusterTime" in read_concern for _, _, read_concern in _reads_since(mark)):
+            failures.append("teacher re-read did not wait for the previous write (no afterClusterTime)")
+
+        parent = {"Authorization": "Bearer " + create_access_token({"user_id": ids['parent'], "role": "parent"})}
+        # The relation was just written to the primary; give the secondaries a moment
+        await asyncio.sleep(1)
+        primary = client.primary
+        mark = len(recorder.events)
+        for _ in range(5):
+            await api.get(f"/parent/child-question-entries/{ids['student']}", headers=parent)
+        servers = {address for _, address, _ in _reads_since(mark)}
+        if primary in servers:
+            failures.append(f"parent reads reached the primary {primary}; servers used: {sorted(servers)}")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Check read-preference routing and causal sessions on a replica set")
+    parser.parse_args()
+    failures = await run_check()
+    for failure in failures:
+        logging.error(failure)
+    if failures:
+        sys.exit(1)
+    logging.info("Read routing OK")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+import asyncio
+import functools
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from fastapi.routing import APIRoute
+from starlette.routing import Match
+
+# The request being served, so code below the route (database listeners, loggers) can
+# attribute its work. Motor copies the context into its executor threads, so pymongo
+# monitoring callbacks see the request that issued the command.
+current_request = ContextVar("current_request", default=None)
+
+def match_route(scope) -> tuple:
+    # Route template and path parameters for the request, resolved before the middleware
+    # below us run so that in-flight gauges and the tenant lookup are attributed too. A
+    # PARTIAL match is a known path with the wrong method.
+    partial = None
+    for route in scope["app"].router.routes:
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path_format", None), child_scope.get("path_params", {})
+        if match == Match.PARTIAL and partial is None:
+            partial = getattr(route, "path_format", None), child_scope.get("path_params", {})
+    return partial or (None, {})
+
+class RequestContext:
+    def __init__(self, scope):
+        self.scope = scope
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.route, self.path_params = match_route(scope)
+        self.started = time.perf_counter()
+        # Filled in by CommandMonitor (from Motor's threads) and TimedRoute
+        self.db_calls = 0
+        self.db_ms = 0.0
+        self.query_shapes = Counter()
+        self.endpoint_finished = None
+        self.serialization_ms = None
+        # Token payload, set by verify_token
+        self.user = None
+        # Tenant the request's practice data was routed to, set by tenancy.use_tenant
+        self.tenant_id = None
+        self._lock = threading.Lock()
+
+    def record_query(self, shape: tuple, duration_ms: float):
+        with self._lock:
+            self.db_calls += 1
+            self.db_ms += duration_ms
+            self.query_shapes[shape] += 1
+
+class TimedRoute(APIRoute):
+    # Separates response serialization (response_model validation, JSON encoding) from the
+    # endpoint body: the endpoint marks when it returned, the handler when the response is built
+    def __init__(self, path: str, endpoint, **kwargs):
+        if not getattr(endpoint, "_timed", False):
+            endpoint = _timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            context = current_request.get()
+            if context is not None and context.endpoint_finished is not None:
+                context.serialization_ms = (time.perf_counter() - context.endpoint_finished) * 1000
+            return response
+        return timed_handler
+
+def _mark_endpoint_finished():
+    context = current_request.get()
+    if context is not None:
+        context.endpoint_finished = time.perf_counter()
+
+def _timed_endpoint(endpoint):
+    # Sync endpoints keep a sync wrapper, so FastAPI still runs them in the threadpool
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _mark_endpoint_finished()
+    else:
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _mark_endpoint_finished()
+    timed._timed = True
+    return timed
+
+class RequestContextMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # A local, so the event-loop watchdog can find the request from this frame
+        context = RequestContext(scope)
+        token = current_request.set(context)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_request.reset(token)
@@ -1,14 +1,34 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
 from typing import List
+from collections import Counter
 from datetime import datetime, timezone
-from database import db
+from pymongo.errors import DuplicateKeyError
+from config import TENANT_ROUTING
+from database import db, ensure_indexes, tenant_raw_database, TENANT_COLLECTIONS
 from models import (
     UserResponse, UserRole, ApprovalStatus, StudentTeacherMatch, 
-    Notification, User, UserRegister, UserUpdate, ParentStudentRelation
+    Notification, User, UserRegister, UserUpdate, ParentStudentRelation,
+    BulkUserIds, BulkMatchCreate, BulkParentStudentRelationCreate, UserImport,
+    Tenant, TenantCreate
 )
-from utils import verify_token, pwd_context
+from utils import verify_token, pwd_context, parse_datetime
+from jobs import enqueue_job
+from archive import get_practice_rollups
+from user_import import parse_csv, validate_rows, store_import_passwords
+from tenancy import find_tenant_for_school, tenants_for_students, group_by_tenant, use_tenant, invalidate_tenant_cache
+from request_context import TimedRoute
 
-router = APIRouter(prefix="/admin", tags=["admin"])
+router = APIRouter(prefix="/admin", tags=["admin"], route_class=TimedRoute)
+
+def _outcome_report(results: list) -> dict:
+    return {
+        "results": results,
+        "summary": dict(Counter(r['status'] for r in results))
+    }
+
+def _notification_dict(**kwargs) -> dict:
+    notif_dict = Notification(**kwargs).model_dump()
+    return notif_dict
 
 @router.get("/pending-users", response_model=List[UserResponse])
 async def get_pending_users(payload: dict = Depends(verify_token)):
@@ -22,7 +42,7 @@ async def get_pending_users(payload: dict = Depends(verify_token)):
         full_name=u['full_name'],
         role=u['role'],
         approval_status=u['approval_status'],
-        created_at=datetime.fromisoformat(u['created_at'])
+        created_at=parse_datetime(u['created_at'])
     ) for u in users]
 
 @router.put("/approve-user/{user_id}")
@@ -32,7 +52,7 @@ async def approve_user(user_id: str, payload: dict = Depends(verify_token)):
     
     result = await db.users.update_one(
         {"id": user_id},
-        {"$set": {"approval_status": ApprovalStatus.APPROVED.value, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"approval_status": ApprovalStatus.APPROVED.value, "updated_at": datetime.now(timezone.utc)}}
     )
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
@@ -45,11 +65,50 @@ async def approve_user(user_id: str, payload: dict = Depends(verify_token)):
         type="approval"
     )
     notif_dict = notification.model_dump()
-    notif_dict['created_at'] = notif_dict['created_at'].isoformat()
     await db.notifications.insert_one(notif_dict)
     
     return {"message": "User approved successfully"}
 
+@router.put("/approve-users")
+async def approve_users_bulk(data: BulkUserIds, payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    user_ids = list(dict.fromkeys(data.user_ids))
+    users = await db.users.find(
+        {"id": {"$in": user_ids}},
+        {"_id": 0, "id": 1, "full_name": 1, "approval_status": 1}
+    ).to_list(None)
+    users_by_id = {u['id']: u for u in users}
+    
+    results = []
+    to_approve = []
+    for user_id in user_ids:
+        user = users_by_id.get(user_id)
+        if not user:
+            results.append({"user_id": user_id, "status": "not_found"})
+        elif user['approval_status'] == ApprovalStatus.APPROVED.value:
+            results.append({"user_id": user_id, "status": "already_approved"})
+        else:
+            to_approve.append(user)
+            results.append({"user_id": user_id, "status": "approved"})
+    
+    if to_approve:
+        await db.users.update_many(
+            {"id": {"$in": [u['id'] for u in to_approve]}},
+            {"$set": {"approval_status": ApprovalStatus.APPROVED.value, "updated_at": datetime.now(timezone.utc)}}
+        )
+        await db.notifications.insert_many([
+            _notification_dict(
+                user_id=u['id'],
+                title="Hesabınız Onaylandı",
+                message=f"Hoş geldiniz {u['full_name']}! Hesabınız onaylandı ve sisteme giriş yapabilirsiniz.",
+                type="approval"
+            ) for u in to_approve
+        ], ordered=False)
+    
+    return _outcome_report(results)
+
 @router.put("/reject-user/{user_id}")
 async def reject_user(user_id: str, payload: dict = Depends(verify_token)):
     if payload['role'] != UserRole.ADMIN.value:
@@ -57,7 +116,7 @@ async def reject_user(user_id: str, payload: dict = Depends(verify_token)):
     
     result = await db.users.update_one(
         {"id": user_id},
-        {"$set": {"approval_status": ApprovalStatus.REJECTED.value, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"approval_status": ApprovalStatus.REJECTED.value, "updated_at": datetime.now(timezone.utc)}}
     )
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
@@ -76,7 +135,7 @@ async def get_all_teachers(payload: dict = Depends(verify_token)):
         full_name=t['full_name'],
         role=t['role'],
         approval_status=t['approval_status'],
-        created_at=datetime.fromisoformat(t['created_at'])
+        created_at=parse_datetime(t['created_at'])
     ) for t in teachers]
 
 @router.get("/students", response_model=List[UserResponse])
@@ -91,7 +150,7 @@ async def get_all_students(payload: dict = Depends(verify_token)):
         full_name=s['full_name'],
         role=s['role'],
         approval_status=s['approval_status'],
-        created_at=datetime.fromisoformat(s['created_at'])
+        created_at=parse_datetime(s['created_at'])
     ) for s in students]
 
 @router.post("/match")
@@ -100,7 +159,6 @@ async def create_student_teacher_match(match_data: StudentTeacherMatch, payload:
         raise HTTPException(status_code=403, detail="Admin access required")
     
     match_dict = match_data.model_dump()
-    match_dict['created_at'] = match_dict['created_at'].isoformat()
     await db.matches.insert_one(match_dict)
     
     student = await db.users.find_one({"id": match_data.student_id}, {"_id": 0})
@@ -120,15 +178,73 @@ async def create_student_teacher_match(match_data: StudentTeacherMatch, payload:
     )
     
     student_notif_dict = student_notif.model_dump()
-    student_notif_dict['created_at'] = student_notif_dict['created_at'].isoformat()
     teacher_notif_dict = teacher_notif.model_dump()
-    teacher_notif_dict['created_at'] = teacher_notif_dict['created_at'].isoformat()
     
     await db.notifications.insert_one(student_notif_dict)
     await db.notifications.insert_one(teacher_notif_dict)
     
     return {"message": "Match created successfully"}
 
+@router.post("/matches/bulk")
+async def create_student_teacher_matches_bulk(data: BulkMatchCreate, payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    student_ids = {m.student_id for m in data.matches}
+    teacher_ids = {m.teacher_id for m in data.matches}
+    users = await db.users.find(
+        {"id": {"$in": list(student_ids | teacher_ids)}},
+        {"_id": 0, "id": 1, "full_name": 1, "role": 1}
+    ).to_list(None)
+    users_by_id = {u['id']: u for u in users}
+    
+    existing = await db.matches.find(
+        {"student_id": {"$in": list(student_ids)}, "teacher_id": {"$in": list(teacher_ids)}},
+        {"_id": 0, "student_id": 1, "teacher_id": 1}
+    ).to_list(None)
+    seen = {(m['student_id'], m['teacher_id']) for m in existing}
+    
+    results = []
+    match_dicts = []
+    notif_dicts = []
+    for pair in data.matches:
+        student = users_by_id.get(pair.student_id)
+        teacher = users_by_id.get(pair.teacher_id)
+        item = {"student_id": pair.student_id, "teacher_id": pair.teacher_id}
+        if not student or student['role'] != UserRole.STUDENT.value:
+            results.append({**item, "status": "student_not_found"})
+            continue
+        if not teacher or teacher['role'] != UserRole.TEACHER.value:
+            results.append({**item, "status": "teacher_not_found"})
+            continue
+        if (pair.student_id, pair.teacher_id) in seen:
+            results.append({**item, "status": "already_exists"})
+            continue
+        seen.add((pair.student_id, pair.teacher_id))
+        
+        match = StudentTeacherMatch(student_id=pair.student_id, teacher_id=pair.teacher_id)
+        match_dict = match.model_dump()
+        match_dicts.append(match_dict)
+        notif_dicts.append(_notification_dict(
+            user_id=pair.student_id,
+            title="Yeni Öğretmen Ataması",
+            message=f"{teacher['full_name']} size öğretmen olarak atandı.",
+            type="assignment"
+        ))
+        notif_dicts.append(_notification_dict(
+            user_id=pair.teacher_id,
+            title="Yeni Öğrenci Ataması",
+            message=f"{student['full_name']} size öğrenci olarak atandı.",
+            type="assignment"
+        ))
+        results.append({**item, "status": "created", "match_id": match.id})
+    
+    if match_dicts:
+        await db.matches.insert_many(match_dicts, ordered=False)
+        await db.notifications.insert_many(notif_dicts, ordered=False)
+    
+    return _outcome_report(results)
+
 @router.get("/matches")
 async def get_all_matches(payload: dict = Depends(verify_token)):
     if payload['role'] != UserRole.ADMIN.value:
@@ -143,19 +259,28 @@ async def get_admin_reports(payload: dict = Depends(verify_token)):
         raise HTTPException(status_code=403, detail="Admin access required")
     
     matches = await db.matches.find({}, {"_id": 0}).to_list(1000)
+    # Practice data lives in each student's tenant; archived entry counts come from one
+    # rollup query per tenant
+    tenants = await tenants_for_students(m['student_id'] for m in matches)
+    archived_entries = Counter()
+    for tenant, student_ids in group_by_tenant(tenants):
+        with use_tenant(tenant):
+            for rollup in await get_practice_rollups({"student_id": {"$in": student_ids}}):
+                archived_entries[(rollup['student_id'], rollup['teacher_id'])] += rollup['count']
     reports = []
     
     for match in matches:
         student = await db.users.find_one({"id": match['student_id']}, {"_id": 0})
         teacher = await db.users.find_one({"id": match['teacher_id']}, {"_id": 0})
         
-        question_entries = await db.question_entries.find({"student_id": match['student_id'], "teacher_id": match['teacher_id']}, {"_id": 0}).to_list(1000)
-        assignments = await db.assignments.find({"student_id": match['student_id'], "teacher_id": match['teacher_id']}, {"_id": 0}).to_list(1000)
+        with use_tenant(tenants[match['student_id']]):
+            question_entries = await db.question_entries.find({"student_id": match['student_id'], "teacher_id": match['teacher_id']}, {"_id": 0}).to_list(1000)
+            assignments = await db.assignments.find({"student_id": match['student_id'], "teacher_id": match['teacher_id']}, {"_id": 0}).to_list(1000)
         
         reports.append({
             "student": student,
             "teacher": teacher,
-            "total_question_entries": len(question_entries),
+            "total_question_entries": len(question_entries) + archived_entries[(match['student_id'], match['teacher_id'])],
             "total_assignments": len(assignments),
             "completed_assignments": len([a for a in assignments if a['status'] == 'completed'])
         })
@@ -193,27 +318,76 @@ async def create_user(
     )
     
     user_dict = user.model_dump()
-    user_dict['created_at'] = user_dict['created_at'].isoformat()
-    user_dict['updated_at'] = user_dict['updated_at'].isoformat()
     
-    await db.users.insert_one(user_dict)
+    try:
+        await db.users.insert_one(user_dict)
+    except DuplicateKeyError:
+        # Registered concurrently, after the check above
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     # If parent is being created and student_id provided, create relation
     if user_data.role == UserRole.PARENT and student_id:
         relation = ParentStudentRelation(parent_id=user.id, student_id=student_id)
         relation_dict = relation.model_dump()
-        relation_dict['created_at'] = relation_dict['created_at'].isoformat()
         await db.parent_student_relations.insert_one(relation_dict)
     
     # If student is being created and parent_id provided, create relation
     if user_data.role == UserRole.STUDENT and parent_id:
         relation = ParentStudentRelation(parent_id=parent_id, student_id=user.id)
         relation_dict = relation.model_dump()
-        relation_dict['created_at'] = relation_dict['created_at'].isoformat()
         await db.parent_student_relations.insert_one(relation_dict)
     
     return UserResponse(**user_dict)
 
+async def _start_user_import(raw_rows: list, payload: dict) -> dict:
+    rows, errors = validate_rows(raw_rows)
+    if not rows:
+        raise HTTPException(status_code=400, detail={"message": "No valid rows to import", "errors": errors})
+    
+    passwords_id = await store_import_passwords(rows)
+    job = await enqueue_job(
+        "user_import",
+        params={
+            "rows": [r.model_dump(mode="json", exclude={"password"}) for r in rows],
+            "errors": errors,
+            "passwords_id": passwords_id
+        },
+        created_by=payload['user_id']
+    )
+    return {"job_id": job.id, "status": job.status, "accepted_rows": len(rows), "rejected_rows": len(errors)}
+
+@router.post("/users/import")
+async def import_users(data: UserImport, payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return await _start_user_import(data.users, payload)
+
+@router.post("/users/import/csv")
+async def import_users_csv(file: UploadFile = File(...), payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        raw_rows = parse_csv(await file.read())
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV file must be UTF-8 encoded")
+    return await _start_user_import(raw_rows, payload)
+
+async def _move_tenant_data(student_ids: list, from_tenant: dict, to_tenant: dict, payload: dict):
+    # Requests follow the new tenant right away; data already written follows in a job
+    if not student_ids or (from_tenant or {}).get('id') == (to_tenant or {}).get('id'):
+        return None
+    return await enqueue_job(
+        "move_tenant_data",
+        params={
+            "student_ids": student_ids,
+            "from_tenant_id": from_tenant['id'] if from_tenant else None,
+            "to_tenant_id": to_tenant['id'] if to_tenant else None
+        },
+        created_by=payload['user_id']
+    )
+
 @router.put("/users/{user_id}", response_model=UserResponse)
 async def update_user(user_id: str, user_data: UserUpdate, payload: dict = Depends(verify_token)):
     if payload['role'] != UserRole.ADMIN.value:
@@ -223,17 +397,30 @@ async def update_user(user_id: str, user_data: UserUpdate, payload: dict = Depen
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
     
-    update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
+    update_data['updated_at'] = datetime.now(timezone.utc)
+    previous = None
+    if 'school' in update_data:
+        previous = await db.users.find_one({"id": user_id}, {"_id": 0, "role": 1, "school": 1})
     
     result = await db.users.update_one(
         {"id": user_id},
         {"$set": update_data}
     )
+    if 'school' in update_data:
+        invalidate_tenant_cache(user_id)
     if result.modified_count == 0:
         user = await db.users.find_one({"id": user_id}, {"_id": 0})
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
     
+    if previous and previous['role'] == UserRole.STUDENT.value:
+        await _move_tenant_data(
+            [user_id],
+            await find_tenant_for_school(previous.get('school')),
+            await find_tenant_for_school(update_data['school']),
+            payload
+        )
+    
     updated_user = await db.users.find_one({"id": user_id}, {"_id": 0})
     return UserResponse(
         id=updated_user['id'],
@@ -247,7 +434,7 @@ async def update_user(user_id: str, user_data: UserUpdate, payload: dict = Depen
         phone=updated_user.get('phone'),
         address=updated_user.get('address'),
         goal=updated_user.get('goal'),
-        created_at=datetime.fromisoformat(updated_user['created_at'])
+        created_at=parse_datetime(updated_user['created_at'])
     )
 
 @router.delete("/users/{user_id}")
@@ -255,14 +442,25 @@ async def delete_user(user_id: str, payload: dict = Depends(verify_token)):
     if payload['role'] != UserRole.ADMIN.value:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    result = await db.users.delete_one({"id": user_id})
-    if result.deleted_count == 0:
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "school": 1})
+    if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    tenant = await find_tenant_for_school(user.get('school'))
     
+    await db.users.delete_one({"id": user_id})
+    invalidate_tenant_cache(user_id)
     await db.matches.delete_many({"$or": [{"student_id": user_id}, {"teacher_id": user_id}]})
     await db.parent_student_relations.delete_many({"$or": [{"parent_id": user_id}, {"student_id": user_id}]})
     
-    return {"message": "User deleted successfully"}
+    # Remaining user data is removed in batches by a background job
+    job = await enqueue_job(
+        "cascade_delete_user",
+        params={"user_id": user_id},
+        created_by=payload['user_id'],
+        tenant_id=tenant['id'] if tenant else None
+    )
+    
+    return {"message": "User deleted successfully", "cleanup_job_id": job.id}
 
 @router.get("/parents", response_model=List[UserResponse])
 async def get_all_parents(payload: dict = Depends(verify_token)):
@@ -281,7 +479,7 @@ async def get_all_parents(payload: dict = Depends(verify_token)):
         birth_date=p.get('birth_date'),
         phone=p.get('phone'),
         address=p.get('address'),
-        created_at=datetime.fromisoformat(p['created_at'])
+        created_at=parse_datetime(p['created_at'])
     ) for p in parents]
 
 # Parent-Student Relation Endpoints
@@ -306,7 +504,6 @@ async def create_parent_student_relation(relation_data: ParentStudentRelation, p
         raise HTTPException(status_code=400, detail="Relation already exists")
     
     relation_dict = relation_data.model_dump()
-    relation_dict['created_at'] = relation_dict['created_at'].isoformat()
     await db.parent_student_relations.insert_one(relation_dict)
     
     parent_notif = Notification(
@@ -323,15 +520,77 @@ async def create_parent_student_relation(relation_data: ParentStudentRelation, p
     )
     
     parent_notif_dict = parent_notif.model_dump()
-    parent_notif_dict['created_at'] = parent_notif_dict['created_at'].isoformat()
     student_notif_dict = student_notif.model_dump()
-    student_notif_dict['created_at'] = student_notif_dict['created_at'].isoformat()
     
     await db.notifications.insert_one(parent_notif_dict)
     await db.notifications.insert_one(student_notif_dict)
     
     return {"message": "Relation created successfully"}
 
+@router.post("/parent-student-relations/bulk")
+async def create_parent_student_relations_bulk(data: BulkParentStudentRelationCreate, payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    parent_ids = {r.parent_id for r in data.relations}
+    student_ids = {r.student_id for r in data.relations}
+    users = await db.users.find(
+        {"id": {"$in": list(parent_ids | student_ids)}},
+        {"_id": 0, "id": 1, "full_name": 1, "role": 1}
+    ).to_list(None)
+    users_by_id = {u['id']: u for u in users}
+    
+    existing = await db.parent_student_relations.find(
+        {"parent_id": {"$in": list(parent_ids)}, "student_id": {"$in": list(student_ids)}},
+        {"_id": 0, "parent_id": 1, "student_id": 1}
+    ).to_list(None)
+    seen = {(r['parent_id'], r['student_id']) for r in existing}
+    
+    results = []
+    relation_dicts = []
+    notif_dicts = []
+    for pair in data.relations:
+        parent = users_by_id.get(pair.parent_id)
+        student = users_by_id.get(pair.student_id)
+        item = {"parent_id": pair.parent_id, "student_id": pair.student_id}
+        if not parent or parent['role'] != UserRole.PARENT.value:
+            results.append({**item, "status": "parent_not_found"})
+            continue
+        if not student or student['role'] != UserRole.STUDENT.value:
+            results.append({**item, "status": "student_not_found"})
+            continue
+        if (pair.parent_id, pair.student_id) in seen:
+            results.append({**item, "status": "already_exists"})
+            continue
+        seen.add((pair.parent_id, pair.student_id))
+        
+        relation = ParentStudentRelation(
+            parent_id=pair.parent_id,
+            student_id=pair.student_id,
+            relation_type=pair.relation_type
+        )
+        relation_dict = relation.model_dump()
+        relation_dicts.append(relation_dict)
+        notif_dicts.append(_notification_dict(
+            user_id=pair.parent_id,
+            title="Öğrenci İlişkisi Eklendi",
+            message=f"{student['full_name']} ile veli-öğrenci ilişkisi kuruldu.",
+            type="relation"
+        ))
+        notif_dicts.append(_notification_dict(
+            user_id=pair.student_id,
+            title="Veli İlişkisi Eklendi",
+            message=f"{parent['full_name']} veliniz olarak eklendi.",
+            type="relation"
+        ))
+        results.append({**item, "status": "created", "relation_id": relation.id})
+    
+    if relation_dicts:
+        await db.parent_student_relations.insert_many(relation_dicts, ordered=False)
+        await db.notifications.insert_many(notif_dicts, ordered=False)
+    
+    return _outcome_report(results)
+
 @router.get("/parent-student-relations")
 async def get_all_parent_student_relations(payload: dict = Depends(verify_token)):
     if payload['role'] != UserRole.ADMIN.value:
@@ -351,3 +610,70 @@ async def delete_parent_student_relation(relation_id: str, payload: dict = Depen
     
     return {"message": "Relation deleted successfully"}
 
+# Background Jobs
+@router.get("/jobs")
+async def get_jobs(status: str = None, job_type: str = None, payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    query = {}
+    if status:
+        query["status"] = status
+    if job_type:
+        query["type"] = job_type
+    jobs = await db.jobs.find(query, {"_id": 0, "params": 0}).sort("created_at", -1).to_list(100)
+    return jobs
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    job = await db.jobs.find_one({"id": job_id}, {"_id": 0, "params": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/archive/run")
+async def run_archive(horizon_days: int = None, payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    params = {"horizon_days": horizon_days} if horizon_days is not None else {}
+    job = await enqueue_job("archive_practice_data", params=params, created_by=payload['user_id'])
+    return {"message": "Archive started", "job_id": job.id}
+
+# Tenants
+@router.get("/tenants")
+async def get_tenants(payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    tenants = await db.tenants.find({}, {"_id": 0}).to_list(1000)
+    return tenants
+
+@router.post("/tenants")
+async def create_tenant(tenant_data: TenantCreate, payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    existing = await db.tenants.find_one({"school": tenant_data.school}, {"_id": 0})
+    if existing:
+        raise HTTPException(status_code=400, detail="School already has a tenant")
+    
+    tenant = Tenant(school=tenant_data.school, db_name=tenant_data.db_name, mongo_url=tenant_data.mongo_url)
+    tenant_dict = tenant.model_dump()
+    await db.tenants.insert_one(tenant_dict)
+    await ensure_indexes(tenant_raw_database(tenant_dict), TENANT_COLLECTIONS)
+    # Students of this school were cached as having no tenant
+    invalidate_tenant_cache()
+    
+    # Their data so far is in the directory database
+    job = None
+    if TENANT_ROUTING:
+        students = await db.users.find(
+            {"school": tenant.school, "role": UserRole.STUDENT.value}, {"_id": 0, "id": 1}
+        ).to_list(None)
+        job = await _move_tenant_data([s['id'] for s in students], None, tenant_dict, payload)
+    
+    return {"message": "Tenant created successfully", "id": tenant.id, "move_job_id": job.id if job else None}
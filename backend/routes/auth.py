@@ -1,10 +1,11 @@
 from fastapi import APIRouter, HTTPException, Depends
-from datetime import datetime
+from pymongo.errors import DuplicateKeyError
 from database import db
 from models import UserRegister, UserLogin, UserResponse, User, ApprovalStatus, UserRole
-from utils import pwd_context, create_access_token, verify_token
+from utils import pwd_context, create_access_token, verify_token, parse_datetime
+from request_context import TimedRoute
 
-router = APIRouter(prefix="/auth", tags=["auth"])
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=TimedRoute)
 
 @router.post("/register", response_model=UserResponse)
 async def register(user_data: UserRegister):
@@ -26,10 +27,12 @@ async def register(user_data: UserRegister):
     )
     
     user_dict = user.model_dump()
-    user_dict['created_at'] = user_dict['created_at'].isoformat()
-    user_dict['updated_at'] = user_dict['updated_at'].isoformat()
     
-    await db.users.insert_one(user_dict)
+    try:
+        await db.users.insert_one(user_dict)
+    except DuplicateKeyError:
+        # Registered concurrently, after the check above
+        raise HTTPException(status_code=400, detail="Email already registered")
     return UserResponse(**user_dict)
 
 @router.post("/login")
@@ -53,7 +56,7 @@ async def login(credentials: UserLogin):
             full_name=user['full_name'],
             role=user['role'],
             approval_status=user['approval_status'],
-            created_at=datetime.fromisoformat(user['created_at'])
+            created_at=parse_datetime(user['created_at'])
         )
     }
 
@@ -68,5 +71,5 @@ async def get_current_user(payload: dict = Depends(verify_token)):
         full_name=user['full_name'],
         role=user['role'],
         approval_status=user['approval_status'],
-        created_at=datetime.fromisoformat(user['created_at'])
+        created_at=parse_datetime(user['created_at'])
     )
@@ -0,0 +1,129 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import PlainTextResponse
+from models import UserRole
+from utils import verify_token
+from db_monitoring import pool_snapshot, command_monitor
+from profiler import get_profile, list_profiles
+from loop_monitor import loop_monitor
+import memory_diagnostics
+from request_context import TimedRoute
+
+router = APIRouter(prefix="/admin/diagnostics", tags=["diagnostics"], route_class=TimedRoute)
+
+QUERY_SORT_FIELDS = {"total_ms", "count", "avg_ms", "max_ms", "documents", "avg_documents"}
+
+@router.get("/pool")
+async def get_pool_stats(payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return pool_snapshot()
+
+@router.get("/queries")
+async def get_query_stats(limit: int = 20, sort_by: str = "total_ms", payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if sort_by not in QUERY_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of: {', '.join(sorted(QUERY_SORT_FIELDS))}")
+    
+    return {
+        "slow_query_ms": command_monitor.slow_ms,
+        "shapes": command_monitor.top_shapes(limit, sort_by),
+        "slow_queries": list(reversed(command_monitor.slow_log)),
+    }
+
+@router.delete("/queries")
+async def reset_query_stats(payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    command_monitor.reset()
+    return {"message": "Query statistics reset"}
+
+@router.get("/event-loop")
+async def get_event_loop_stats(payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return loop_monitor.snapshot()
+
+@router.get("/profiles")
+async def get_profiles(payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return list_profiles()
+
+@router.get("/profiles/{profile_id}")
+async def get_profile_report(profile_id: str, format: str = "json", payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    profile = get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    # Folded stacks, for flamegraph.pl or speedscope
+    if format == "folded":
+        return PlainTextResponse(profile["folded"])
+    return profile
+
+# Memory (tracemalloc)
+@router.get("/memory")
+async def get_memory_status(payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return memory_diagnostics.status()
+
+@router.post("/memory/start")
+async def start_memory_tracing(frames: int = None, payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    memory_diagnostics.start_tracing(frames)
+    return memory_diagnostics.status()
+
+@router.post("/memory/stop")
+async def stop_memory_tracing(payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    memory_diagnostics.stop_tracing()
+    return {"message": "Memory tracing stopped"}
+
+@router.post("/memory/snapshots")
+async def take_memory_snapshot(request: Request, limit: int = 20, payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if not memory_diagnostics.is_tracing():
+        raise HTTPException(status_code=400, detail="Memory tracing is not running")
+    # Grouping walks every traced allocation; keep it off the event loop
+    try:
+        return await asyncio.to_thread(memory_diagnostics.take_snapshot, request.app.routes, limit)
+    except RuntimeError:
+        # Tracing was stopped by another request after the check above
+        raise HTTPException(status_code=400, detail="Memory tracing is not running")
+
+@router.get("/memory/snapshots/{snapshot_id}")
+async def get_memory_snapshot(snapshot_id: str, limit: int = 20, payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    snapshot = memory_diagnostics.get_snapshot(snapshot_id)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return memory_diagnostics.snapshot_report(snapshot, limit)
+
+@router.get("/memory/diff")
+async def diff_memory_snapshots(from_id: str, to_id: str = None, limit: int = 20, payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    old = memory_diagnostics.get_snapshot(from_id)
+    new = memory_diagnostics.get_snapshot(to_id) if to_id else (memory_diagnostics.snapshots[-1] if memory_diagnostics.snapshots else None)
+    if not old or not new:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return memory_diagnostics.diff_snapshots(old, new, limit)
@@ -0,0 +1,22 @@
+import secrets
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from config import METRICS_TOKEN
+from http_metrics import sample_event_loop
+from metrics import render
+from request_context import TimedRoute
+
+# Served outside /api for Prometheus scrapers
+router = APIRouter(tags=["metrics"], route_class=TimedRoute)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(request: Request):
+    # Route names, error rates and pool stats stay private until a token is configured
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token, METRICS_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    
+    await sample_event_loop()
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
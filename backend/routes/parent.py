@@ -1,11 +1,11 @@
 from fastapi import APIRouter, HTTPException, Depends
 from typing import List
-from datetime import datetime
 from database import db
 from models import UserResponse, UserRole
-from utils import verify_token
+from utils import verify_token, parse_datetime
+from request_context import TimedRoute
 
-router = APIRouter(prefix="/parent", tags=["parent"])
+router = APIRouter(prefix="/parent", tags=["parent"], route_class=TimedRoute)
 
 @router.get("/my-children", response_model=List[UserResponse])
 async def get_my_children(payload: dict = Depends(verify_token)):
@@ -30,7 +30,7 @@ async def get_my_children(payload: dict = Depends(verify_token)):
         birth_date=s.get('birth_date'),
         phone=s.get('phone'),
         address=s.get('address'),
-        created_at=datetime.fromisoformat(s['created_at'])
+        created_at=parse_datetime(s['created_at'])
     ) for s in students]
 
 @router.get("/child-resources/{student_id}")
@@ -3,8 +3,10 @@ from datetime import datetime
 from database import db
 from models import SubjectCreate, Subject, TopicCreate, Topic, UserRole
 from utils import verify_token
+from archive import get_practice_rollups, get_exam_rollups, merge_subject_stats
+from request_context import TimedRoute
 
-router = APIRouter(tags=["shared"])
+router = APIRouter(tags=["shared"], route_class=TimedRoute)
 
 # Subjects
 @router.post("/admin/subjects")
@@ -14,7 +16,6 @@ async def create_subject(subject_data: SubjectCreate, payload: dict = Depends(ve
     
     subject = Subject(name=subject_data.name, exam_type=subject_data.exam_type)
     subject_dict = subject.model_dump()
-    subject_dict['created_at'] = subject_dict['created_at'].isoformat()
     await db.subjects.insert_one(subject_dict)
     return subject
 
@@ -36,7 +37,6 @@ async def create_topic(topic_data: TopicCreate, payload: dict = Depends(verify_t
     
     topic = Topic(subject_id=topic_data.subject_id, name=topic_data.name)
     topic_dict = topic.model_dump()
-    topic_dict['created_at'] = topic_dict['created_at'].isoformat()
     await db.topics.insert_one(topic_dict)
     return topic
 
@@ -55,21 +55,16 @@ async def get_all_topics_by_subject(subject_id: str, payload: dict = Depends(ver
 async def get_statistics_overview(student_id: str, payload: dict = Depends(verify_token)):
     entries = await db.question_entries.find({"student_id": student_id}, {"_id": 0}).to_list(1000)
     analyses = await db.exam_analyses.find({"student_id": student_id}, {"_id": 0}).to_list(1000)
+    # Older months live in the archive; their rollups keep the totals complete
+    rollups = await get_practice_rollups({"student_id": student_id})
+    exam_rollups = await get_exam_rollups({"student_id": student_id})
     
-    total_questions = sum([e['total_questions'] for e in entries])
-    total_correct = sum([e['correct_answers'] for e in entries])
-    total_wrong = sum([e['wrong_answers'] for e in entries])
-    total_net = sum([e['net_score'] for e in entries])
+    total_questions = sum([e['total_questions'] for e in entries + rollups])
+    total_correct = sum([e['correct_answers'] for e in entries + rollups])
+    total_wrong = sum([e['wrong_answers'] for e in entries + rollups])
+    total_net = sum([e['net_score'] for e in entries + rollups])
     
-    subject_stats = {}
-    for entry in entries:
-        subject = entry['subject']
-        if subject not in subject_stats:
-            subject_stats[subject] = {'correct': 0, 'wrong': 0, 'net': 0, 'count': 0}
-        subject_stats[subject]['correct'] += entry['correct_answers']
-        subject_stats[subject]['wrong'] += entry['wrong_answers']
-        subject_stats[subject]['net'] += entry['net_score']
-        subject_stats[subject]['count'] += 1
+    subject_stats = merge_subject_stats(entries, rollups)
     
     return {
         "total_questions": total_questions,
@@ -78,7 +73,7 @@ async def get_statistics_overview(student_id: str, payload: dict = Depends(verif
         "total_net": total_net,
         "subject_stats": subject_stats,
         "recent_entries": entries[-10:] if entries else [],
-        "exam_analyses_count": len(analyses)
+        "exam_analyses_count": len(analyses) + sum(r['count'] for r in exam_rollups)
     }
 
 # Notifications
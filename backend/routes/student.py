@@ -1,10 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends
-from datetime import datetime
 from database import db
 from models import UserResponse, UserRole
-from utils import verify_token
+from utils import verify_token, parse_datetime
+from request_context import TimedRoute
 
-router = APIRouter(prefix="/student", tags=["student"])
+router = APIRouter(prefix="/student", tags=["student"], route_class=TimedRoute)
 
 @router.get("/my-teacher")
 async def get_student_teacher(payload: dict = Depends(verify_token)):
@@ -22,7 +22,7 @@ async def get_student_teacher(payload: dict = Depends(verify_token)):
         full_name=teacher['full_name'],
         role=teacher['role'],
         approval_status=teacher['approval_status'],
-        created_at=datetime.fromisoformat(teacher['created_at'])
+        created_at=parse_datetime(teacher['created_at'])
     )
 
 @router.get("/my-question-entries")
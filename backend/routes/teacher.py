@@ -1,17 +1,20 @@
 from fastapi import APIRouter, HTTPException, Depends
 from typing import List
-from datetime import datetime, timedelta
+from datetime import timedelta
 from database import db
 from models import (
     UserResponse, UserRole, QuestionEntryCreate, QuestionEntry,
     ExamAnalysisCreate, ExamAnalysis, ResourceTrackingCreate, ResourceTracking,
-    AssignmentCreate, Assignment, StudyScheduleCreate, StudySchedule,
+    AssignmentCreate, Assignment, BulkAssignmentCreate, StudyScheduleCreate, StudySchedule,
     WeeklyScheduleCreate, WeeklySchedule, ResourceWithTopicsCreate, ResourceWithTopics,
     Notification
 )
-from utils import verify_token, calculate_net
+from utils import verify_token, calculate_net, parse_datetime
+from archive import get_practice_rollups, get_exam_rollups, merge_subject_stats
+from request_context import TimedRoute
+from tenancy import use_tenant, student_tenant, tenants_for_students, teacher_tenants, group_by_tenant
 
-router = APIRouter(prefix="/teacher", tags=["teacher"])
+router = APIRouter(prefix="/teacher", tags=["teacher"], route_class=TimedRoute)
 
 @router.get("/students", response_model=List[UserResponse])
 async def get_teacher_students(payload: dict = Depends(verify_token)):
@@ -28,7 +31,7 @@ async def get_teacher_students(payload: dict = Depends(verify_token)):
         full_name=s['full_name'],
         role=s['role'],
         approval_status=s['approval_status'],
-        created_at=datetime.fromisoformat(s['created_at'])
+        created_at=parse_datetime(s['created_at'])
     ) for s in students]
 
 @router.post("/question-entry")
@@ -52,8 +55,8 @@ async def create_question_entry(entry_data: QuestionEntryCreate, payload: dict =
     )
     
     entry_dict = entry.model_dump()
-    entry_dict['date'] = entry_dict['date'].isoformat()
-    await db.question_entries.insert_one(entry_dict)
+    async with student_tenant(entry_data.student_id):
+        await db.question_entries.insert_one(entry_dict)
     
     return {"message": "Question entry created successfully", "net_score": net_score}
 
@@ -84,9 +87,8 @@ async def create_exam_analysis(analysis_data: ExamAnalysisCreate, payload: dict
     )
     
     analysis_dict = analysis.model_dump()
-    analysis_dict['exam_date'] = analysis_dict['exam_date'].isoformat()
-    analysis_dict['created_at'] = analysis_dict['created_at'].isoformat()
-    await db.exam_analyses.insert_one(analysis_dict)
+    async with student_tenant(analysis_data.student_id):
+        await db.exam_analyses.insert_one(analysis_dict)
     
     return {"message": "Exam analysis created successfully", "total_net": total_net}
 
@@ -98,21 +100,14 @@ async def get_student_exam_analyses(student_id: str, payload: dict = Depends(ver
     analyses = await db.exam_analyses.find({"student_id": student_id, "teacher_id": payload['user_id']}, {"_id": 0}).to_list(1000)
     return analyses
 
-@router.get("/exam-analysis-summary/{student_id}")
-async def get_exam_analysis_summary(student_id: str, payload: dict = Depends(verify_token)):
-    if payload['role'] != UserRole.TEACHER.value:
-        raise HTTPException(status_code=403, detail="Teacher access required")
-    
-    analyses = await db.exam_analyses.find({"student_id": student_id, "teacher_id": payload['user_id']}, {"_id": 0}).to_list(1000)
-    
-    if not analyses:
-        return {"analyses": [], "summary": {}}
-    
+def summarize_exam_analyses(analyses: list, rollups: list = ()) -> dict:
+    # Archived months only survive as rollups, so best and worst exam come from recent analyses
+    total_exams = len(analyses) + sum(r['count'] for r in rollups)
     summary = {
-        "total_exams": len(analyses),
-        "average_net": sum([a['total_net'] for a in analyses]) / len(analyses),
-        "best_exam": max(analyses, key=lambda x: x['total_net']),
-        "worst_exam": min(analyses, key=lambda x: x['total_net']),
+        "total_exams": total_exams,
+        "average_net": (sum([a['total_net'] for a in analyses]) + sum([r['total_net'] for r in rollups])) / total_exams,
+        "best_exam": max(analyses, key=lambda x: x['total_net'], default=None),
+        "worst_exam": min(analyses, key=lambda x: x['total_net'], default=None),
         "subject_performance": {}
     }
     
@@ -131,9 +126,34 @@ async def get_exam_analysis_summary(student_id: str, payload: dict = Depends(ver
             summary['subject_performance'][subject_name]['total_correct'] += subject.get('correct', 0)
             summary['subject_performance'][subject_name]['total_wrong'] += subject.get('wrong', 0)
     
+    for rollup in rollups:
+        for subject in rollup.get('subjects', []):
+            perf = summary['subject_performance'].setdefault(subject['name'], {
+                'total_net': 0,
+                'count': 0,
+                'total_correct': 0,
+                'total_wrong': 0
+            })
+            for key in ('total_net', 'count', 'total_correct', 'total_wrong'):
+                perf[key] += subject[key]
+    
     for subject_name in summary['subject_performance']:
         perf = summary['subject_performance'][subject_name]
         perf['average_net'] = perf['total_net'] / perf['count'] if perf['count'] > 0 else 0
+    return summary
+
+@router.get("/exam-analysis-summary/{student_id}")
+async def get_exam_analysis_summary(student_id: str, payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.TEACHER.value:
+        raise HTTPException(status_code=403, detail="Teacher access required")
+    
+    analyses = await db.exam_analyses.find({"student_id": student_id, "teacher_id": payload['user_id']}, {"_id": 0}).to_list(1000)
+    rollups = await get_exam_rollups({"student_id": student_id, "teacher_id": payload['user_id']})
+    
+    if not analyses and not rollups:
+        return {"analyses": [], "summary": {}}
+    
+    summary = summarize_exam_analyses(analyses, rollups)
     
     return {"analyses": analyses, "summary": summary}
 
@@ -153,10 +173,8 @@ async def create_resource_tracking(resource_data: ResourceTrackingCreate, payloa
     )
     
     resource_dict = resource.model_dump()
-    resource_dict['created_at'] = resource_dict['created_at'].isoformat()
-    if resource_dict['completed_date']:
-        resource_dict['completed_date'] = resource_dict['completed_date'].isoformat()
-    await db.resource_tracking.insert_one(resource_dict)
+    async with student_tenant(resource_data.student_id):
+        await db.resource_tracking.insert_one(resource_dict)
     
     return {"message": "Resource tracking created successfully"}
 
@@ -183,9 +201,8 @@ async def create_assignment(assignment_data: AssignmentCreate, payload: dict = D
     )
     
     assignment_dict = assignment.model_dump()
-    assignment_dict['due_date'] = assignment_dict['due_date'].isoformat()
-    assignment_dict['created_at'] = assignment_dict['created_at'].isoformat()
-    await db.assignments.insert_one(assignment_dict)
+    async with student_tenant(assignment_data.student_id):
+        await db.assignments.insert_one(assignment_dict)
     
     notification = Notification(
         user_id=assignment_data.student_id,
@@ -194,11 +211,73 @@ async def create_assignment(assignment_data: AssignmentCreate, payload: dict = D
         type="assignment"
     )
     notif_dict = notification.model_dump()
-    notif_dict['created_at'] = notif_dict['created_at'].isoformat()
     await db.notifications.insert_one(notif_dict)
     
     return {"message": "Assignment created successfully"}
 
+@router.post("/assignments/bulk")
+async def create_bulk_assignments(assignment_data: BulkAssignmentCreate, payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.TEACHER.value:
+        raise HTTPException(status_code=403, detail="Teacher access required")
+    
+    match_query = {"teacher_id": payload['user_id']}
+    if not assignment_data.all_students:
+        if not assignment_data.student_ids:
+            raise HTTPException(status_code=400, detail="No students selected")
+        match_query["student_id"] = {"$in": assignment_data.student_ids}
+    
+    matches = await db.matches.find(match_query, {"_id": 0, "student_id": 1}).to_list(None)
+    matched_ids = {m['student_id'] for m in matches}
+    
+    if assignment_data.all_students:
+        requested_ids = [m['student_id'] for m in matches]
+    else:
+        requested_ids = assignment_data.student_ids
+    requested_ids = list(dict.fromkeys(requested_ids))
+    
+    student_ids = [sid for sid in requested_ids if sid in matched_ids]
+    skipped = [sid for sid in requested_ids if sid not in matched_ids]
+    if not student_ids:
+        raise HTTPException(status_code=400, detail="None of the selected students are assigned to you")
+    
+    assignment_dicts = []
+    notif_dicts = []
+    for student_id in student_ids:
+        assignment = Assignment(
+            student_id=student_id,
+            teacher_id=payload['user_id'],
+            title=assignment_data.title,
+            description=assignment_data.description,
+            subject=assignment_data.subject,
+            due_date=assignment_data.due_date
+        )
+        assignment_dict = assignment.model_dump()
+        assignment_dicts.append(assignment_dict)
+        
+        notification = Notification(
+            user_id=student_id,
+            title="Yeni Ödev",
+            message=f"Yeni ödeviniz var: {assignment_data.title}",
+            type="assignment"
+        )
+        notif_dict = notification.model_dump()
+        notif_dicts.append(notif_dict)
+    
+    # A teacher's students may belong to different schools, so each tenant gets its own insert
+    for tenant, tenant_student_ids in group_by_tenant(await tenants_for_students(student_ids)):
+        tenant_student_ids = set(tenant_student_ids)
+        with use_tenant(tenant):
+            await db.assignments.insert_many(
+                [a for a in assignment_dicts if a['student_id'] in tenant_student_ids], ordered=False
+            )
+    await db.notifications.insert_many(notif_dicts, ordered=False)
+    
+    return {
+        "message": f"{len(assignment_dicts)} assignments created successfully",
+        "assignments": [{"student_id": a['student_id'], "assignment_id": a['id']} for a in assignment_dicts],
+        "skipped_student_ids": skipped
+    }
+
 @router.get("/assignments/{student_id}")
 async def get_student_assignments(student_id: str, payload: dict = Depends(verify_token)):
     if payload['role'] != UserRole.TEACHER.value:
@@ -223,8 +302,8 @@ async def create_study_schedule(schedule_data: StudyScheduleCreate, payload: dic
     )
     
     schedule_dict = schedule.model_dump()
-    schedule_dict['created_at'] = schedule_dict['created_at'].isoformat()
-    await db.study_schedules.insert_one(schedule_dict)
+    async with student_tenant(schedule_data.student_id):
+        await db.study_schedules.insert_one(schedule_dict)
     
     return {"message": "Study schedule created successfully"}
 
@@ -250,10 +329,8 @@ async def create_weekly_schedule(schedule_data: WeeklyScheduleCreate, payload: d
     )
     
     schedule_dict = schedule.model_dump()
-    schedule_dict['week_start_date'] = schedule_dict['week_start_date'].isoformat()
-    schedule_dict['week_end_date'] = schedule_dict['week_end_date'].isoformat()
-    schedule_dict['created_at'] = schedule_dict['created_at'].isoformat()
-    await db.weekly_schedules.insert_one(schedule_dict)
+    async with student_tenant(schedule_data.student_id):
+        await db.weekly_schedules.insert_one(schedule_dict)
     
     return {"message": "Weekly schedule created successfully"}
 
@@ -268,23 +345,8 @@ async def get_student_weekly_schedules(student_id: str, payload: dict = Depends(
     ).sort("week_start_date", -1).to_list(1000)
     return schedules
 
-@router.get("/suggested-schedule/{student_id}")
-async def get_suggested_schedule(student_id: str, payload: dict = Depends(verify_token)):
-    if payload['role'] != UserRole.TEACHER.value:
-        raise HTTPException(status_code=403, detail="Teacher access required")
-    
-    entries = await db.question_entries.find({"student_id": student_id}, {"_id": 0}).to_list(1000)
-    
-    subject_performance = {}
-    for entry in entries:
-        subject = entry['subject']
-        if subject not in subject_performance:
-            subject_performance[subject] = {'correct': 0, 'wrong': 0, 'net': 0, 'count': 0}
-        subject_performance[subject]['correct'] += entry['correct_answers']
-        subject_performance[subject]['wrong'] += entry['wrong_answers']
-        subject_performance[subject]['net'] += entry['net_score']
-        subject_performance[subject]['count'] += 1
-    
+def suggest_schedule(subject_performance: dict) -> list:
+    # Weakest subjects first, one per day for at most a week
     suggested_items = []
     day = 1
     for subject, perf in sorted(subject_performance.items(), key=lambda x: x[1]['net'] / x[1]['count'] if x[1]['count'] > 0 else 0):
@@ -311,6 +373,19 @@ async def get_suggested_schedule(student_id: str, payload: dict = Depends(verify
         day += 1
         if day > 7:
             break
+    return suggested_items
+
+@router.get("/suggested-schedule/{student_id}")
+async def get_suggested_schedule(student_id: str, payload: dict = Depends(verify_token)):
+    if payload['role'] != UserRole.TEACHER.value:
+        raise HTTPException(status_code=403, detail="Teacher access required")
+    
+    entries = await db.question_entries.find({"student_id": student_id}, {"_id": 0}).to_list(1000)
+    rollups = await get_practice_rollups({"student_id": student_id})
+    
+    subject_performance = merge_subject_stats(entries, rollups)
+    
+    suggested_items = suggest_schedule(subject_performance)
     
     return {
         "suggested_items": suggested_items,
@@ -331,8 +406,8 @@ async def create_resource_with_topics(resource_data: ResourceWithTopicsCreate, p
     )
     
     resource_dict = resource.model_dump()
-    resource_dict['created_at'] = resource_dict['created_at'].isoformat()
-    await db.resources_with_topics.insert_one(resource_dict)
+    async with student_tenant(resource_data.student_id):
+        await db.resources_with_topics.insert_one(resource_dict)
     
     return {"message": "Resource created successfully"}
 
@@ -352,7 +427,12 @@ async def update_resource_topic_status(resource_id: str, topic_name: str, status
     if payload['role'] != UserRole.TEACHER.value:
         raise HTTPException(status_code=403, detail="Teacher access required")
     
-    resource = await db.resources_with_topics.find_one({"id": resource_id}, {"_id": 0})
+    # The resource lives in its student's tenant, one of those of this teacher's students
+    for tenant in await teacher_tenants(payload['user_id']):
+        with use_tenant(tenant):
+            resource = await db.resources_with_topics.find_one({"id": resource_id}, {"_id": 0})
+            if resource:
+                break
     if not resource:
         raise HTTPException(status_code=404, detail="Resource not found")
     
@@ -361,9 +441,10 @@ async def update_resource_topic_status(resource_id: str, topic_name: str, status
             topic['status'] = status
             break
     
-    await db.resources_with_topics.update_one(
-        {"id": resource_id},
-        {"$set": {"topics": resource['topics']}}
-    )
+    with use_tenant(tenant):
+        await db.resources_with_topics.update_one(
+            {"id": resource_id},
+            {"$set": {"topics": resource['topics']}}
+        )
     
     return {"message": "Topic status updated"}
@@ -1,26 +1,62 @@
 from fastapi import FastAPI, APIRouter
 from starlette.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 import logging
-from config import CORS_ORIGINS
-from database import close_db_connection
-from routes import auth, admin, teacher, student, shared, parent
+from config import CORS_ORIGINS, TENANT_ROUTING, MONGO_WARMUP_CONNECTIONS, PROFILING_ENABLED, LOOP_MONITOR_ENABLED
+from database import client, close_db_connection, ensure_indexes
+from db_monitoring import warm_up_pool
+from tenancy import TenantMiddleware, ensure_tenant_indexes
+from request_context import RequestContextMiddleware
+from http_metrics import RequestMetricsMiddleware
+from profiler import ProfilingMiddleware
+from loop_monitor import loop_monitor
+from access_log import configure_logging
+from read_routing import RequestDatabaseOptionsMiddleware, router_dependencies, CAUSAL_TOKEN_HEADER
+from jobs import start_workers, stop_workers
+from user_import import shutdown_hash_pool
+from routes import auth, admin, teacher, student, shared, parent, diagnostics, metrics
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ensure_indexes()
+    if TENANT_ROUTING:
+        await ensure_tenant_indexes()
+    await warm_up_pool(client, MONGO_WARMUP_CONNECTIONS)
+    start_workers()
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    yield
+    if LOOP_MONITOR_ENABLED:
+        await loop_monitor.stop()
+    await stop_workers()
+    shutdown_hash_pool()
+    await close_db_connection()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Include all route modules
-api_router.include_router(auth.router)
-api_router.include_router(admin.router)
-api_router.include_router(teacher.router)
-api_router.include_router(student.router)
-api_router.include_router(parent.router)
-api_router.include_router(shared.router)
+# Include all route modules, with the read preference and session configured for each
+api_router.include_router(auth.router, dependencies=router_dependencies("auth"))
+api_router.include_router(admin.router, dependencies=router_dependencies("admin"))
+api_router.include_router(teacher.router, dependencies=router_dependencies("teacher"))
+api_router.include_router(student.router, dependencies=router_dependencies("student"))
+api_router.include_router(parent.router, dependencies=router_dependencies("parent"))
+api_router.include_router(shared.router, dependencies=router_dependencies("shared"))
+api_router.include_router(diagnostics.router, dependencies=router_dependencies("diagnostics"))
 
 # Include the router in the main app
 app.include_router(api_router)
+app.include_router(metrics.router)
+
+# Per-request read preference and causal session
+app.add_middleware(RequestDatabaseOptionsMiddleware)
+
+# Resolve the tenant database once per request
+if TENANT_ROUTING:
+    app.add_middleware(TenantMiddleware)
 
 # Add CORS middleware
 app.add_middleware(
@@ -29,15 +65,17 @@ app.add_middleware(
     allow_origins=CORS_ORIGINS,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[CAUSAL_TOKEN_HEADER],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+# Admin-requested per-request profiles
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    await close_db_connection()
+# Outermost, so everything the request does (including tenant lookup) is attributed to its route
+app.add_middleware(RequestMetricsMiddleware)
+app.add_middleware(RequestContextMiddleware)
+
+# Configure logging; records are written from a background thread
+configure_logging()
+logger = logging.getLogger(__name__)
@@ -0,0 +1,298 @@
+import copy
+import uuid
+from bson.binary import Binary
+from pymongo import InsertOne, ReplaceOne
+
+# Storage adapters wrap a Motor collection and translate filters, projections, sorts and
+# documents between the shape routes use and the shape stored in MongoDB, so optional
+# storage layouts can be switched on in config without touching route code.
+#
+# Primary-key mode (ID_AS_PRIMARY_KEY): the application `id` is stored as `_id` in binary
+# UUID form, so `find_one({"id": ...})` hits the primary key and the separate unique `id`
+# index is no longer needed.
+#
+# Time-series mode (QUESTION_ENTRIES_TIMESERIES): question entries live in a time-series
+# collection with `date` as the timeField and the per-series fields nested under `meta`.
+
+_OPERATORS_WITH_LISTS = ("$in", "$nin", "$all")
+
+def to_storage_id(value):
+    if isinstance(value, str):
+        try:
+            return Binary.from_uuid(uuid.UUID(value))
+        except ValueError:
+            return value
+    return value
+
+def from_storage_id(value):
+    if isinstance(value, Binary) and value.subtype == 4:
+        return str(value.as_uuid())
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value if value is None or isinstance(value, str) else str(value)
+
+def _translate_id_condition(condition):
+    if isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+        translated = {}
+        for op, value in condition.items():
+            if op in _OPERATORS_WITH_LISTS:
+                translated[op] = [to_storage_id(v) for v in value]
+            elif op == "$not":
+                translated[op] = _translate_id_condition(value)
+            else:
+                translated[op] = to_storage_id(value)
+        return translated
+    return to_storage_id(condition)
+
+def translate_filter(query):
+    if not query:
+        return query
+    translated = {}
+    for key, value in query.items():
+        if key in ("$or", "$and", "$nor"):
+            translated[key] = [translate_filter(q) for q in value]
+        elif key == "id":
+            translated["_id"] = _translate_id_condition(value)
+        else:
+            translated[key] = value
+    return translated
+
+def translate_projection(projection):
+    if not projection:
+        return projection
+    translated = {k: v for k, v in projection.items() if k not in ("_id", "id")}
+    # _id now carries the application id: an inclusion projection returns it only when
+    # the caller asked for `id`, an exclusion projection always keeps it
+    if projection.get("id") or any(translated.values()):
+        translated["_id"] = 1 if projection.get("id") else 0
+    return translated or None
+
+def translate_sort(sort):
+    if isinstance(sort, str):
+        return "_id" if sort == "id" else sort
+    if isinstance(sort, list):
+        return [("_id" if k == "id" else k, d) for k, d in sort]
+    return sort
+
+def to_storage_doc(doc: dict) -> dict:
+    if "id" not in doc:
+        return doc
+    stored = {k: v for k, v in doc.items() if k not in ("id", "_id")}
+    return {"_id": to_storage_id(doc["id"]), **stored}
+
+def from_storage_doc(doc):
+    if doc is None or "_id" not in doc:
+        return doc
+    result = {"id": from_storage_id(doc["_id"])}
+    result.update((k, v) for k, v in doc.items() if k != "_id")
+    return result
+
+class CollectionAdapter:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def translate_filter(self, query):
+        return query
+
+    def translate_projection(self, projection):
+        return projection
+
+    def translate_sort(self, sort):
+        return sort
+
+    def translate_key(self, key: str) -> str:
+        return key
+
+    def to_storage(self, doc: dict) -> dict:
+        return doc
+
+    def from_storage(self, doc):
+        return doc
+
+    def _translate_write(self, op):
+        op = copy.copy(op)
+        if hasattr(op, "_filter"):
+            op._filter = self.translate_filter(op._filter)
+        if isinstance(op, (InsertOne, ReplaceOne)):
+            op._doc = self.to_storage(op._doc)
+        return op
+
+    def with_options(self, **kwargs):
+        return type(self)(self._collection.with_options(**kwargs))
+
+    def find(self, filter=None, projection=None, *args, **kwargs):
+        if "sort" in kwargs:
+            kwargs["sort"] = self.translate_sort(kwargs["sort"])
+        cursor = self._collection.find(self.translate_filter(filter), self.translate_projection(projection), *args, **kwargs)
+        return AdaptedCursor(cursor, self)
+
+    async def find_one(self, filter=None, projection=None, *args, **kwargs):
+        if "sort" in kwargs:
+            kwargs["sort"] = self.translate_sort(kwargs["sort"])
+        return self.from_storage(await self._collection.find_one(
+            self.translate_filter(filter), self.translate_projection(projection), *args, **kwargs
+        ))
+
+    async def find_one_and_update(self, filter, update, projection=None, sort=None, **kwargs):
+        return self.from_storage(await self._collection.find_one_and_update(
+            self.translate_filter(filter), update,
+            projection=self.translate_projection(projection), sort=self.translate_sort(sort), **kwargs
+        ))
+
+    async def insert_one(self, document, **kwargs):
+        return await self._collection.insert_one(self.to_storage(document), **kwargs)
+
+    async def insert_many(self, documents, **kwargs):
+        return await self._collection.insert_many([self.to_storage(d) for d in documents], **kwargs)
+
+    async def update_one(self, filter, update, **kwargs):
+        return await self._collection.update_one(self.translate_filter(filter), update, **kwargs)
+
+    async def update_many(self, filter, update, **kwargs):
+        return await self._collection.update_many(self.translate_filter(filter), update, **kwargs)
+
+    async def delete_one(self, filter, **kwargs):
+        return await self._collection.delete_one(self.translate_filter(filter), **kwargs)
+
+    async def delete_many(self, filter, **kwargs):
+        return await self._collection.delete_many(self.translate_filter(filter), **kwargs)
+
+    async def count_documents(self, filter, **kwargs):
+        return await self._collection.count_documents(self.translate_filter(filter), **kwargs)
+
+    async def distinct(self, key, filter=None, **kwargs):
+        return await self._collection.distinct(self.translate_key(key), self.translate_filter(filter), **kwargs)
+
+    async def bulk_write(self, requests, **kwargs):
+        return await self._collection.bulk_write([self._translate_write(op) for op in requests], **kwargs)
+
+    def aggregate(self, pipeline, **kwargs):
+        # Only a leading $match is translated; later stages see the stored shape
+        if pipeline and "$match" in pipeline[0]:
+            pipeline = [{"$match": self.translate_filter(pipeline[0]["$match"])}, *pipeline[1:]]
+        return self._collection.aggregate(pipeline, **kwargs)
+
+class AdaptedCursor:
+    def __init__(self, cursor, adapter: CollectionAdapter):
+        self._cursor = cursor
+        self._adapter = adapter
+
+    def sort(self, key_or_list, direction=None):
+        key_or_list = self._adapter.translate_sort(key_or_list)
+        if direction is None:
+            self._cursor.sort(key_or_list)
+        else:
+            self._cursor.sort(key_or_list, direction)
+        return self
+
+    def limit(self, limit):
+        self._cursor.limit(limit)
+        return self
+
+    def skip(self, skip):
+        self._cursor.skip(skip)
+        return self
+
+    def batch_size(self, batch_size):
+        self._cursor.batch_size(batch_size)
+        return self
+
+    async def to_list(self, length):
+        return [self._adapter.from_storage(d) for d in await self._cursor.to_list(length)]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return self._adapter.from_storage(await self._cursor.next())
+
+class PrimaryKeyCollection(CollectionAdapter):
+    def translate_filter(self, query):
+        return translate_filter(query)
+
+    def translate_projection(self, projection):
+        return translate_projection(projection)
+
+    def translate_sort(self, sort):
+        return translate_sort(sort)
+
+    def translate_key(self, key: str) -> str:
+        return "_id" if key == "id" else key
+
+    def to_storage(self, doc: dict) -> dict:
+        return to_storage_doc(doc)
+
+    def from_storage(self, doc):
+        return from_storage_doc(doc)
+
+    async def distinct(self, key, filter=None, **kwargs):
+        values = await super().distinct(key, filter, **kwargs)
+        return [from_storage_id(v) for v in values] if key == "id" else values
+
+class TimeSeriesCollection(CollectionAdapter):
+    TIME_FIELD = "date"
+    META_FIELD = "meta"
+    META_KEYS = ("student_id", "teacher_id", "subject", "exam_type")
+    GRANULARITY = "hours"
+
+    def translate_key(self, key: str) -> str:
+        return f"{self.META_FIELD}.{key}" if key in self.META_KEYS else key
+
+    def translate_filter(self, query):
+        if not query:
+            return query
+        translated = {}
+        for key, value in query.items():
+            if key in ("$or", "$and", "$nor"):
+                translated[key] = [self.translate_filter(q) for q in value]
+            else:
+                translated[self.translate_key(key)] = value
+        return translated
+
+    def translate_projection(self, projection):
+        if not projection:
+            return projection
+        return {self.translate_key(k): v for k, v in projection.items()}
+
+    def translate_sort(self, sort):
+        if isinstance(sort, str):
+            return self.translate_key(sort)
+        if isinstance(sort, list):
+            return [(self.translate_key(k), d) for k, d in sort]
+        return sort
+
+    def to_storage(self, doc: dict) -> dict:
+        stored = {k: v for k, v in doc.items() if k not in self.META_KEYS}
+        stored[self.META_FIELD] = {k: doc[k] for k in self.META_KEYS if k in doc}
+        return stored
+
+    def from_storage(self, doc):
+        if doc is None or self.META_FIELD not in doc:
+            return doc
+        result = {k: v for k, v in doc.items() if k != self.META_FIELD}
+        result.update(doc[self.META_FIELD])
+        return result
+
+class AdaptedDatabase:
+    # `adapters` maps collection name -> (adapter class, physical collection name);
+    # every other collection gets `default_adapter`, or is returned unwrapped if None.
+    def __init__(self, database, default_adapter=None, adapters=None):
+        self._database = database
+        self._default_adapter = default_adapter
+        self._adapters = adapters or {}
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        if name in self._adapters:
+            adapter, physical_name = self._adapters[name]
+            return adapter(self._database[physical_name])
+        if self._default_adapter is not None:
+            return self._default_adapter(self._database[name])
+        return self._database[name]
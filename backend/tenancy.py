@@ -0,0 +1,160 @@
+import time
+from contextlib import contextmanager, asynccontextmanager
+from config import TENANT_ROUTING, TENANT_CACHE_TTL_SECONDS
+from database import db, current_tenant, ensure_indexes, tenant_raw_database, TENANT_COLLECTIONS
+from models import UserRole
+from request_context import current_request
+from utils import token_payload
+from metrics import CACHE_ENTRIES, CACHE_REQUESTS, collector
+
+# Tenants are keyed on the institution (User.school), and practice data lives in the
+# database of the student's school (see migrations/split_tenants.py). TenantMiddleware
+# resolves the tenant per request from the student being accessed: the {student_id} path
+# parameter, or the caller when they are a student. Handlers that take student ids in the
+# body switch with student_tenant(); jobs carry the tenant id in the job document.
+# Tenants and the student -> tenant mapping are cached per process for
+# TENANT_CACHE_TTL_SECONDS; changes made through this process invalidate it right away.
+_tenants = {}
+_student_tenants = {}
+_cache_expires_at = 0.0
+
+@contextmanager
+def use_tenant(tenant: dict):
+    token = current_tenant.set(tenant)
+    context = current_request.get()
+    if context is not None and tenant is not None:
+        context.tenant_id = tenant['id']
+    try:
+        yield
+    finally:
+        current_tenant.reset(token)
+
+def current_tenant_id():
+    tenant = current_tenant.get()
+    return tenant['id'] if tenant else None
+
+def invalidate_tenant_cache(student_id: str = None):
+    # One student after a school change or deletion, everything after a tenant change
+    global _cache_expires_at
+    if student_id is not None:
+        _student_tenants.pop(student_id, None)
+        return
+    _tenants.clear()
+    _student_tenants.clear()
+    _cache_expires_at = 0.0
+
+def _expire_cache():
+    global _cache_expires_at
+    now = time.monotonic()
+    if now >= _cache_expires_at:
+        _tenants.clear()
+        _student_tenants.clear()
+        _cache_expires_at = now + TENANT_CACHE_TTL_SECONDS
+
+@collector
+def _collect_cache_size():
+    CACHE_ENTRIES.set(len(_tenants), cache="tenants")
+    CACHE_ENTRIES.set(len(_student_tenants), cache="student_tenants")
+
+async def get_tenant(tenant_id: str):
+    _expire_cache()
+    CACHE_REQUESTS.inc(cache="tenants", result="hit" if tenant_id in _tenants else "miss")
+    if tenant_id not in _tenants:
+        tenant = await db.tenants.find_one({"id": tenant_id}, {"_id": 0})
+        if not tenant:
+            return None
+        _tenants[tenant_id] = tenant
+    return _tenants[tenant_id]
+
+async def find_tenant_for_school(school: str):
+    if not TENANT_ROUTING or not school:
+        return None
+    tenant = await db.tenants.find_one({"school": school}, {"_id": 0})
+    if tenant:
+        _tenants[tenant['id']] = tenant
+    return tenant
+
+async def tenants_for_students(student_ids) -> dict:
+    # student id -> tenant document, or None when the student's school has no tenant
+    student_ids = set(student_ids)
+    if not TENANT_ROUTING:
+        return dict.fromkeys(student_ids)
+    _expire_cache()
+    result = {s: _student_tenants[s] for s in student_ids if s in _student_tenants}
+    missing = [s for s in student_ids if s not in result]
+    CACHE_REQUESTS.inc(len(result), cache="student_tenants", result="hit")
+    CACHE_REQUESTS.inc(len(missing), cache="student_tenants", result="miss")
+    if missing:
+        users = await db.users.find({"id": {"$in": missing}}, {"_id": 0, "id": 1, "school": 1}).to_list(None)
+        schools = {u['id']: u.get('school') for u in users}
+        tenants = await db.tenants.find(
+            {"school": {"$in": list({s for s in schools.values() if s})}}, {"_id": 0}
+        ).to_list(None)
+        _tenants.update((t['id'], t) for t in tenants)
+        by_school = {t['school']: t for t in tenants}
+        for student_id in missing:
+            result[student_id] = _student_tenants[student_id] = by_school.get(schools.get(student_id))
+    return result
+
+async def tenant_for_student(student_id: str):
+    return (await tenants_for_students([student_id]))[student_id]
+
+def group_by_tenant(student_tenants: dict) -> list:
+    # [(tenant, [student ids])] with one entry per tenant, from tenants_for_students()
+    groups = {}
+    for student_id, tenant in student_tenants.items():
+        groups.setdefault(tenant['id'] if tenant else None, (tenant, []))[1].append(student_id)
+    return list(groups.values())
+
+async def teacher_tenants(teacher_id: str) -> list:
+    # Tenants holding the practice data of a teacher's students, None for the directory database
+    if not TENANT_ROUTING:
+        return [None]
+    matches = await db.matches.find({"teacher_id": teacher_id}, {"_id": 0, "student_id": 1}).to_list(None)
+    tenants = await tenants_for_students(m['student_id'] for m in matches)
+    return [tenant for tenant, _ in group_by_tenant(tenants)] or [None]
+
+@asynccontextmanager
+async def student_tenant(student_id: str):
+    # For handlers that get the student from the request body
+    with use_tenant(await tenant_for_student(student_id)):
+        yield
+
+async def load_tenants() -> list:
+    tenants = await db.tenants.find({}, {"_id": 0}).to_list(None)
+    _tenants.update((t['id'], t) for t in tenants)
+    return tenants
+
+async def ensure_tenant_indexes():
+    for tenant in await load_tenants():
+        await ensure_indexes(tenant_raw_database(tenant), TENANT_COLLECTIONS)
+
+def _student_id(payload: dict):
+    # The student whose data the request touches: a {student_id} path parameter, else the
+    # caller when they are a student. Parents, teachers and admins have no tenant of their own.
+    context = current_request.get()
+    student_id = context.path_params.get("student_id") if context is not None else None
+    if student_id:
+        return student_id
+    if payload.get('role') == UserRole.STUDENT.value:
+        return payload.get('user_id')
+    return None
+
+async def resolve_tenant(scope):
+    payload = token_payload(dict(scope["headers"]))
+    if payload is None:
+        return None
+    student_id = _student_id(payload)
+    return await tenant_for_student(student_id) if student_id else None
+
+class TenantMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with use_tenant(await resolve_tenant(scope)):
+            await self.app(scope, receive, send)
@@ -0,0 +1,65 @@
+import asyncio
+from config import TENANT_MOVE_BATCH_SIZE, TENANT_MOVE_PAUSE_SECONDS
+from database import db, TENANT_COLLECTIONS, TIMESERIES_COLLECTIONS
+from jobs import job_handler, report_progress
+from tenancy import use_tenant, get_tenant
+
+# A student's practice data lives in the database of their school's tenant. When the
+# school changes, or a school with students gets a tenant, routing switches at once and
+# this job moves the data that was already written from the old database to the new one.
+
+async def copy_collection(source, target, collection: str, student_ids: list, batch_size: int, pause: float,
+                          delete_source: bool) -> int:
+    # Entries already in the target are skipped, so a copy can be re-run to pick up
+    # anything written to the source in between
+    copied = 0
+    for i in range(0, len(student_ids), batch_size):
+        query = {"student_id": {"$in": student_ids[i:i + batch_size]}}
+        last_id = None
+        while True:
+            batch_query = query if last_id is None else {**query, "id": {"$gt": last_id}}
+            docs = await source.find(batch_query, {"_id": 0}).sort("id", 1).limit(batch_size).to_list(None)
+            if not docs:
+                break
+            last_id = docs[-1]['id']
+            ids = [d['id'] for d in docs]
+            existing = set(await target.distinct("id", {"id": {"$in": ids}}))
+            new_docs = [d for d in docs if d['id'] not in existing]
+            if new_docs:
+                await target.insert_many(new_docs, ordered=False)
+                copied += len(new_docs)
+            if delete_source and collection not in TIMESERIES_COLLECTIONS:
+                await source.delete_many({"id": {"$in": ids}})
+            if pause:
+                await asyncio.sleep(pause)
+        if delete_source and collection in TIMESERIES_COLLECTIONS:
+            # Time-series entries are deleted by student, the metaField, once all of them are copied
+            await source.delete_many(query)
+    return copied
+
+async def _job_tenant(tenant_id: str):
+    if tenant_id is None:
+        return None
+    tenant = await get_tenant(tenant_id)
+    if tenant is None:
+        raise ValueError(f"Unknown tenant: {tenant_id}")
+    return tenant
+
+@job_handler("move_tenant_data")
+async def move_tenant_data(job: dict) -> dict:
+    # params: student_ids, from_tenant_id and to_tenant_id (None for the directory database)
+    student_ids = job['params']['student_ids']
+    source_tenant = await _job_tenant(job['params'].get('from_tenant_id'))
+    target_tenant = await _job_tenant(job['params'].get('to_tenant_id'))
+
+    moved = {}
+    for done, collection in enumerate(TENANT_COLLECTIONS, start=1):
+        with use_tenant(source_tenant):
+            source = db[collection]
+        with use_tenant(target_tenant):
+            target = db[collection]
+        moved[collection] = await copy_collection(
+            source, target, collection, student_ids, TENANT_MOVE_BATCH_SIZE, TENANT_MOVE_PAUSE_SECONDS, delete_source=True
+        )
+        await report_progress(job['id'], done, len(TENANT_COLLECTIONS), collection=collection)
+    return {"student_ids": student_ids, "moved": moved}
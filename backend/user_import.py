@@ -0,0 +1,194 @@
+import asyncio
+import csv
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone, timedelta
+from pydantic import ValidationError
+from config import PASSWORD_HASH_WORKERS, IMPORT_BATCH_SIZE, IMPORT_PASSWORD_TTL_SECONDS, JOB_MAX_ATTEMPTS
+from database import db
+from jobs import job_handler, report_progress
+from models import User, UserImportRow, ParentStudentRelation, ApprovalStatus, UserRole, new_id
+from utils import hash_passwords
+
+# bcrypt is CPU bound, so hashing runs in worker processes instead of the event loop.
+# "spawn" avoids forking a process that already holds Motor's executor threads.
+_hash_pool = None
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _hash_pool
+
+def shutdown_hash_pool():
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def parse_csv(content: bytes) -> list:
+    reader = csv.DictReader(io.StringIO(content.decode('utf-8-sig')))
+    return [
+        {k.strip(): v.strip() for k, v in row.items() if k and v and v.strip()}
+        for row in reader
+    ]
+
+def validate_rows(raw_rows: list):
+    rows = []
+    errors = []
+    seen_emails = set()
+    for index, raw in enumerate(raw_rows, start=1):
+        try:
+            row = UserImportRow(**raw)
+        except ValidationError as e:
+            errors.append({"row": index, "error": "; ".join(err['msg'] for err in e.errors())})
+            continue
+        # Emails are already lowercased by the model
+        if row.email in seen_emails:
+            errors.append({"row": index, "email": row.email, "error": "Duplicate email in import"})
+            continue
+        seen_emails.add(row.email)
+        rows.append(row)
+    return rows, errors
+
+async def store_import_passwords(rows: list) -> str:
+    # Plaintext passwords stay out of jobs.params: the job reads them from this side
+    # collection and deletes them once it is done; the TTL index drops any it leaves behind
+    passwords_id = new_id()
+    await db.import_passwords.insert_one({
+        "id": passwords_id,
+        "passwords": [r.password for r in rows],
+        "expires_at": datetime.now(timezone.utc) + timedelta(seconds=IMPORT_PASSWORD_TTL_SECONDS)
+    })
+    return passwords_id
+
+async def _hash_all(job_id: str, passwords: list) -> list:
+    loop = asyncio.get_running_loop()
+    pool = _get_hash_pool()
+    chunk_size = max(1, min(50, -(-len(passwords) // (PASSWORD_HASH_WORKERS * 4))))
+    chunks = list(_chunks(passwords, chunk_size))
+    hashed = [None] * len(chunks)
+
+    async def hash_chunk(index: int, chunk: list) -> int:
+        hashed[index] = await loop.run_in_executor(pool, hash_passwords, chunk)
+        return len(chunk)
+
+    tasks = [asyncio.ensure_future(hash_chunk(i, c)) for i, c in enumerate(chunks)]
+    done = 0
+    try:
+        for finished in asyncio.as_completed(tasks):
+            done += await finished
+            await report_progress(job_id, done, len(passwords), phase="hashing")
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return [h for chunk in hashed for h in chunk]
+
+@job_handler("user_import", clear_params=True)
+async def run_user_import(job: dict) -> dict:
+    try:
+        result = await _import_users(job)
+    except Exception:
+        # The passwords are still needed for a retry
+        if job.get('attempts', 1) < job.get('max_attempts', JOB_MAX_ATTEMPTS):
+            raise
+        await db.import_passwords.delete_one({"id": job['params'].get('passwords_id')})
+        raise
+    await db.import_passwords.delete_one({"id": job['params'].get('passwords_id')})
+    return result
+
+async def _import_users(job: dict) -> dict:
+    job_id = job['id']
+    # Rows are queued without their passwords, which are read only for new users
+    rows = [UserImportRow(password="", **r) for r in job['params']['rows']]
+    errors = list(job['params'].get('errors', []))
+    existing = await db.users.find(
+        {"email": {"$in": [r.email for r in rows]}},
+        {"_id": 0, "id": 1, "email": 1, "role": 1}
+    ).to_list(None)
+    users_by_email = {u['email']: u for u in existing}
+    new_rows = [r for r in rows if r.email not in users_by_email]
+    skipped = [r.email for r in rows if r.email in users_by_email]
+
+    hashed = []
+    if new_rows:
+        stored = await db.import_passwords.find_one({"id": job['params'].get('passwords_id')}, {"_id": 0, "passwords": 1})
+        if stored is None:
+            raise RuntimeError("Import passwords expired before the job ran")
+        passwords = dict(zip((r.email for r in rows), stored['passwords']))
+        hashed = await _hash_all(job_id, [passwords[r.email] for r in new_rows])
+
+    user_dicts = []
+    for row, hashed_password in zip(new_rows, hashed):
+        user = User(
+            email=row.email,
+            password=hashed_password,
+            full_name=row.full_name,
+            role=row.role,
+            school=row.school,
+            grade=row.grade,
+            birth_date=row.birth_date,
+            phone=row.phone,
+            address=row.address,
+            goal=row.goal,
+            approval_status=ApprovalStatus.APPROVED
+        )
+        user_dict = user.model_dump()
+        user_dicts.append(user_dict)
+        users_by_email[user_dict['email']] = {"id": user_dict['id'], "role": user_dict['role']}
+
+    inserted = 0
+    for chunk in _chunks(user_dicts, IMPORT_BATCH_SIZE):
+        await db.users.insert_many(chunk, ordered=False)
+        inserted += len(chunk)
+        await report_progress(job_id, inserted, len(user_dicts), phase="inserting_users")
+
+    pairs = {}
+    for row in rows:
+        if row.role == UserRole.STUDENT and row.parent_email:
+            parent, student = users_by_email.get(row.parent_email), users_by_email[row.email]
+        elif row.role == UserRole.PARENT and row.student_email:
+            parent, student = users_by_email[row.email], users_by_email.get(row.student_email)
+        else:
+            continue
+        if not parent or parent['role'] != UserRole.PARENT.value:
+            errors.append({"email": row.email, "error": "Parent not found for relation"})
+        elif not student or student['role'] != UserRole.STUDENT.value:
+            errors.append({"email": row.email, "error": "Student not found for relation"})
+        else:
+            pairs[(parent['id'], student['id'])] = True
+
+    relation_dicts = []
+    if pairs:
+        existing_relations = await db.parent_student_relations.find(
+            {"parent_id": {"$in": [p for p, _ in pairs]}, "student_id": {"$in": [s for _, s in pairs]}},
+            {"_id": 0, "parent_id": 1, "student_id": 1}
+        ).to_list(None)
+        for r in existing_relations:
+            pairs.pop((r['parent_id'], r['student_id']), None)
+        for parent_id, student_id in pairs:
+            relation_dict = ParentStudentRelation(parent_id=parent_id, student_id=student_id).model_dump()
+            relation_dicts.append(relation_dict)
+
+    linked = 0
+    for chunk in _chunks(relation_dicts, IMPORT_BATCH_SIZE):
+        await db.parent_student_relations.insert_many(chunk, ordered=False)
+        linked += len(chunk)
+        await report_progress(job_id, linked, len(relation_dicts), phase="inserting_relations")
+
+    return {
+        "created": inserted,
+        "skipped_existing": skipped,
+        "relations_created": linked,
+        "errors": errors
+    }
@@ -3,7 +3,8 @@ from passlib.context import CryptContext
 import jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_DAYS
+from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_DAYS, DATETIME_DUAL_READ
+from request_context import current_request
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
@@ -19,11 +20,49 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        context = current_request.get()
+        if context is not None:
+            context.user = payload
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
+def token_payload(headers: dict):
+    # For ASGI middleware, which see the raw headers before verify_token runs
+    authorization = headers.get(b"authorization", b"").decode()
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.InvalidTokenError:
+        # verify_token rejects the request
+        return None
+
+def parse_datetime(value):
+    # Documents written before the BSON datetime migration still hold ISO strings
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value is not None and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+def datetime_range_query(field: str, gte: datetime = None, lt: datetime = None) -> dict:
+    bounds = {}
+    if gte is not None:
+        bounds["$gte"] = gte
+    if lt is not None:
+        bounds["$lt"] = lt
+    query = {field: bounds}
+    if DATETIME_DUAL_READ:
+        string_bounds = {op: value.isoformat() for op, value in bounds.items()}
+        query = {"$or": [query, {field: {"$type": "string", **string_bounds}}]}
+    return query
+
+def hash_passwords(passwords: list) -> list:
+    return [pwd_context.hash(p) for p in passwords]
+
 def calculate_net(correct: int, wrong: int) -> float:
     return correct - (wrong / 3)
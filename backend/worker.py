@@ -0,0 +1,31 @@
+import asyncio
+import logging
+import signal
+from config import JOB_WORKERS
+from database import close_db_connection, ensure_indexes
+from jobs import start_workers, stop_workers
+from user_import import shutdown_hash_pool
+
+# Standalone job worker: `python worker.py` runs JOB_WORKERS workers against the
+# shared jobs collection without serving HTTP. API instances can set JOB_WORKERS=0.
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await ensure_indexes()
+    start_workers(max(JOB_WORKERS, 1))
+    await stop.wait()
+    await stop_workers()
+    shutdown_hash_pool()
+    await close_db_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,6 +3,10 @@ import axios from 'axios';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API_URL = `${BACKEND_URL}/api`;
 
+// Echoed back so reads after this tab's own writes see them, even from a lagging secondary
+const CAUSAL_TOKEN_HEADER = 'X-Causal-Token';
+let causalToken = null;
+
 const api = axios.create({
   baseURL: API_URL,
   headers: {
@@ -16,6 +20,9 @@ api.interceptors.request.use(
     if (token) {
       config.headers.Authorization = `Bearer ${token}`;
     }
+    if (causalToken) {
+      config.headers[CAUSAL_TOKEN_HEADER] = causalToken;
+    }
     return config;
   },
   (error) => {
@@ -24,7 +31,13 @@ api.interceptors.request.use(
 );
 
 api.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    const token = response.headers[CAUSAL_TOKEN_HEADER.toLowerCase()];
+    if (token) {
+      causalToken = token;
+    }
+    return response;
+  },
   (error) => {
     if (error.response?.status === 401) {
       localStorage.removeItem('token');
@@ -0,0 +1,122 @@
+import os
+import sys
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "query_budget_tests")
+# Causal sessions need a real server; access records would only clutter the output
+os.environ["CAUSAL_SESSION_ROUTERS"] = ""
+os.environ.setdefault("ACCESS_LOG_ENABLED", "false")
+
+import httpx
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+import database
+from config import DB_NAME
+from models import (
+    User, UserRole, ApprovalStatus, StudentTeacherMatch, ParentStudentRelation, QuestionEntry, ExamAnalysis,
+    ResourceTracking, Assignment, StudySchedule, WeeklySchedule, ResourceWithTopics, Notification
+)
+from server import app
+from utils import create_access_token, calculate_net
+from tests.instrumented_mongo import QueryRecorder, InstrumentedDatabase
+
+# Seeded dataset: two teachers with an uneven number of students, one parent per student
+STUDENTS_PER_TEACHER = {"teacher-1": 8, "teacher-2": 4}
+ENTRIES_PER_STUDENT = 20
+ANALYSES_PER_STUDENT = 3
+NOTIFICATIONS_PER_USER = 3
+SUBJECTS = ["Matematik", "Türkçe", "Fizik", "Kimya"]
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+def recorder(monkeypatch):
+    recorder = QueryRecorder(database.INDEXES)
+    mock_db = AsyncMongoMockClient(tz_aware=True)[DB_NAME]
+    # Every module shares database.db, so swapping its directory database reroutes them all
+    monkeypatch.setattr(database.db, "_directory", InstrumentedDatabase(mock_db, recorder))
+    return recorder
+
+@pytest.fixture
+def mongo(recorder):
+    # database.db, backed by an empty in-memory database
+    return database.db
+
+def _user(user_id: str, role: UserRole) -> dict:
+    return User(
+        id=user_id, email=f"{user_id}@example.com", password="not-a-hash", full_name=user_id.title(), role=role,
+        approval_status=ApprovalStatus.APPROVED, created_at=NOW, updated_at=NOW
+    ).model_dump()
+
+def _dataset() -> dict:
+    docs = {name: [] for name in (
+        "users", "matches", "parent_student_relations", "question_entries", "exam_analyses", "resource_tracking",
+        "assignments", "study_schedules", "weekly_schedules", "resources_with_topics", "notifications", "subjects",
+    )}
+    docs["users"].append(_user("admin", UserRole.ADMIN))
+    for teacher_id, students in STUDENTS_PER_TEACHER.items():
+        docs["users"].append(_user(teacher_id, UserRole.TEACHER))
+        for n in range(students):
+            student_id = f"student-{teacher_id[-1]}-{n}"
+            parent_id = f"parent-{teacher_id[-1]}-{n}"
+            owner = {"student_id": student_id, "teacher_id": teacher_id}
+            docs["users"] += [_user(student_id, UserRole.STUDENT), _user(parent_id, UserRole.PARENT)]
+            docs["matches"].append(StudentTeacherMatch(**owner).model_dump())
+            docs["parent_student_relations"].append(ParentStudentRelation(parent_id=parent_id, student_id=student_id).model_dump())
+            for i in range(ENTRIES_PER_STUDENT):
+                docs["question_entries"].append(QuestionEntry(
+                    **owner, exam_type="TYT", subject=SUBJECTS[i % len(SUBJECTS)], total_questions=40,
+                    correct_answers=25, wrong_answers=9, empty_answers=6, net_score=calculate_net(25, 9),
+                    date=NOW - timedelta(days=i)
+                ).model_dump())
+            for i in range(ANALYSES_PER_STUDENT):
+                docs["exam_analyses"].append(ExamAnalysis(
+                    **owner, exam_type="TYT", exam_name=f"Deneme {i}", exam_date=NOW - timedelta(days=7 * i),
+                    subjects=[{"name": s, "correct": 20, "wrong": 6, "net": calculate_net(20, 6)} for s in SUBJECTS],
+                    total_net=4 * calculate_net(20, 6)
+                ).model_dump())
+            docs["resource_tracking"].append(ResourceTracking(
+                **owner, resource_name="Soru Bankası", subject="Matematik", topic="Türev", status="in_progress"
+            ).model_dump())
+            docs["assignments"].append(Assignment(
+                **owner, title="Ödev", description="Test 1-5", subject="Fizik", due_date=NOW + timedelta(days=7)
+            ).model_dump())
+            docs["study_schedules"].append(StudySchedule(
+                **owner, day_of_week=1, start_time="09:00", end_time="11:00", subject="Kimya", topic="Mol"
+            ).model_dump())
+            docs["weekly_schedules"].append(WeeklySchedule(
+                **owner, week_start_date=NOW, week_end_date=NOW + timedelta(days=6), schedule_items=[]
+            ).model_dump())
+            docs["resources_with_topics"].append(ResourceWithTopics(
+                **owner, resource_name="Konu Anlatımı", subject="Türkçe", topics=[{"name": "Paragraf", "status": "pending"}]
+            ).model_dump())
+            for user_id in (student_id, parent_id):
+                docs["notifications"] += [
+                    Notification(user_id=user_id, title="Bildirim", message="Mesaj", type="assignment").model_dump()
+                    for _ in range(NOTIFICATIONS_PER_USER)
+                ]
+    docs["subjects"] = [{"id": f"subject-{s}", "name": s, "exam_type": "TYT", "created_at": NOW} for s in SUBJECTS]
+    return docs
+
+@pytest.fixture
+async def dataset(recorder):
+    docs = _dataset()
+    for collection, collection_docs in docs.items():
+        await database.db[collection].insert_many(collection_docs)
+    recorder.reset()
+    return docs
+
+@pytest.fixture
+async def api():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test/api") as client:
+        yield client
+
+def auth(user_id: str, role: UserRole) -> dict:
+    return {"Authorization": "Bearer " + create_access_token({"user_id": user_id, "role": role.value})}
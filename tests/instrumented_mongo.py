@@ -0,0 +1,170 @@
+from dataclasses import dataclass, field
+
+# mongomock runs queries in memory and emits no command events, so the collections are
+# wrapped instead: every call that would be a round trip to mongod is recorded with its
+# filter and the documents it returned, and filters are checked against the index
+# definitions in database.INDEXES to find the ones a real server would answer with a
+# collection scan.
+
+# Operators an index can answer; $ne, $nin, $not, $regex and $exists are left out
+INDEXABLE_OPERATORS = {"$eq", "$in", "$gt", "$gte", "$lt", "$lte"}
+WRITE_OPERATIONS = {"insert_one", "insert_many", "bulk_write"}
+FILTERED_OPERATIONS = {
+    "find_one", "update_one", "update_many", "replace_one", "delete_one", "delete_many", "count_documents",
+    "find_one_and_update", "find_one_and_delete", "find_one_and_replace",
+}
+
+@dataclass
+class Query:
+    collection: str
+    operation: str
+    filter: dict = None
+    docs: int = 0
+
+    def __str__(self):
+        return f"{self.collection}.{self.operation}({self.filter})"
+
+def _indexable_fields(query: dict) -> set:
+    fields = set()
+    for key, condition in query.items():
+        if key == "$and":
+            for branch in condition:
+                fields |= _indexable_fields(branch)
+        elif key.startswith("$"):
+            continue
+        elif not isinstance(condition, dict) or not any(op.startswith("$") for op in condition):
+            fields.add(key)
+        elif set(condition) & INDEXABLE_OPERATORS:
+            fields.add(key)
+    return fields
+
+@dataclass
+class QueryRecorder:
+    # collection -> [IndexModel], as in database.INDEXES
+    indexes: dict
+    queries: list = field(default_factory=list)
+
+    def record(self, collection: str, operation: str, query: dict = None) -> Query:
+        entry = Query(collection, operation, query)
+        self.queries.append(entry)
+        return entry
+
+    def reset(self):
+        self.queries.clear()
+
+    @property
+    def round_trips(self) -> int:
+        return len(self.queries)
+
+    @property
+    def docs_read(self) -> int:
+        return sum(q.docs for q in self.queries)
+
+    def uses_index(self, collection: str, query: dict) -> bool:
+        if "$or" in query:
+            rest = {k: v for k, v in query.items() if k != "$or"}
+            if rest and self.uses_index(collection, rest):
+                return True
+            return all(self.uses_index(collection, branch) for branch in query["$or"])
+        fields = _indexable_fields(query)
+        if "_id" in fields:
+            return True
+        # An index is usable when the query constrains its leading key
+        return any(next(iter(index.document["key"])) in fields for index in self.indexes.get(collection, ()))
+
+    def scans(self, allowed: set = frozenset()) -> list:
+        # Reads and updates that would examine the whole collection. An empty filter is a
+        # deliberate full listing and only passes for collections in `allowed`.
+        return [
+            q for q in self.queries
+            if q.filter is not None and q.collection not in allowed and not self.uses_index(q.collection, q.filter)
+        ]
+
+class InstrumentedCursor:
+    def __init__(self, cursor, query: Query):
+        self._cursor = cursor
+        self._query = query
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if not callable(attr):
+            return attr
+
+        def chained(*args, **kwargs):
+            # sort(), limit() and skip() return the cursor itself
+            result = attr(*args, **kwargs)
+            return self if result is self._cursor else result
+        return chained
+
+    async def to_list(self, length=None):
+        docs = await self._cursor.to_list(length)
+        self._query.docs += len(docs)
+        return docs
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        doc = await self._cursor.__anext__()
+        self._query.docs += 1
+        return doc
+
+class InstrumentedCollection:
+    def __init__(self, collection, recorder: QueryRecorder):
+        self._collection = collection
+        self._recorder = recorder
+        self.name = collection.name
+
+    def with_options(self, *args, **kwargs):
+        return InstrumentedCollection(self._collection.with_options(*args, **kwargs), self._recorder)
+
+    def find(self, filter=None, *args, **kwargs):
+        query = self._recorder.record(self.name, "find", filter or {})
+        return InstrumentedCursor(self._collection.find(filter, *args, **kwargs), query)
+
+    def aggregate(self, pipeline, *args, **kwargs):
+        first = pipeline[0] if pipeline else {}
+        query = self._recorder.record(self.name, "aggregate", first.get("$match", {}))
+        return InstrumentedCursor(self._collection.aggregate(pipeline, *args, **kwargs), query)
+
+    async def find_one_and_update(self, filter, update, projection=None, **kwargs):
+        # mongomock re-reads the updated document with the original filter unless the
+        # projection keeps _id, which misses documents the update moved out of the filter
+        query = self._recorder.record(self.name, "find_one_and_update", filter)
+        drop_id = projection is not None and projection.get("_id") == 0
+        if drop_id:
+            projection = {k: v for k, v in projection.items() if k != "_id"} or None
+        result = await self._collection.find_one_and_update(filter, update, projection, **kwargs)
+        if result is not None:
+            query.docs += 1
+            if drop_id:
+                result.pop("_id", None)
+        return result
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name not in FILTERED_OPERATIONS and name not in WRITE_OPERATIONS:
+            return attr
+
+        async def call(*args, **kwargs):
+            query_filter = (args[0] if args else kwargs.get("filter", {})) if name in FILTERED_OPERATIONS else None
+            query = self._recorder.record(self.name, name, query_filter)
+            result = await attr(*args, **kwargs)
+            if name in ("find_one", "find_one_and_update", "find_one_and_delete", "find_one_and_replace") and result is not None:
+                query.docs += 1
+            return result
+        return call
+
+class InstrumentedDatabase:
+    def __init__(self, database, recorder: QueryRecorder):
+        self._database = database
+        self._recorder = recorder
+        self.name = database.name
+
+    def __getitem__(self, name):
+        return InstrumentedCollection(self._database[name], self._recorder)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
@@ -0,0 +1,45 @@
+import pytest
+import archive
+from archive import archive_practice_data
+from models import UserRole
+from tests.conftest import ANALYSES_PER_STUDENT, ENTRIES_PER_STUDENT, STUDENTS_PER_TEACHER, SUBJECTS, auth
+
+pytestmark = pytest.mark.anyio
+
+async def _get(api, path: str, user=("teacher-1", UserRole.TEACHER)) -> dict:
+    response = await api.get(path, headers=auth(*user))
+    assert response.status_code == 200, response.text
+    return response.json()
+
+async def test_archiving_keeps_summaries_and_reports(dataset, mongo, api):
+    summary_path = "/teacher/exam-analysis-summary/student-1-0"
+    before = (await _get(api, summary_path))["summary"]
+    reports_before = await _get(api, "/admin/reports", ("admin", UserRole.ADMIN))
+
+    # Every seeded document predates the current month
+    result = await archive_practice_data({"id": "job-1", "params": {"horizon_days": 0}})
+    matches = sum(STUDENTS_PER_TEACHER.values())
+    assert result["archived"] == {
+        "question_entries": matches * ENTRIES_PER_STUDENT, "exam_analyses": matches * ANALYSES_PER_STUDENT
+    }
+
+    after = await _get(api, summary_path)
+    assert after["analyses"] == []
+    assert after["summary"]["total_exams"] == before["total_exams"]
+    assert after["summary"]["average_net"] == pytest.approx(before["average_net"])
+    for subject, perf in before["subject_performance"].items():
+        assert after["summary"]["subject_performance"][subject] == pytest.approx(perf)
+    assert await _get(api, "/admin/reports", ("admin", UserRole.ADMIN)) == reports_before
+
+async def test_time_series_entries_are_deleted_by_series(dataset, mongo, recorder, monkeypatch):
+    monkeypatch.setattr(archive, "TIMESERIES_COLLECTIONS", {"question_entries"})
+    result = await archive_practice_data({"id": "job-1", "params": {"horizon_days": 0}})
+    matches = sum(STUDENTS_PER_TEACHER.values())
+    assert result["archived"]["question_entries"] == matches * ENTRIES_PER_STUDENT
+    assert await mongo.question_entries.count_documents({}) == 0
+    assert await mongo.question_entries_archive.count_documents({}) == matches * ENTRIES_PER_STUDENT
+
+    deletes = [q.filter for q in recorder.queries if q.collection == "question_entries" and q.operation == "delete_many"]
+    # One per student, teacher and subject, filtered on those (the metaField) and the cutoff only
+    assert len(deletes) == matches * len(SUBJECTS)
+    assert all(set(f) == {"student_id", "teacher_id", "subject", "date"} for f in deletes)
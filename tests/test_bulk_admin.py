@@ -0,0 +1,78 @@
+import pytest
+from models import UserRole, ApprovalStatus
+from tests.conftest import auth
+
+pytestmark = pytest.mark.anyio
+
+ADMIN = auth("admin", UserRole.ADMIN)
+
+async def test_bulk_approval_reports_each_user(dataset, mongo, api):
+    await mongo.users.update_many(
+        {"id": {"$in": ["student-1-0", "student-1-1"]}}, {"$set": {"approval_status": ApprovalStatus.PENDING.value}}
+    )
+    response = await api.put("/admin/approve-users", headers=ADMIN, json={
+        "user_ids": ["student-1-0", "student-1-1", "student-1-2", "ghost", "student-1-0"],
+    })
+    assert response.status_code == 200, response.text
+    assert response.json() == {
+        "results": [
+            {"user_id": "student-1-0", "status": "approved"},
+            {"user_id": "student-1-1", "status": "approved"},
+            {"user_id": "student-1-2", "status": "already_approved"},
+            {"user_id": "ghost", "status": "not_found"},
+        ],
+        "summary": {"approved": 2, "already_approved": 1, "not_found": 1},
+    }
+    assert await mongo.users.count_documents({"approval_status": ApprovalStatus.PENDING.value}) == 0
+    notifications = await mongo.notifications.find({"type": "approval"}, {"_id": 0}).to_list(None)
+    assert sorted(n["user_id"] for n in notifications) == ["student-1-0", "student-1-1"]
+    assert all(n["id"] and n["read"] is False for n in notifications)
+
+async def test_bulk_matches_report_each_pair(dataset, mongo, api):
+    response = await api.post("/admin/matches/bulk", headers=ADMIN, json={"matches": [
+        {"student_id": "student-1-0", "teacher_id": "teacher-2"},
+        {"student_id": "student-1-0", "teacher_id": "teacher-2"},
+        {"student_id": "student-1-1", "teacher_id": "teacher-1"},
+        {"student_id": "teacher-1", "teacher_id": "teacher-2"},
+        {"student_id": "student-2-0", "teacher_id": "parent-1-0"},
+        {"student_id": "ghost", "teacher_id": "teacher-1"},
+    ]})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [r["status"] for r in body["results"]] == [
+        "created", "already_exists", "already_exists", "student_not_found", "teacher_not_found", "student_not_found",
+    ]
+    assert body["summary"] == {"created": 1, "already_exists": 2, "student_not_found": 2, "teacher_not_found": 1}
+    created = await mongo.matches.find_one({"id": body["results"][0]["match_id"]})
+    assert (created["student_id"], created["teacher_id"]) == ("student-1-0", "teacher-2")
+    notified = await mongo.notifications.find({"title": {"$regex": "Ataması"}}, {"_id": 0}).to_list(None)
+    assert sorted(n["user_id"] for n in notified) == ["student-1-0", "teacher-2"]
+
+async def test_bulk_relations_report_each_pair(dataset, mongo, api):
+    response = await api.post("/admin/parent-student-relations/bulk", headers=ADMIN, json={"relations": [
+        {"parent_id": "parent-1-0", "student_id": "student-1-1"},
+        {"parent_id": "parent-1-0", "student_id": "student-1-1"},
+        {"parent_id": "parent-1-0", "student_id": "student-1-0"},
+        {"parent_id": "student-1-0", "student_id": "student-1-1"},
+        {"parent_id": "parent-1-0", "student_id": "teacher-1"},
+        {"parent_id": "parent-1-0", "student_id": "ghost"},
+    ]})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [r["status"] for r in body["results"]] == [
+        "created", "already_exists", "already_exists", "parent_not_found", "student_not_found", "student_not_found",
+    ]
+    assert body["summary"] == {"created": 1, "already_exists": 2, "parent_not_found": 1, "student_not_found": 2}
+    assert await mongo.parent_student_relations.count_documents({"parent_id": "parent-1-0"}) == 2
+    notified = await mongo.notifications.find({"type": "relation"}, {"_id": 0}).to_list(None)
+    assert sorted(n["user_id"] for n in notified) == ["parent-1-0", "student-1-1"]
+
+async def test_bulk_endpoints_are_admin_only(api):
+    headers = auth("teacher-1", UserRole.TEACHER)
+    for method, path, body in [
+        ("PUT", "/admin/approve-users", {"user_ids": []}),
+        ("POST", "/admin/matches/bulk", {"matches": []}),
+        ("POST", "/admin/parent-student-relations/bulk", {"relations": []}),
+    ]:
+        response = await api.request(method, path, headers=headers, json=body)
+        assert response.status_code == 403
@@ -0,0 +1,39 @@
+import pytest
+import cascade_delete
+from cascade_delete import cascade_delete_user, USER_OWNED_COLLECTIONS
+from tests.conftest import ENTRIES_PER_STUDENT, SUBJECTS
+
+pytestmark = pytest.mark.anyio
+
+STUDENT = "student-1-0"
+
+async def _owned_by(mongo, user_id: str) -> dict:
+    counts = {}
+    for collection, fields in USER_OWNED_COLLECTIONS.items():
+        counts[collection] = await mongo[collection].count_documents({"$or": [{f: user_id} for f in fields]})
+    return {c: n for c, n in counts.items() if n}
+
+async def test_cascade_removes_only_the_users_data(dataset, mongo):
+    before = await _owned_by(mongo, "student-1-1")
+    result = await cascade_delete_user({"id": "job-1", "params": {"user_id": STUDENT}})
+    assert await _owned_by(mongo, STUDENT) == {}
+    assert await _owned_by(mongo, "student-1-1") == before
+    assert result["deleted"]["question_entries"] == len([e for e in dataset["question_entries"] if e["student_id"] == STUDENT])
+    assert result["deleted"]["notifications"] == len([n for n in dataset["notifications"] if n["user_id"] == STUDENT])
+
+async def test_cascade_deletes_in_batches(dataset, mongo, recorder, monkeypatch):
+    monkeypatch.setattr(cascade_delete, "CASCADE_DELETE_BATCH_SIZE", 8)
+    await cascade_delete_user({"id": "job-1", "params": {"user_id": STUDENT}})
+    deletes = [q for q in recorder.queries if q.collection == "question_entries" and q.operation == "delete_many"]
+    batches = [len(q.filter["id"]["$in"]) for q in deletes]
+    assert batches == [8, 8, 4]
+
+async def test_time_series_entries_are_deleted_by_series(dataset, mongo, recorder, monkeypatch):
+    # The adapter turns student_id, teacher_id and subject into meta.* fields, the metaField
+    monkeypatch.setattr(cascade_delete, "TIMESERIES_COLLECTIONS", {"question_entries"})
+    result = await cascade_delete_user({"id": "job-1", "params": {"user_id": STUDENT}})
+    deletes = [q.filter for q in recorder.queries if q.collection == "question_entries" and q.operation == "delete_many"]
+    assert sorted(d["subject"] for d in deletes[:-1]) == sorted(SUBJECTS)
+    assert all(d == {"student_id": STUDENT, "teacher_id": "teacher-1", "subject": d["subject"]} for d in deletes[:-1])
+    assert deletes[-1] == {"student_id": STUDENT}
+    assert result["deleted"]["question_entries"] == ENTRIES_PER_STUDENT
@@ -0,0 +1,23 @@
+import tracemalloc
+import pytest
+import memory_diagnostics
+from models import UserRole
+from routes import metrics as metrics_routes
+from tests.conftest import auth
+
+pytestmark = pytest.mark.anyio
+
+async def test_snapshot_after_tracing_stopped_is_a_client_error(api, monkeypatch):
+    # Tracing stops between the is_tracing() check and the snapshot
+    assert not tracemalloc.is_tracing()
+    monkeypatch.setattr(memory_diagnostics, "is_tracing", lambda: True)
+    response = await api.post("/admin/diagnostics/memory/snapshots", headers=auth("admin", UserRole.ADMIN))
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Memory tracing is not running"}
+
+async def test_metrics_need_a_configured_token(api, monkeypatch):
+    assert (await api.get("http://test/metrics")).status_code == 404
+    monkeypatch.setattr(metrics_routes, "METRICS_TOKEN", "scrape-token")
+    assert (await api.get("http://test/metrics")).status_code == 401
+    response = await api.get("http://test/metrics", headers={"Authorization": "Bearer scrape-token"})
+    assert response.status_code == 200
@@ -0,0 +1,27 @@
+import time
+import uuid
+from bson.binary import Binary
+import models
+from models import uuid7
+
+def test_uuid7_layout():
+    before = time.time_ns() // 1_000_000
+    value = uuid7()
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+    assert before <= value.int >> 80 <= time.time_ns() // 1_000_000
+
+def test_uuid7_ids_increase_as_strings_and_binary():
+    ids = [uuid7() for _ in range(10000)]
+    assert len(set(ids)) == len(ids)
+    strings = [str(i) for i in ids]
+    assert strings == sorted(strings)
+    stored = [bytes(Binary.from_uuid(i)) for i in ids]
+    assert stored == sorted(stored)
+
+def test_uuid7_sequence_overflow_moves_to_next_millisecond(monkeypatch):
+    now_ms = time.time_ns() // 1_000_000 + 60_000
+    monkeypatch.setattr(models, "_uuid7_last", (now_ms, 0xFFF))
+    value = uuid7()
+    assert value.int >> 80 == now_ms + 1
+    assert (value.int >> 64) & 0xFFF == 0
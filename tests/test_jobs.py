@@ -0,0 +1,64 @@
+from datetime import datetime, timezone, timedelta
+import pytest
+import jobs
+from models import JobStatus
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def failing_job(monkeypatch):
+    calls = []
+
+    async def handler(job):
+        calls.append(job['attempts'])
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(jobs.JOB_HANDLERS, "failing", (handler, True))
+    return calls
+
+async def _expire_lease(mongo, job_id: str):
+    await mongo.jobs.update_one({"id": job_id}, {"$set": {"lease_expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+
+async def test_live_lease_is_not_reclaimed(mongo, failing_job):
+    await jobs.enqueue_job("failing")
+    assert await jobs._claim_job("worker-1") is not None
+    assert await jobs._claim_job("worker-2") is None
+
+async def test_expired_lease_is_reclaimed(mongo, failing_job):
+    job = await jobs.enqueue_job("failing")
+    await jobs._claim_job("worker-1")
+    await _expire_lease(mongo, job.id)
+    reclaimed = await jobs._claim_job("worker-2")
+    assert reclaimed['id'] == job.id
+    assert reclaimed['worker_id'] == "worker-2"
+    assert reclaimed['attempts'] == 2
+
+async def test_expired_lease_on_last_attempt_fails_the_job(mongo, failing_job):
+    job = await jobs.enqueue_job("failing", params={"secret": "x"}, max_attempts=2)
+    for worker_id in ("worker-1", "worker-2"):
+        assert await jobs._claim_job(worker_id) is not None
+        await _expire_lease(mongo, job.id)
+    assert await jobs._claim_job("worker-3") is None
+
+    await jobs._fail_abandoned_jobs()
+    stored = await mongo.jobs.find_one({"id": job.id})
+    assert stored['status'] == JobStatus.FAILED.value
+    assert stored['error'] == "Lease expired"
+    assert "params" not in stored
+
+async def test_failures_are_retried_up_to_max_attempts(mongo, failing_job):
+    job = await jobs.enqueue_job("failing", max_attempts=3)
+    for attempt in range(1, 4):
+        claimed = await jobs._claim_job("worker-1")
+        assert claimed['attempts'] == attempt
+        await jobs._run_job(claimed, "worker-1")
+        stored = await mongo.jobs.find_one({"id": job.id})
+        if attempt < 3:
+            assert stored['status'] == JobStatus.QUEUED.value
+            assert stored['run_after'] > datetime.now(timezone.utc)
+            # Skip the backoff
+            await mongo.jobs.update_one({"id": job.id}, {"$set": {"run_after": datetime.now(timezone.utc)}})
+    assert stored['status'] == JobStatus.FAILED.value
+    assert stored['error'] == "boom"
+    assert failing_job == [1, 2, 3]
+    assert await jobs._claim_job("worker-1") is None
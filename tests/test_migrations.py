@@ -0,0 +1,72 @@
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from migrations.runner import Migration, Step, MigrationInProgress, run_migrations, migration_status, MIGRATIONS_COLLECTION
+from migrations.versions import MIGRATIONS
+
+pytestmark = pytest.mark.anyio
+
+DOCS = 10
+LOWERCASE_EMAILS = next(m for m in MIGRATIONS if m.name == "lowercase_emails")
+
+@pytest.fixture
+async def database():
+    database = AsyncMongoMockClient()["migration_tests"]
+    await database.items.insert_many([{"_id": i, "n": i} for i in range(DOCS)])
+    return database
+
+def _doubling(seen: list, fail_at: int = None):
+    def transform(doc):
+        if doc['_id'] == fail_at:
+            raise RuntimeError(f"bad document {fail_at}")
+        seen.append(doc['_id'])
+        return {"$set": {"n": doc['n'] * 2}}
+    return Migration(1, "double", [Step("items", {}, transform)])
+
+async def test_migration_is_applied_once(database):
+    seen = []
+    assert await run_migrations(database, [_doubling(seen)], batch_size=3, pause=0) == ["0001_double"]
+    assert await run_migrations(database, [_doubling(seen)], batch_size=3, pause=0) == []
+    assert seen == list(range(DOCS))
+    assert [d['n'] for d in await database.items.find().sort("_id", 1).to_list(None)] == [2 * i for i in range(DOCS)]
+    assert await migration_status(database, [_doubling(seen)]) == [{"id": "0001_double", "status": "applied", "processed": DOCS}]
+
+async def test_failed_run_resumes_from_checkpoint(database):
+    seen = []
+    with pytest.raises(RuntimeError):
+        await run_migrations(database, [_doubling(seen, fail_at=7)], batch_size=3, pause=0)
+    record = await database[MIGRATIONS_COLLECTION].find_one({"_id": "0001_double"})
+    assert record['status'] == "failed"
+    # Two full batches were written and checkpointed; the third never was
+    assert record['checkpoints'] == {"0": 5}
+    assert [d['n'] for d in await database.items.find().sort("_id", 1).to_list(None)] == [0, 2, 4, 6, 8, 10, 6, 7, 8, 9]
+
+    resumed = []
+    await run_migrations(database, [_doubling(resumed)], batch_size=3, pause=0)
+    assert resumed == [6, 7, 8, 9]
+    assert [d['n'] for d in await database.items.find().sort("_id", 1).to_list(None)] == [2 * i for i in range(DOCS)]
+    record = await database[MIGRATIONS_COLLECTION].find_one({"_id": "0001_double"})
+    assert (record['status'], record['processed']) == ("applied", DOCS)
+
+async def test_running_migration_is_not_claimed_twice(database):
+    await database[MIGRATIONS_COLLECTION].insert_one({"_id": "0001_double", "status": "running", "checkpoints": {"0": 4}})
+    with pytest.raises(MigrationInProgress):
+        await run_migrations(database, [_doubling([])], pause=0)
+
+    seen = []
+    await run_migrations(database, [_doubling(seen)], pause=0, force=True)
+    assert seen == [5, 6, 7, 8, 9]
+
+async def test_lowercasing_stops_on_emails_differing_in_case():
+    database = AsyncMongoMockClient()["migration_tests"]
+    await database.users.create_index("email")
+    await database.users.insert_many([
+        {"id": "u1", "email": "Foo@example.com"}, {"id": "u2", "email": "foo@example.com"}, {"id": "u3", "email": "Bar@example.com"},
+    ])
+    with pytest.raises(RuntimeError, match=r"foo@example.com \(u1, u2\)"):
+        await run_migrations(database, [LOWERCASE_EMAILS], pause=0)
+    assert (await database.users.find_one({"id": "u3"}))["email"] == "Bar@example.com"
+
+    await database.users.update_one({"id": "u2"}, {"$set": {"email": "foo2@example.com"}})
+    assert await run_migrations(database, [LOWERCASE_EMAILS], pause=0) == ["0004_lowercase_emails"]
+    assert (await database.users.find_one({"id": "u3"}))["email"] == "bar@example.com"
+    assert (await database.users.index_information())["email_1"].get("unique")
@@ -0,0 +1,115 @@
+import pytest
+from models import UserRole
+from tests.conftest import STUDENTS_PER_TEACHER, ENTRIES_PER_STUDENT, ANALYSES_PER_STUDENT, NOTIFICATIONS_PER_USER, auth
+
+pytestmark = pytest.mark.anyio
+
+# Round trips and documents read per endpoint on the seeded dataset (see conftest.py).
+# A new query in a loop, a dropped filter or a filter no index covers fails here; when
+# an endpoint legitimately needs more, raise its budget in the same change.
+MATCHES = sum(STUDENTS_PER_TEACHER.values())
+TEACHER_1 = ("teacher-1", UserRole.TEACHER)
+STUDENT = ("student-1-0", UserRole.STUDENT)
+PARENT = ("parent-1-0", UserRole.PARENT)
+ADMIN = ("admin", UserRole.ADMIN)
+ALL_STUDENTS = [f"student-{t[-1]}-{n}" for t, count in STUDENTS_PER_TEACHER.items() for n in range(count)]
+
+# (user, path, max round trips, max documents read, collections an endpoint may list in full)
+READ_BUDGETS = [
+    (ADMIN, "/admin/pending-users", 1, 0, ()),
+    (ADMIN, "/admin/teachers", 1, len(STUDENTS_PER_TEACHER), ()),
+    (ADMIN, "/admin/students", 1, MATCHES, ()),
+    (ADMIN, "/admin/parents", 1, MATCHES, ()),
+    (ADMIN, "/admin/matches", 1, MATCHES, ("matches",)),
+    (ADMIN, "/admin/parent-student-relations", 1, MATCHES, ("parent_student_relations",)),
+    (ADMIN, "/admin/subjects", 1, 4, ("subjects",)),
+    # Known N+1: two user lookups, entries and assignments for every match
+    (ADMIN, "/admin/reports", 2 + 4 * MATCHES, MATCHES * (3 + ENTRIES_PER_STUDENT + 1), ("matches",)),
+    (TEACHER_1, "/teacher/students", 2, 2 * STUDENTS_PER_TEACHER["teacher-1"], ()),
+    (TEACHER_1, "/teacher/question-entries/student-1-0", 1, ENTRIES_PER_STUDENT, ()),
+    (TEACHER_1, "/teacher/exam-analyses/student-1-0", 1, ANALYSES_PER_STUDENT, ()),
+    (TEACHER_1, "/teacher/exam-analysis-summary/student-1-0", 2, ANALYSES_PER_STUDENT, ()),
+    (TEACHER_1, "/teacher/suggested-schedule/student-1-0", 2, ENTRIES_PER_STUDENT, ()),
+    (TEACHER_1, "/teacher/resource-tracking/student-1-0", 1, 1, ()),
+    (TEACHER_1, "/teacher/assignments/student-1-0", 1, 1, ()),
+    (TEACHER_1, "/teacher/study-schedule/student-1-0", 1, 1, ()),
+    (TEACHER_1, "/teacher/weekly-schedules/student-1-0", 1, 1, ()),
+    (TEACHER_1, "/teacher/resources-with-topics/student-1-0", 1, 1, ()),
+    (STUDENT, "/student/my-teacher", 2, 2, ()),
+    (STUDENT, "/student/my-question-entries", 1, ENTRIES_PER_STUDENT, ()),
+    (STUDENT, "/student/my-exam-analyses", 1, ANALYSES_PER_STUDENT, ()),
+    (STUDENT, "/student/my-resource-tracking", 1, 1, ()),
+    (STUDENT, "/student/my-assignments", 1, 1, ()),
+    (STUDENT, "/student/my-study-schedule", 1, 1, ()),
+    (STUDENT, "/student/my-weekly-schedules", 1, 1, ()),
+    (STUDENT, "/student/my-resources-with-topics", 1, 1, ()),
+    (PARENT, "/parent/my-children", 2, 2, ()),
+    (PARENT, "/parent/child-question-entries/student-1-0", 2, 1 + ENTRIES_PER_STUDENT, ()),
+    (PARENT, "/parent/child-exam-analyses/student-1-0", 2, 1 + ANALYSES_PER_STUDENT, ()),
+    (PARENT, "/parent/child-resources/student-1-0", 2, 2, ()),
+    (PARENT, "/parent/child-weekly-schedules/student-1-0", 2, 2, ()),
+    (PARENT, "/parent/child-assignments/student-1-0", 2, 2, ()),
+    (PARENT, "/statistics/overview/student-1-0", 4, ENTRIES_PER_STUDENT + ANALYSES_PER_STUDENT, ()),
+    (STUDENT, "/subjects", 1, 4, ("subjects",)),
+    (STUDENT, "/notifications", 1, NOTIFICATIONS_PER_USER, ()),
+    (STUDENT, "/auth/me", 1, 1, ()),
+]
+
+def _report(recorder) -> str:
+    return "\n".join(f"  {q} -> {q.docs} docs" for q in recorder.queries)
+
+def assert_budget(recorder, round_trips: int, docs_read: int, full_listings=()):
+    assert recorder.round_trips <= round_trips, f"{recorder.round_trips} round trips, budget {round_trips}:\n{_report(recorder)}"
+    assert recorder.docs_read <= docs_read, f"{recorder.docs_read} documents read, budget {docs_read}:\n{_report(recorder)}"
+    scans = recorder.scans(set(full_listings))
+    assert not scans, "collection scans:\n" + "\n".join(f"  {q}" for q in scans)
+
+@pytest.mark.parametrize("user, path, round_trips, docs_read, full_listings", READ_BUDGETS, ids=[b[1] for b in READ_BUDGETS])
+async def test_read_budget(dataset, recorder, api, user, path, round_trips, docs_read, full_listings):
+    response = await api.get(path, headers=auth(*user))
+    assert response.status_code == 200, response.text
+    assert_budget(recorder, round_trips, docs_read, full_listings)
+
+async def test_question_entry_is_a_single_insert(dataset, recorder, api):
+    response = await api.post("/teacher/question-entry", headers=auth(*TEACHER_1), json={
+        "student_id": "student-1-0", "exam_type": "TYT", "subject": "Matematik",
+        "total_questions": 40, "correct_answers": 30, "wrong_answers": 6,
+    })
+    assert response.status_code == 200, response.text
+    assert_budget(recorder, 1, 0)
+
+async def test_bulk_assignments_write_in_batches(dataset, recorder, api):
+    # Independent of the number of students: one read of the matches, one insert_many each
+    # for assignments and notifications
+    response = await api.post("/teacher/assignments/bulk", headers=auth(*TEACHER_1), json={
+        "all_students": True, "title": "Ödev", "description": "Test 1-10", "subject": "Kimya",
+        "due_date": "2026-02-01T00:00:00+00:00",
+    })
+    assert response.status_code == 200, response.text
+    assert_budget(recorder, 3, STUDENTS_PER_TEACHER["teacher-1"])
+
+async def test_bulk_approval_writes_in_one_batch(dataset, mongo, recorder, api):
+    await mongo.users.update_many({"role": "student"}, {"$set": {"approval_status": "pending"}})
+    recorder.reset()
+    # One read of the users, one update_many and one insert_many of notifications
+    response = await api.put("/admin/approve-users", headers=auth(*ADMIN), json={"user_ids": ALL_STUDENTS})
+    assert response.status_code == 200, response.text
+    assert response.json()["summary"] == {"approved": MATCHES}
+    assert_budget(recorder, 3, MATCHES)
+
+async def test_bulk_matches_write_in_one_batch(dataset, recorder, api):
+    # One read each of the users and existing matches, one insert_many each for matches and notifications
+    response = await api.post("/admin/matches/bulk", headers=auth(*ADMIN), json={
+        "matches": [{"student_id": s, "teacher_id": "teacher-2"} for s in ALL_STUDENTS],
+    })
+    assert response.status_code == 200, response.text
+    assert response.json()["summary"] == {"created": STUDENTS_PER_TEACHER["teacher-1"], "already_exists": STUDENTS_PER_TEACHER["teacher-2"]}
+    assert_budget(recorder, 4, MATCHES + 1 + STUDENTS_PER_TEACHER["teacher-2"])
+
+async def test_bulk_relations_write_in_one_batch(dataset, recorder, api):
+    response = await api.post("/admin/parent-student-relations/bulk", headers=auth(*ADMIN), json={
+        "relations": [{"parent_id": "parent-1-0", "student_id": s} for s in ALL_STUDENTS],
+    })
+    assert response.status_code == 200, response.text
+    assert response.json()["summary"] == {"created": MATCHES - 1, "already_exists": 1}
+    assert_budget(recorder, 4, MATCHES + 1 + 1)
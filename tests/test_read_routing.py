@@ -0,0 +1,36 @@
+import base64
+import bson
+from bson.timestamp import Timestamp
+from read_routing import encode_causal_token, advance_session
+
+class FakeSession:
+    def __init__(self, operation_time=None, cluster_time=None):
+        self.operation_time = operation_time
+        self.cluster_time = cluster_time
+
+    def advance_cluster_time(self, cluster_time):
+        self.cluster_time = cluster_time
+
+    def advance_operation_time(self, operation_time):
+        self.operation_time = operation_time
+
+CLUSTER_TIME = {"clusterTime": Timestamp(1700000000, 1), "signature": {"hash": b"\0" * 20, "keyId": 0}}
+
+def test_token_round_trip():
+    token = encode_causal_token(FakeSession(Timestamp(1700000000, 1), CLUSTER_TIME))
+    session = FakeSession()
+    advance_session(session, token)
+    assert session.operation_time == Timestamp(1700000000, 1)
+    assert session.cluster_time == CLUSTER_TIME
+
+def test_forged_tokens_are_ignored():
+    token = encode_causal_token(FakeSession(Timestamp(1700000000, 1), CLUSTER_TIME))
+    forged = bson.encode({"operationTime": Timestamp(1800000000, 1), "clusterTime": {**CLUSTER_TIME, "clusterTime": Timestamp(1800000000, 1)}})
+    for bad in [
+        base64.urlsafe_b64encode(forged).decode() + "." + token.split(".")[1],
+        base64.urlsafe_b64encode(forged).decode(),
+        "not a token",
+    ]:
+        session = FakeSession()
+        advance_session(session, bad)
+        assert (session.operation_time, session.cluster_time) == (None, None)
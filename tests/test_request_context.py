@@ -0,0 +1,43 @@
+import asyncio
+import threading
+import httpx
+import pytest
+from fastapi import APIRouter, FastAPI
+from request_context import TimedRoute, RequestContextMiddleware, current_request
+
+pytestmark = pytest.mark.anyio
+
+finished = []
+
+def _app() -> FastAPI:
+    router = APIRouter(route_class=TimedRoute)
+
+    @router.get("/sync")
+    def sync_endpoint():
+        context = current_request.get()
+        finished.append(context)
+        return {"thread": threading.get_ident()}
+
+    @router.get("/async")
+    async def async_endpoint():
+        finished.append(current_request.get())
+        return {"thread": threading.get_ident()}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(RequestContextMiddleware)
+    return app
+
+async def test_sync_endpoints_stay_in_the_threadpool():
+    app = _app()
+    endpoints = {route.path: route.endpoint for route in app.routes if isinstance(route, TimedRoute)}
+    assert not asyncio.iscoroutinefunction(endpoints["/sync"])
+    assert asyncio.iscoroutinefunction(endpoints["/async"])
+
+    finished.clear()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        sync_thread = (await client.get("/sync")).json()["thread"]
+        async_thread = (await client.get("/async")).json()["thread"]
+    assert async_thread == threading.get_ident()
+    assert sync_thread != threading.get_ident()
+    assert all(context.endpoint_finished is not None for context in finished)
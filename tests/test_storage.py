@@ -0,0 +1,67 @@
+import uuid
+import pytest
+from bson.binary import Binary
+from mongomock_motor import AsyncMongoMockClient
+from database import INDEXES
+from migrations.id_primary_key import PK_COLLECTIONS
+from storage import (
+    translate_filter, translate_projection, translate_sort, to_storage_doc, from_storage_doc, PrimaryKeyCollection,
+    TimeSeriesCollection
+)
+
+pytestmark = pytest.mark.anyio
+
+ID = "01a15251-7754-73fe-964c-97636cd1d3b4"
+STORED_ID = Binary.from_uuid(uuid.UUID(ID))
+
+@pytest.mark.parametrize("projection, expected", [
+    (None, None),
+    ({"_id": 0}, None),
+    ({"_id": 0, "id": 1}, {"_id": 1}),
+    ({"id": 1}, {"_id": 1}),
+    ({"_id": 0, "id": 1, "email": 1}, {"email": 1, "_id": 1}),
+    ({"_id": 0, "email": 1}, {"email": 1, "_id": 0}),
+    ({"_id": 0, "password": 0}, {"password": 0}),
+])
+def test_translate_projection(projection, expected):
+    assert translate_projection(projection) == expected
+
+def test_translate_filter():
+    assert translate_filter({"id": ID, "role": "student"}) == {"_id": STORED_ID, "role": "student"}
+    assert translate_filter({"id": {"$in": [ID]}}) == {"_id": {"$in": [STORED_ID]}}
+    assert translate_filter({"$or": [{"id": ID}, {"email": "a@example.com"}]}) == {
+        "$or": [{"_id": STORED_ID}, {"email": "a@example.com"}]
+    }
+    # Ids that are not UUIDs (e.g. periodic job ids) are stored as they are
+    assert translate_filter({"id": {"$ne": "periodic:archive"}}) == {"_id": {"$ne": "periodic:archive"}}
+
+def test_translate_sort():
+    assert translate_sort("id") == "_id"
+    assert translate_sort([("id", 1), ("date", -1)]) == [("_id", 1), ("date", -1)]
+
+def test_storage_doc_round_trip():
+    doc = {"id": ID, "email": "a@example.com"}
+    assert to_storage_doc(doc) == {"_id": STORED_ID, "email": "a@example.com"}
+    assert from_storage_doc(to_storage_doc(doc)) == doc
+
+async def test_primary_key_collection_id_only_projection():
+    collection = PrimaryKeyCollection(AsyncMongoMockClient()["storage_tests"]["users"])
+    await collection.insert_one({"id": ID, "email": "a@example.com", "password": "hash"})
+    assert await collection.find({"id": {"$in": [ID]}}, {"_id": 0, "id": 1}).to_list(None) == [{"id": ID}]
+    assert await collection.find_one({"id": ID}, {"_id": 0, "email": 1}) == {"email": "a@example.com"}
+
+def test_time_series_translation():
+    collection = TimeSeriesCollection(None)
+    assert collection.translate_filter({"student_id": "s1", "$or": [{"subject": "Fizik"}]}) == {
+        "meta.student_id": "s1", "$or": [{"meta.subject": "Fizik"}]
+    }
+    assert collection.translate_projection({"_id": 0, "subject": 1}) == {"_id": 0, "meta.subject": 1}
+    assert collection.translate_sort([("date", -1)]) == [("date", -1)]
+    doc = {"id": "e1", "student_id": "s1", "teacher_id": "t1", "subject": "Fizik", "exam_type": "TYT", "net_score": 3.0}
+    stored = collection.to_storage(doc)
+    assert stored["meta"] == {"student_id": "s1", "teacher_id": "t1", "subject": "Fizik", "exam_type": "TYT"}
+    assert collection.from_storage(stored) == doc
+
+def test_every_collection_with_an_id_is_migrated():
+    with_id_index = {c for c, indexes in INDEXES.items() if any(list(i.document['key']) == ["id"] for i in indexes)}
+    assert with_id_index <= set(PK_COLLECTIONS)
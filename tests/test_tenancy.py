@@ -0,0 +1,175 @@
+import asyncio
+import jwt
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from starlette.middleware import Middleware
+import database
+import tenancy
+import tenant_moves
+from config import SECRET_KEY, ALGORITHM
+from models import Tenant, UserRole
+from routes import admin
+from server import app
+from tenancy import TenantMiddleware, resolve_tenant, invalidate_tenant_cache
+from read_routing import RequestDatabaseOptionsMiddleware
+from request_context import RequestContext, current_request
+from tests.conftest import auth
+
+pytestmark = pytest.mark.anyio
+
+# student-1-0 and student-1-1 go to Okul A; everyone else has no school with a tenant
+SCHOOL = "Okul A"
+
+@pytest.fixture
+async def tenant(dataset, mongo, monkeypatch):
+    monkeypatch.setattr(tenancy, "TENANT_ROUTING", True)
+    monkeypatch.setattr(admin, "TENANT_ROUTING", True)
+    tenant_databases = {}
+    monkeypatch.setattr(database, "tenant_database", lambda t: tenant_databases.setdefault(
+        t['id'], AsyncMongoMockClient(tz_aware=True)[t['db_name']]
+    ))
+    monkeypatch.setattr(database, "tenant_client", lambda t: None)
+    # As in server.py: inside the request context, outside the per-request database options
+    middleware = list(app.user_middleware)
+    middleware.insert(
+        next(i for i, m in enumerate(middleware) if m.cls is RequestDatabaseOptionsMiddleware),
+        Middleware(TenantMiddleware)
+    )
+    monkeypatch.setattr(app, "user_middleware", middleware)
+    monkeypatch.setattr(app, "middleware_stack", None)
+
+    tenant = Tenant(school=SCHOOL, db_name="tenant_a").model_dump()
+    await mongo.tenants.insert_one(dict(tenant))
+    await mongo.users.update_many({"id": {"$in": ["student-1-0", "student-1-1"]}}, {"$set": {"school": SCHOOL}})
+    # The teacher works at another school, the parent has none
+    await mongo.users.update_one({"id": "teacher-1"}, {"$set": {"school": "Okul B"}})
+    invalidate_tenant_cache()
+    yield tenant
+    invalidate_tenant_cache()
+
+def _scope(path: str, headers: dict) -> dict:
+    return {
+        "type": "http", "method": "GET", "path": "/api" + path, "root_path": "", "app": app, "query_string": b"",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+    }
+
+@pytest.mark.parametrize("user, path, expected", [
+    (("student-1-0", UserRole.STUDENT), "/student/my-question-entries", SCHOOL),
+    (("student-2-0", UserRole.STUDENT), "/student/my-question-entries", None),
+    (("teacher-1", UserRole.TEACHER), "/teacher/question-entries/student-1-0", SCHOOL),
+    (("teacher-1", UserRole.TEACHER), "/teacher/students", None),
+    (("parent-1-0", UserRole.PARENT), "/parent/child-question-entries/student-1-0", SCHOOL),
+    (("parent-1-0", UserRole.PARENT), "/parent/my-children", None),
+    (("admin", UserRole.ADMIN), "/statistics/overview/student-1-0", SCHOOL),
+    (("admin", UserRole.ADMIN), "/admin/reports", None),
+], ids=lambda v: v if isinstance(v, str) else None)
+async def test_tenant_follows_the_student(tenant, user, path, expected):
+    scope = _scope(path, auth(*user))
+    # The route is matched once, by the request context around the tenant middleware
+    token = current_request.set(RequestContext(scope))
+    try:
+        resolved = await resolve_tenant(scope)
+    finally:
+        current_request.reset(token)
+    assert (resolved["school"] if resolved else None) == expected
+
+async def test_tenant_claims_in_old_tokens_are_ignored(tenant):
+    token = jwt.encode({"user_id": "teacher-1", "role": "teacher", "tenant_id": tenant["id"]}, SECRET_KEY, algorithm=ALGORITHM)
+    assert await resolve_tenant(_scope("/teacher/students", {"Authorization": f"Bearer {token}"})) is None
+    assert await resolve_tenant(_scope("/student/my-question-entries", {})) is None
+
+async def test_writes_and_reads_meet_in_the_students_tenant(tenant, mongo, api):
+    response = await api.post("/teacher/question-entry", headers=auth("teacher-1", UserRole.TEACHER), json={
+        "student_id": "student-1-0", "exam_type": "TYT", "subject": "Matematik",
+        "total_questions": 40, "correct_answers": 30, "wrong_answers": 6,
+    })
+    assert response.status_code == 200, response.text
+    tenant_entries = database.tenant_database(tenant).question_entries
+    assert await tenant_entries.count_documents({"student_id": "student-1-0"}) == 1
+
+    for user, path in [
+        (("student-1-0", UserRole.STUDENT), "/student/my-question-entries"),
+        (("teacher-1", UserRole.TEACHER), "/teacher/question-entries/student-1-0"),
+        (("parent-1-0", UserRole.PARENT), "/parent/child-question-entries/student-1-0"),
+    ]:
+        response = await api.get(path, headers=auth(*user))
+        assert response.status_code == 200, response.text
+        assert len(response.json()) == 1, path
+
+async def test_bulk_assignments_are_split_by_tenant(tenant, mongo, api):
+    response = await api.post("/teacher/assignments/bulk", headers=auth("teacher-1", UserRole.TEACHER), json={
+        "all_students": True, "title": "Ödev", "description": "Test 1-10", "subject": "Kimya",
+        "due_date": "2026-02-01T00:00:00+00:00",
+    })
+    assert response.status_code == 200, response.text
+    tenant_assignments = database.tenant_database(tenant).assignments
+    assert await tenant_assignments.count_documents({"title": "Ödev", "description": "Test 1-10"}) == 2
+    assert await mongo.assignments.count_documents({"description": "Test 1-10"}) == 6
+
+async def test_cache_is_invalidated_on_changes(tenant, mongo, api, monkeypatch):
+    async def no_indexes(*args):
+        pass
+    monkeypatch.setattr(admin, "ensure_indexes", no_indexes)
+    monkeypatch.setattr(admin, "tenant_raw_database", lambda t: None)
+    admin_headers = auth("admin", UserRole.ADMIN)
+    assert await tenancy.tenant_for_student("student-2-0") is None
+
+    response = await api.put("/admin/users/student-2-0", headers=admin_headers, json={"school": SCHOOL})
+    assert response.status_code == 200, response.text
+    assert (await tenancy.tenant_for_student("student-2-0"))["id"] == tenant["id"]
+
+    # Cached as having no tenant until the school gets one
+    await mongo.users.update_one({"id": "student-2-1"}, {"$set": {"school": "Okul C"}})
+    assert await tenancy.tenant_for_student("student-2-1") is None
+    response = await api.post("/admin/tenants", headers=admin_headers, json={"school": "Okul C", "db_name": "tenant_c"})
+    assert response.status_code == 200, response.text
+    assert (await tenancy.tenant_for_student("student-2-1"))["school"] == "Okul C"
+
+    # Changed behind this process's back: picked up once the cache expires
+    await mongo.users.update_one({"id": "student-2-1"}, {"$set": {"school": SCHOOL}})
+    assert (await tenancy.tenant_for_student("student-2-1"))["school"] == "Okul C"
+    monkeypatch.setattr(tenancy, "_cache_expires_at", 0.0)
+    assert (await tenancy.tenant_for_student("student-2-1"))["school"] == SCHOOL
+
+async def _run_move_job(mongo, job_id: str) -> dict:
+    job = await mongo.jobs.find_one({"id": job_id}, {"_id": 0})
+    return await tenant_moves.move_tenant_data(job)
+
+async def test_school_change_moves_the_students_data(tenant, mongo, api, monkeypatch):
+    monkeypatch.setattr(tenant_moves, "TENANT_MOVE_BATCH_SIZE", 4)
+    monkeypatch.setattr(tenant_moves, "TENANT_MOVE_PAUSE_SECONDS", 0)
+    entries = await mongo.question_entries.count_documents({"student_id": "student-2-0"})
+    assert entries
+
+    response = await api.put("/admin/users/student-2-0", headers=auth("admin", UserRole.ADMIN), json={"school": SCHOOL})
+    assert response.status_code == 200, response.text
+    job = await mongo.jobs.find_one({"type": "move_tenant_data"}, {"_id": 0})
+    assert job["params"] == {"student_ids": ["student-2-0"], "from_tenant_id": None, "to_tenant_id": tenant["id"]}
+
+    result = await _run_move_job(mongo, job["id"])
+    assert result["moved"]["question_entries"] == entries
+    assert await mongo.question_entries.count_documents({"student_id": "student-2-0"}) == 0
+    tenant_db = database.tenant_database(tenant)
+    assert await tenant_db.question_entries.count_documents({"student_id": "student-2-0"}) == entries
+    response = await api.get("/student/my-question-entries", headers=auth("student-2-0", UserRole.STUDENT))
+    assert len(response.json()) == entries
+
+    # Same tenant, or a teacher: nothing to move
+    for user_id in ["student-2-0", "teacher-1"]:
+        response = await api.put(f"/admin/users/{user_id}", headers=auth("admin", UserRole.ADMIN), json={"school": SCHOOL})
+        assert response.status_code == 200, response.text
+    assert await mongo.jobs.count_documents({"type": "move_tenant_data"}) == 1
+
+async def test_new_tenant_takes_over_its_students_data(tenant, mongo, api, monkeypatch):
+    monkeypatch.setattr(admin, "ensure_indexes", lambda *args: asyncio.sleep(0))
+    monkeypatch.setattr(admin, "tenant_raw_database", lambda t: None)
+    monkeypatch.setattr(tenant_moves, "TENANT_MOVE_PAUSE_SECONDS", 0)
+    await mongo.users.update_many({"id": {"$in": ["student-2-0", "student-2-1"]}}, {"$set": {"school": "Okul C"}})
+    entries = await mongo.question_entries.count_documents({"student_id": {"$in": ["student-2-0", "student-2-1"]}})
+
+    response = await api.post("/admin/tenants", headers=auth("admin", UserRole.ADMIN), json={"school": "Okul C", "db_name": "tenant_c"})
+    assert response.status_code == 200, response.text
+    result = await _run_move_job(mongo, response.json()["move_job_id"])
+    assert result["moved"]["question_entries"] == entries
+    new_tenant = await mongo.tenants.find_one({"school": "Okul C"}, {"_id": 0})
+    assert await database.tenant_database(new_tenant).question_entries.count_documents({}) == entries
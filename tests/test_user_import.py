@@ -0,0 +1,75 @@
+import pytest
+import user_import
+from models import User, UserRole, UserLogin
+from user_import import validate_rows, run_user_import, store_import_passwords, shutdown_hash_pool
+from utils import pwd_context
+from tests.conftest import auth
+
+pytestmark = pytest.mark.anyio
+
+def _row(email: str, **fields) -> dict:
+    return {"email": email, "password": "secret", "full_name": "Ayşe Yılmaz", "role": "student", **fields}
+
+def test_emails_are_lowercased():
+    assert UserLogin(email="Foo.Bar@Example.com", password="x").email == "foo.bar@example.com"
+
+def test_duplicates_differing_in_case_are_rejected():
+    rows, errors = validate_rows([_row("foo@example.com"), _row("FOO@example.com")])
+    assert [r.email for r in rows] == ["foo@example.com"]
+    assert errors == [{"row": 2, "email": "foo@example.com", "error": "Duplicate email in import"}]
+
+async def test_existing_user_matches_regardless_of_case(mongo):
+    await mongo.users.insert_one(User(email="foo@example.com", password="hash", full_name="Foo", role=UserRole.STUDENT).model_dump())
+    rows, _ = validate_rows([_row("Foo@Example.com")])
+    job = {"id": "job-1", "params": {"rows": [r.model_dump(mode="json", exclude={"password"}) for r in rows]}}
+    result = await run_user_import(job)
+    assert result["created"] == 0
+    assert result["skipped_existing"] == ["foo@example.com"]
+    assert await mongo.users.count_documents({}) == 1
+
+async def test_queued_import_holds_no_plaintext_passwords(mongo, api):
+    response = await api.post("/admin/users/import", headers=auth("admin", UserRole.ADMIN), json={"users": [_row("foo@example.com")]})
+    assert response.status_code == 200, response.text
+    job = await mongo.jobs.find_one({"id": response.json()["job_id"]}, {"_id": 0})
+    assert "password" not in job["params"]["rows"][0]
+    assert (await mongo.import_passwords.find_one({"id": job["params"]["passwords_id"]}))["passwords"] == ["secret"]
+
+    try:
+        result = await run_user_import({**job, "attempts": 1})
+    finally:
+        shutdown_hash_pool()
+    assert result["created"] == 1
+    user = await mongo.users.find_one({"email": "foo@example.com"})
+    assert pwd_context.verify("secret", user["password"])
+    assert await mongo.import_passwords.count_documents({}) == 0
+
+async def test_only_new_users_are_hashed(mongo):
+    await mongo.users.insert_one(User(email="foo@example.com", password="hash", full_name="Foo", role=UserRole.STUDENT).model_dump())
+    rows, _ = validate_rows([_row("foo@example.com"), _row("bar@example.com", password="other")])
+    await mongo.jobs.insert_one({"id": "job-1"})
+    job = {"id": "job-1", "params": {
+        "rows": [r.model_dump(mode="json", exclude={"password"}) for r in rows],
+        "passwords_id": await store_import_passwords(rows),
+    }}
+    try:
+        result = await run_user_import(job)
+    finally:
+        shutdown_hash_pool()
+    assert (result["created"], result["skipped_existing"]) == (1, ["foo@example.com"])
+    assert (await mongo.jobs.find_one({"id": "job-1"}))["progress"]["phase"] == "inserting_users"
+    assert pwd_context.verify("other", (await mongo.users.find_one({"email": "bar@example.com"}))["password"])
+
+async def test_passwords_are_kept_until_the_last_attempt(mongo, monkeypatch):
+    async def failing_hash(job_id, passwords):
+        raise RuntimeError("hash pool died")
+    monkeypatch.setattr(user_import, "_hash_all", failing_hash)
+    rows, _ = validate_rows([_row("foo@example.com")])
+    passwords_id = await store_import_passwords(rows)
+    params = {"rows": [r.model_dump(mode="json", exclude={"password"}) for r in rows], "passwords_id": passwords_id}
+
+    with pytest.raises(RuntimeError):
+        await run_user_import({"id": "job-1", "attempts": 1, "max_attempts": 2, "params": params})
+    assert await mongo.import_passwords.count_documents({"id": passwords_id}) == 1
+    with pytest.raises(RuntimeError):
+        await run_user_import({"id": "job-1", "attempts": 2, "max_attempts": 2, "params": params})
+    assert await mongo.import_passwords.count_documents({"id": passwords_id}) == 0